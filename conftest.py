@@ -3,6 +3,10 @@ import pytest
 # Импортируем модель заметки, чтобы создать экземпляр.
 from notes.models import Note
 
+# Бюджеты маршрутов проверяются в каждом тесте, см. yanote/pytest_budgets.py;
+# pytester нужен тестам самого плагина.
+pytest_plugins = ('yanote.pytest_budgets', 'pytester')
+
 
 @pytest.fixture
 # Используем встроенную фикстуру для модели пользователей django_user_model.
@@ -1,5 +1,82 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.db.models import QuerySet
 
+from .deletion import delete_notes, delete_user, log_progress
+from .forms import NoteForm
 from .models import Note
+from .sharding import author_db
+
+User = get_user_model()
+
+# Сколько удаляемых объектов перечислять на странице подтверждения.
+DELETE_PREVIEW = 20
+
+
+def deletion_summary(model, objs, count, notes=0):
+    """Подтверждение удаления без Collector: первые объекты и счётчики.
+
+    Стандартная страница перечисляет все связанные объекты, загружая
+    их в память, — у больших аккаунтов это сотни тысяч заметок.
+    """
+    preview = [str(obj) for obj in objs[:DELETE_PREVIEW]]
+    if count > DELETE_PREVIEW:
+        preview.append(f'… и ещё {count - DELETE_PREVIEW}')
+    model_count = {model._meta.verbose_name_plural: count}
+    if notes:
+        model_count[Note._meta.verbose_name_plural] = notes
+    return preview, model_count, set(), []
+
+
+def count_author_notes(author_ids):
+    """Число заметок авторов во всех их шардах."""
+    by_db = defaultdict(list)
+    for author_id in author_ids:
+        by_db[author_db(author_id, Note)].append(author_id)
+    return sum(
+        Note.objects.using(using).filter(author_id__in=ids).count()
+        for using, ids in by_db.items()
+    )
+
+
+@admin.register(Note)
+class NoteAdmin(admin.ModelAdmin):
+    # Текст хранится в NoteBlob: список читает только узкие строки.
+    form = NoteForm
+    fields = ('title', 'text', 'slug', 'author')
+    list_display = ('title', 'slug', 'author_id', 'updated_at')
+    search_fields = ('slug',)
+
+    def get_deleted_objects(self, objs, request):
+        if not isinstance(objs, QuerySet):
+            return super().get_deleted_objects(objs, request)
+        return deletion_summary(Note, objs.order_by('id'), objs.count())
+
+    def delete_queryset(self, request, queryset):
+        delete_notes(queryset, progress=log_progress('admin'))
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class NotesUserAdmin(UserAdmin):
+    """Пользователи удаляются вместе с заметками пачками."""
+
+    def get_deleted_objects(self, objs, request):
+        users = list(objs)
+        return deletion_summary(
+            User, users, len(users), count_author_notes(
+                [user.pk for user in users]
+            )
+        )
+
+    def delete_model(self, request, obj):
+        delete_user(obj, progress=log_progress(f'user {obj.pk}'))
 
-admin.site.register(Note)
+    def delete_queryset(self, request, queryset):
+        for user in queryset.iterator():
+            self.delete_model(request, user)
@@ -0,0 +1,277 @@
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import generic
+
+from . import sync
+from .deletion import delete_notes
+from .forms import NoteForm
+from .importer import create_batch, slug_base, update_batch
+from .models import Note, make_excerpt
+from .pagination import KeysetPaginator, parse_cursor
+from .sharding import author_db
+from .slugs import SlugTakenError
+
+API_FIELDS = (
+    'id', 'title', 'slug', 'text', 'excerpt', 'created_at', 'updated_at'
+)
+LIST_FIELDS = ('id', 'title', 'slug', 'excerpt', 'updated_at')
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+BATCH_LIMIT = getattr(settings, 'NOTES_API_BATCH_LIMIT', 100)
+# Разделы пакетного запроса: тип элементов и поля-строки элемента.
+BATCH_SECTIONS = {
+    'create': (dict, ('title', 'text', 'slug')),
+    'update': (dict, ('slug', 'title', 'text', 'new_slug')),
+    'delete': (str, ()),
+}
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def error_response(message, status, **details):
+    return JsonResponse({'error': message, **details}, status=status)
+
+
+def serialize(note, fields):
+    data = {}
+    for field in fields:
+        value = getattr(note, field)
+        data[field] = value.isoformat() if field.endswith('_at') else value
+    return data
+
+
+def parse_batch(body):
+    """Разделы пакетного запроса после проверки их формы.
+
+    Ошибка называет раздел и номер неподходящего элемента.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise ApiError('Ожидается JSON-объект.')
+    sections = {}
+    for operation, (kind, fields) in BATCH_SECTIONS.items():
+        items = payload.get(operation, [])
+        if not isinstance(items, list):
+            raise ApiError('Ожидается список.', operation=operation)
+        for index, item in enumerate(items):
+            if not isinstance(item, kind) or any(
+                not isinstance(item[field], str)
+                for field in fields if field in item
+            ):
+                raise ApiError(
+                    'Некорректный элемент.', operation=operation, index=index
+                )
+            if operation == 'update' and 'slug' not in item:
+                raise ApiError(
+                    'Не указан slug.', operation=operation, index=index
+                )
+        sections[operation] = items
+    return sections
+
+
+def parse_fields(request, default):
+    """Поля из ?fields=id,title; неизвестные поля — ошибка запроса."""
+    value = request.GET.get('fields')
+    if not value:
+        return default
+    fields = tuple(field for field in value.split(',') if field)
+    unknown = set(fields) - set(API_FIELDS)
+    if unknown:
+        raise ApiError(
+            'Неизвестные поля.', unknown=sorted(unknown)
+        )
+    return fields
+
+
+class NoteApiBase(LoginRequiredMixin):
+    """Базовый класс JSON API: только заметки текущего пользователя."""
+
+    def get_queryset(self):
+        return Note.objects.for_author(self.request.user)
+
+    def handle_no_permission(self):
+        return error_response(
+            'Требуется авторизация.', HTTPStatus.UNAUTHORIZED
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(str(error), error.status, **error.details)
+        except Http404:
+            return error_response('Не найдено.', HTTPStatus.NOT_FOUND)
+
+
+class NoteApiList(NoteApiBase, generic.View):
+    """Список заметок с выбором полей и курсорной пагинацией."""
+
+    def get(self, request):
+        fields = parse_fields(request, LIST_FIELDS)
+        try:
+            limit = int(request.GET.get('limit', PAGE_SIZE))
+        except ValueError:
+            raise ApiError('Некорректный limit.')
+        page = KeysetPaginator(min(max(limit, 1), MAX_PAGE_SIZE)).page(
+            self.get_queryset().only_fields(*{'id', *fields}),
+            after=parse_cursor(request.GET.get('after')),
+        )
+        return JsonResponse({
+            'results': [serialize(note, fields) for note in page],
+            'next': page.next_cursor,
+        })
+
+
+class NoteApiDetail(NoteApiBase, generic.View):
+    """Одна заметка по slug."""
+
+    def get(self, request, slug):
+        fields = parse_fields(request, API_FIELDS)
+        note = get_object_or_404(
+            self.get_queryset().only_fields(*{'id', *fields}), slug=slug
+        )
+        return JsonResponse(serialize(note, fields))
+
+
+class NoteApiBatch(NoteApiBase, generic.View):
+    """Пакетное создание, изменение и удаление заметок.
+
+    Тело запроса::
+
+        {"create": [{"title": ..., "text": ..., "slug": ...}],
+         "update": [{"slug": ..., "title": ..., "text": ...,
+                     "new_slug": ...}],
+         "delete": ["slug", ...]}
+
+    Все операции выполняются в одной транзакции: при ошибке в любой
+    из них не применяется ни одна. Занятые slug создаваемых заметок
+    получают суффиксы, итоговые slug возвращаются в ответе. Каждый
+    раздел пишется пачкой, число запросов не растёт с размером пакета.
+    """
+
+    def post(self, request):
+        sections = parse_batch(request.body)
+        if sum(map(len, sections.values())) > BATCH_LIMIT:
+            raise ApiError(
+                f'Не больше {BATCH_LIMIT} операций за запрос.',
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+        using = author_db(request.user.pk, Note, write=True)
+        with transaction.atomic(using=using):
+            created = self.create(sections['create'], using)
+            updated = self.update(sections['update'], using)
+            deleted = self.delete(sections['delete'], using)
+        return JsonResponse({
+            'created': [serialize(note, API_FIELDS) for note in created],
+            'updated': [serialize(note, API_FIELDS) for note in updated],
+            'deleted': deleted,
+        })
+
+    @staticmethod
+    def validate(forms, operation):
+        errors = {
+            index: form.errors.get_json_data()
+            for index, form in enumerate(forms)
+            if not form.is_valid()
+        }
+        if errors:
+            raise ApiError(
+                'Ошибки в данных.', operation=operation, errors=errors
+            )
+
+    def create(self, items, using):
+        forms = [NoteForm(data=item) for item in items]
+        self.validate(forms, 'create')
+        notes = []
+        for form in forms:
+            note = form.save(commit=False)
+            note.author = self.request.user
+            note.excerpt = make_excerpt(note.text)
+            notes.append(note)
+        if notes:
+            create_batch(notes, [slug_base(note) for note in notes], using)
+        return notes
+
+    def update(self, items, using):
+        if not items:
+            return []
+        slugs = [item['slug'] for item in items]
+        # Заметки читаются из базы записи: реплика может отставать.
+        notes = self.get_queryset().using(using).with_text().in_bulk(
+            slugs, field_name='slug'
+        )
+        missing = [slug for slug in slugs if slug not in notes]
+        if missing:
+            raise ApiError(
+                'Заметки не найдены.', HTTPStatus.NOT_FOUND, missing=missing
+            )
+        if len(notes) < len(slugs):
+            raise ApiError('Заметка изменяется дважды.', operation='update')
+        forms = []
+        for item in items:
+            note = notes[item['slug']]
+            data = {
+                'title': item.get('title', note.title),
+                'text': item.get('text', note.text),
+                'slug': item.get('new_slug', note.slug),
+            }
+            forms.append(NoteForm(data=data, instance=note))
+        self.validate(forms, 'update')
+        updated = [form.save(commit=False) for form in forms]
+        try:
+            update_batch(updated, using)
+        except SlugTakenError as error:
+            raise ApiError(
+                'Slug уже занят.', HTTPStatus.CONFLICT, slug=str(error)
+            )
+        return updated
+
+    def delete(self, slugs, using):
+        if not slugs:
+            return []
+        notes = self.get_queryset().using(using).filter(slug__in=slugs)
+        deleted = list(notes.values_list('slug', flat=True))
+        delete_notes(notes)
+        return deleted
+
+
+class NoteApiSync(NoteApiBase, generic.View):
+    """Изменения заметок после курсора ?since=<cursor>.
+
+    Удалённые заметки приходят надгробиями: действие delete, id и slug.
+    """
+
+    def get(self, request):
+        since = parse_cursor(request.GET.get('since', 0))
+        if since is None:
+            raise ApiError('Некорректный курсор.')
+        changes, cursor, has_more = sync.changes_since(request.user, since)
+        return JsonResponse({
+            'changes': [
+                {
+                    'seq': change.id,
+                    'action': change.action,
+                    'id': change.note_id,
+                    'slug': change.slug,
+                    'note': serialize(note, API_FIELDS) if note else None,
+                }
+                for change, note in changes
+            ],
+            'cursor': cursor,
+            'has_more': has_more,
+        })
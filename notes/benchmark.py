@@ -0,0 +1,403 @@
+"""Нагрузочный прогон всех маршрутов notes и auth.
+
+Генератор создаёт пользователей и заметки пачками через create_batch:
+число заметок у пользователей распределено по закону Ципфа, длина
+текста — логнормально, как у настоящих заметок. Затем каждый маршрут
+вызывается через тестовый клиент Django, а для него считаются
+перцентили задержки, пропускная способность и пик выделенной памяти.
+Всё случайное зависит только от seed, поэтому прогоны сравнимы.
+"""
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import Client
+from django.urls import reverse
+
+from . import tasks
+from .importer import create_batch
+from .models import Note, make_excerpt
+from .sharding import author_db
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'bench-user-'
+PASSWORD = 'bench-password'
+BATCH_SIZE = 1000
+# Медиана длины текста и разброс логарифма длины.
+TEXT_MEDIAN = 600
+TEXT_SIGMA = 1.2
+TEXT_MIN_LENGTH = 20
+TEXT_MAX_LENGTH = 100000
+CORPUS_LENGTH = 200000
+ZIPF_EXPONENT = 1.1
+WORDS = (
+    'заметка', 'список', 'покупки', 'встреча', 'идея', 'проект', 'код',
+    'отчёт', 'журнал', 'данные', 'note', 'todo', 'release', 'deploy',
+    'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'молоко', 'хлеб', 'книга',
+)
+# Пики памяти снимаются отдельным коротким прогоном: tracemalloc
+# заметно замедляет код и исказил бы задержки.
+MEMORY_ITERATIONS = 5
+
+Result = namedtuple(
+    'Result', ('p50', 'p95', 'p99', 'rps', 'peak_kib', 'errors')
+)
+
+
+class Dataset:
+    """Синтетические пользователи и заметки."""
+
+    def __init__(self, users, notes, seed=0):
+        self.users = users
+        self.notes = notes
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.corpus = ' '.join(
+            self.rng.choice(WORDS)
+            for _ in range(CORPUS_LENGTH // 5)
+        )[:CORPUS_LENGTH]
+
+    def params(self):
+        return {'users': self.users, 'notes': self.notes, 'seed': self.seed}
+
+    def text_length(self):
+        length = int(self.rng.lognormvariate(0, TEXT_SIGMA) * TEXT_MEDIAN)
+        return min(max(length, TEXT_MIN_LENGTH), TEXT_MAX_LENGTH)
+
+    def make_text(self):
+        length = self.text_length()
+        text = self.corpus * (length // len(self.corpus) + 1)
+        start = self.rng.randrange(len(self.corpus))
+        return (text + text)[start:start + length]
+
+    def make_title(self):
+        words = self.rng.randint(2, 6)
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words))
+
+    def notes_per_user(self):
+        weights = [
+            1 / rank ** ZIPF_EXPONENT for rank in range(1, self.users + 1)
+        ]
+        authors = self.rng.choices(
+            range(self.users),
+            cum_weights=list(accumulate(weights)),
+            k=self.notes,
+        )
+        counts = Counter(authors)
+        return [counts[index] for index in range(self.users)]
+
+    def generate(self, batch_size=BATCH_SIZE):
+        """Создаёт пользователей и их заметки, возвращает пользователей."""
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(username=f'{USERNAME_PREFIX}{index}', password=password)
+                for index in range(self.users)
+            ),
+            batch_size=500,
+        )
+        users = list(
+            User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).order_by('id')
+        )
+        for user, count in zip(users, self.notes_per_user()):
+            using = author_db(user.pk, Note, write=True)
+            for start in range(0, count, batch_size):
+                notes = []
+                for index in range(start, min(start + batch_size, count)):
+                    text = self.make_text()
+                    notes.append(Note(
+                        title=self.make_title(),
+                        text=text,
+                        excerpt=make_excerpt(text),
+                        slug=f'bench-{user.pk}-{index}',
+                        author=user,
+                    ))
+                create_batch(notes, [note.slug for note in notes], using)
+        return users
+
+
+class Context:
+    """Состояние прогона, которое сценарии используют между запросами."""
+
+    def __init__(self, users, seed=0, clients=20):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.clients = {}
+        self.slugs = {}
+        for user in self.rng.sample(users, min(clients, len(users))):
+            client = Client()
+            client.force_login(user)
+            self.clients[user.pk] = client
+            self.slugs[user.pk] = list(
+                Note.objects.for_author(user).values_list('slug', flat=True)
+            )
+        self.staff_client = Client()
+        self.staff_client.force_login(
+            User.objects.create(username='bench-staff', is_staff=True)
+        )
+        self.counter = 0
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}-{self.counter}'
+
+    def author(self):
+        """Случайный автор с заметками и его клиент."""
+        author_id = self.rng.choice(
+            [pk for pk, slugs in self.slugs.items() if slugs]
+            or list(self.clients)
+        )
+        return author_id, self.clients[author_id]
+
+    def slug(self, author_id):
+        return self.rng.choice(self.slugs[author_id])
+
+    def new_note(self, author_id):
+        """Заметка, которую сценарий может изменить или удалить."""
+        return Note.objects.create(
+            title='Заметка для прогона',
+            text='Текст',
+            slug=self.unique('bench-note'),
+            author_id=author_id,
+        )
+
+
+def route(name, prepare):
+    """Сценарий прогона.
+
+    prepare(ctx) готовит запрос вне замера и возвращает клиента, метод,
+    url, данные и дополнительные аргументы клиента.
+    """
+    return name, prepare
+
+
+def note_route(name, view):
+    def prepare(ctx):
+        author_id, client = ctx.author()
+        url = reverse(view, args=(ctx.slug(author_id),))
+        return client, 'get', url, None, {}
+    return route(name, prepare)
+
+
+def page_route(name, view, args=()):
+    def prepare(ctx):
+        _, client = ctx.author()
+        return client, 'get', reverse(view, args=args), None, {}
+    return route(name, prepare)
+
+
+def create_note(ctx):
+    _, client = ctx.author()
+    data = {'title': 'Новая заметка', 'text': 'Текст ' * 50}
+    return client, 'post', reverse('notes:add'), data, {}
+
+
+def edit_note(ctx):
+    author_id, client = ctx.author()
+    url = reverse('notes:edit', args=(ctx.new_note(author_id).slug,))
+    data = {'title': 'Изменённая', 'text': 'Новый текст ' * 50}
+    return client, 'post', url, data, {}
+
+
+def delete_note(ctx):
+    author_id, client = ctx.author()
+    url = reverse('notes:delete', args=(ctx.new_note(author_id).slug,))
+    return client, 'post', url, None, {}
+
+
+def show_revision(ctx):
+    author_id, client = ctx.author()
+    url = reverse('notes:revision', args=(ctx.slug(author_id), 1))
+    return client, 'get', url, None, {}
+
+
+def restore_revision(ctx):
+    author_id, client = ctx.author()
+    note = ctx.new_note(author_id)
+    note.text = 'Изменённый текст'
+    note.save()
+    url = reverse('notes:revision', args=(note.slug, 1))
+    return client, 'post', url, None, {}
+
+
+def search_notes(ctx):
+    _, client = ctx.author()
+    data = {'q': ctx.rng.choice(WORDS)}
+    return client, 'get', reverse('notes:search'), data, {}
+
+
+def cache_stats(ctx):
+    return ctx.staff_client, 'get', reverse('notes:cache_stats'), None, {}
+
+
+def api_batch(ctx):
+    _, client = ctx.author()
+    payload = {
+        'create': [
+            {'title': 'Из API', 'text': 'Текст ' * 20}
+            for _ in range(5)
+        ],
+    }
+    return client, 'post', reverse('notes:api_batch'), json.dumps(payload), {
+        'content_type': 'application/json',
+    }
+
+
+def export_in_background(ctx):
+    _, client = ctx.author()
+    url = reverse('notes:export', args=('jsonl',))
+    return client, 'post', url, None, {}
+
+
+def finished_export(ctx):
+    """Выгрузка автора, уже выполненная воркером."""
+    author_id, client = ctx.author()
+    task = tasks.enqueue(
+        'notes.export', owner_id=author_id, export_format='jsonl'
+    )
+    tasks.work()
+    return client, task
+
+
+def task_status(ctx):
+    client, task = finished_export(ctx)
+    return client, 'get', reverse('notes:task', args=(task.pk,)), None, {}
+
+
+def task_result(ctx):
+    client, task = finished_export(ctx)
+    url = reverse('notes:task_result', args=(task.pk,))
+    return client, 'get', url, None, {}
+
+
+def login(ctx):
+    data = {
+        'username': ctx.rng.choice(ctx.users).username,
+        'password': PASSWORD,
+    }
+    return Client(), 'post', reverse('users:login'), data, {}
+
+
+def logout(ctx):
+    client = Client()
+    client.force_login(ctx.rng.choice(ctx.users))
+    return client, 'get', reverse('users:logout'), None, {}
+
+
+def signup(ctx):
+    password = 'Bench-Password-123'
+    data = {
+        'username': ctx.unique('bench-signup'),
+        'password1': password,
+        'password2': password,
+    }
+    return Client(), 'post', reverse('users:signup'), data, {}
+
+
+SCENARIOS = dict((
+    page_route('notes:home', 'notes:home'),
+    page_route('notes:add', 'notes:add'),
+    route('notes:add POST', create_note),
+    note_route('notes:edit', 'notes:edit'),
+    route('notes:edit POST', edit_note),
+    note_route('notes:detail', 'notes:detail'),
+    note_route('notes:delete', 'notes:delete'),
+    route('notes:delete POST', delete_note),
+    note_route('notes:history', 'notes:history'),
+    route('notes:revision', show_revision),
+    route('notes:revision POST', restore_revision),
+    page_route('notes:list', 'notes:list'),
+    route('notes:search', search_notes),
+    page_route('notes:export', 'notes:export', ('jsonl',)),
+    route('notes:export POST', export_in_background),
+    route('notes:task', task_status),
+    route('notes:task_result', task_result),
+    route('notes:cache_stats', cache_stats),
+    page_route('notes:api_list', 'notes:api_list'),
+    page_route('notes:api_sync', 'notes:api_sync'),
+    route('notes:api_batch', api_batch),
+    note_route('notes:api_detail', 'notes:api_detail'),
+    page_route('notes:success', 'notes:success'),
+    page_route('users:login', 'users:login'),
+    route('users:login POST', login),
+    route('users:logout', logout),
+    page_route('users:signup', 'users:signup'),
+    route('users:signup POST', signup),
+))
+
+
+def send(request):
+    client, method, url, data, extra = request
+    response = getattr(client, method)(url, data, **extra)
+    if response.streaming:
+        # Выгрузка формируется, пока её читают.
+        b''.join(response.streaming_content)
+    return response.status_code < 400
+
+
+def run_scenario(ctx, prepare, iterations):
+    latencies = []
+    errors = 0
+    for _ in range(iterations):
+        request = prepare(ctx)
+        start = time.perf_counter()
+        ok = send(request)
+        latencies.append(time.perf_counter() - start)
+        errors += not ok
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(min(iterations, MEMORY_ITERATIONS)):
+            request = prepare(ctx)
+            tracemalloc.reset_peak()
+            send(request)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return Result(
+        p50=p50 * 1000,
+        p95=p95 * 1000,
+        p99=p99 * 1000,
+        rps=len(latencies) / sum(latencies),
+        peak_kib=peak / 1024,
+        errors=errors,
+    )
+
+
+def run(ctx, iterations, names=None):
+    """Прогоняет сценарии, возвращает {имя: Result}."""
+    return {
+        name: run_scenario(ctx, prepare, iterations)
+        for name, prepare in SCENARIOS.items()
+        if not names or name in names
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Сценарии, у которых p95 хуже базового больше чем на tolerance.
+
+    Сценарий без базового результата тоже попадает в ответ, со значением
+    None: иначе новый сценарий никогда бы не проверялся.
+    """
+    regressions = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            regressions[name] = None
+        elif result.p95 > base['p95'] * (1 + tolerance):
+            regressions[name] = result.p95 / base['p95'] - 1
+    return regressions
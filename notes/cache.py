@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'MAX_ENTRIES': 1000,
+    'TIMEOUT': 300,
+    'SHARED_CACHE': None,
+}
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш в памяти процесса."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FragmentCache:
+    """Кэш отрендеренных фрагментов страниц заметок.
+
+    Ключ фрагмента строится из версии данных, которую представление
+    и так читает из базы для ETag: после изменения заметок в любом
+    процессе старые фрагменты перестают находиться, сбрасывать их
+    не нужно. Первый уровень — LRU в памяти процесса, второй
+    (необязательный) — общий кэш Django, например memcached или redis.
+    """
+
+    def __init__(self, max_entries, timeout, shared_cache=None):
+        self.timeout = timeout
+        self.local = LRUCache(max_entries)
+        self.shared_alias = shared_cache
+        self.reset_stats()
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'NOTES_FRAGMENT_CACHE', {})}
+        return cls(
+            options['MAX_ENTRIES'],
+            options['TIMEOUT'],
+            options['SHARED_CACHE'],
+        )
+
+    @property
+    def shared(self):
+        if self.shared_alias is None:
+            return None
+        return caches[self.shared_alias]
+
+    def make_key(self, name, author_id, vary_on=()):
+        vary = hashlib.md5(
+            ':'.join(str(value) for value in vary_on).encode()
+        ).hexdigest()
+        return f'notes:fragment:{name}:{author_id}:{vary}'
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(key, value, self.timeout)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, value, self.timeout)
+        if self.shared is not None:
+            self.shared.set(key, value, self.timeout)
+
+    def clear(self):
+        self.local.clear()
+
+    def reset_stats(self):
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'local_entries': len(self.local),
+            'local_max_entries': self.local.max_entries,
+        }
+
+
+fragment_cache = FragmentCache.from_settings()
+
+
+def collect_metrics():
+    """Счётчики кэша фрагментов для /metrics."""
+    stats = fragment_cache.stats()
+    yield (
+        'notes_fragment_cache_lookups_total',
+        'counter',
+        'Обращения к кэшу фрагментов по результату.',
+        [
+            ({'result': 'local_hit'}, stats['local_hits']),
+            ({'result': 'shared_hit'}, stats['shared_hits']),
+            ({'result': 'miss'}, stats['misses']),
+        ],
+    )
+    yield (
+        'notes_fragment_cache_entries',
+        'gauge',
+        'Фрагменты в памяти процесса.',
+        [({}, stats['local_entries'])],
+    )
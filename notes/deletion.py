@@ -0,0 +1,75 @@
+"""Удаление заметок пачками в обход сборщика Django.
+
+Collector перед удалением загружает в память все заметки и их ревизии
+и удаляет их в одной транзакции: у пользователя с сотнями тысяч
+заметок это не укладывается ни в память, ни в таймауты. delete_notes
+читает по chunk_size узких строк, удаляет ревизии и заметки сырыми
+DELETE в короткой транзакции на пачку и оповещает подписчиков
+сигналом notes_bulk_deleted вместо post_delete для каждой заметки.
+"""
+import logging
+
+from django.db import transaction
+
+from . import signals
+from .models import Note, NoteRevision
+from .sharding import author_db, db_for_author
+
+CHUNK_SIZE = 500
+
+logger = logging.getLogger('notes.deletion')
+
+
+def delete_notes(queryset, chunk_size=CHUNK_SIZE, progress=None):
+    """Удаляет заметки queryset пачками, возвращает их число.
+
+    progress(deleted, total) вызывается после каждой пачки.
+    """
+    using = queryset.db
+    notes = queryset.order_by('id').only('id', 'slug', 'author_id', 'blob')
+    total = notes.count() if progress else None
+    deleted = last_id = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(notes.filter(id__gt=last_id)[:chunk_size])
+            if not batch:
+                return deleted
+            ids = [note.pk for note in batch]
+            NoteRevision.objects.using(using).filter(
+                note_id__in=ids
+            )._raw_delete(using)
+            Note.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+            signals.notes_bulk_deleted.send(
+                sender=Note, notes=batch, using=using
+            )
+        deleted += len(batch)
+        last_id = ids[-1]
+        if progress:
+            progress(deleted, total)
+        if len(batch) < chunk_size:
+            return deleted
+
+
+def delete_author_notes(author_id, using=None, **kwargs):
+    """Удаляет все заметки автора из его шарда или из using."""
+    using = db_for_author(author_id) or using or author_db(
+        author_id, Note, write=True
+    )
+    return delete_notes(
+        Note.objects.using(using).filter(author_id=author_id), **kwargs
+    )
+
+
+def delete_user(user, **kwargs):
+    """Удаляет пользователя: сначала его заметки пачками, затем его самого."""
+    deleted = delete_author_notes(user.pk, user._state.db, **kwargs)
+    user.delete()
+    logger.info('Удалён пользователь %s и %s заметок', user.pk, deleted)
+    return deleted
+
+
+def log_progress(label):
+    """progress для delete_notes, пишущий ход удаления в журнал."""
+    def progress(deleted, total):
+        logger.info('%s: удалено %s из %s', label, deleted, total)
+    return progress
@@ -0,0 +1,198 @@
+import csv
+import json
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import namedtuple
+
+from .models import Note
+
+CHUNK_SIZE = 500
+EXPORT_FIELDS = ('id', 'title', 'slug', 'text', 'created_at', 'updated_at')
+ZIP_LEVEL = 6
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_UTF8_FLAG = 0x800
+ZIP64_EXTRA = 0x0001
+# Начиная с этих значений смещения, размеры и число файлов пишутся
+# в записях ZIP64.
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+# Центральный каталог до этого размера остаётся в памяти, дальше — на диске.
+ZIP_SPOOL_SIZE = 1024 * 1024
+ZIP_CHUNK_SIZE = 64 * 1024
+
+ExportFormat = namedtuple(
+    'ExportFormat', ('content_type', 'extension', 'writer')
+)
+
+
+def iter_notes(author, chunk_size=CHUNK_SIZE):
+    """Заметки автора пачками по ключу: в памяти не больше одной пачки."""
+    queryset = Note.objects.for_author(author).only_fields(
+        *EXPORT_FIELDS
+    ).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1].id
+
+
+def note_as_dict(note):
+    return {
+        'id': note.id,
+        'title': note.title,
+        'slug': note.slug,
+        'text': note.text,
+        'created_at': note.created_at.isoformat(),
+        'updated_at': note.updated_at.isoformat(),
+    }
+
+
+def write_jsonl(notes):
+    for note in notes:
+        yield (
+            json.dumps(note_as_dict(note), ensure_ascii=False) + '\n'
+        ).encode()
+
+
+class _LineBuffer:
+    """Файлоподобный объект, из которого забирают записанное."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(
+            chunk.encode() if isinstance(chunk, str) else chunk
+            for chunk in self._chunks
+        )
+        self._chunks.clear()
+        return data
+
+
+def write_csv(notes):
+    buffer = _LineBuffer()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.pop()
+    for note in notes:
+        writer.writerow(note_as_dict(note))
+        yield buffer.pop()
+
+
+def note_as_markdown(note):
+    return f'# {note.title}\n\n{note.text}\n'
+
+
+def dos_datetime(moment):
+    """Дата и время в формате MS-DOS, как их хранит ZIP."""
+    date = (moment.year - 1980) << 9 | moment.month << 5 | moment.day
+    time = moment.hour << 11 | moment.minute << 5 | moment.second // 2
+    return date, time
+
+
+def zip_entry(name, data, moment, offset):
+    """Локальный заголовок с данными и запись центрального каталога.
+
+    Файл name записывается в архив по смещению offset.
+    """
+    name = name.encode()
+    flags = 0 if name.isascii() else ZIP_UTF8_FLAG
+    compressor = zlib.compressobj(ZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    date, time = dos_datetime(moment)
+    crc = zlib.crc32(data)
+    local = struct.pack(
+        '<4s5H3L2H', b'PK\x03\x04', ZIP_VERSION, flags,
+        zipfile.ZIP_DEFLATED, time, date, crc, len(compressed), len(data),
+        len(name), 0,
+    ) + name + compressed
+    extra = b''
+    version = ZIP_VERSION
+    if offset >= ZIP64_LIMIT:
+        extra = struct.pack('<2HQ', ZIP64_EXTRA, 8, offset)
+        offset = 0xFFFFFFFF
+        version = ZIP64_VERSION
+    central = struct.pack(
+        '<4s6H3L5H2L', b'PK\x01\x02', version, version, flags,
+        zipfile.ZIP_DEFLATED, time, date, crc, len(compressed), len(data),
+        len(name), len(extra), 0, 0, 0, 0, offset,
+    ) + name + extra
+    return local, central
+
+
+def zip_end(entries, size, offset):
+    """Конец центрального каталога, при необходимости с записями ZIP64.
+
+    Каталог из entries записей занимает size байт по смещению offset.
+    """
+    end = b''
+    if (entries >= ZIP_MAX_ENTRIES or size >= ZIP64_LIMIT
+            or offset >= ZIP64_LIMIT):
+        end = struct.pack(
+            '<4sQ2H2L4Q', b'PK\x06\x06', 44, ZIP64_VERSION,
+            ZIP64_VERSION, 0, 0, entries, entries, size, offset,
+        ) + struct.pack('<4sLQL', b'PK\x06\x07', 0, offset + size, 1)
+        entries = min(entries, 0xFFFF)
+        size = min(size, 0xFFFFFFFF)
+        offset = min(offset, 0xFFFFFFFF)
+    return end + struct.pack(
+        '<4s4H2LH', b'PK\x05\x06', 0, 0, entries, entries, size, offset,
+        0,
+    )
+
+
+def write_zip(notes):
+    """ZIP из Markdown-файлов, который отдаётся по мере формирования.
+
+    zipfile держит в памяти ZipInfo каждого записанного файла до конца
+    архива, поэтому архив собирается вручную: записи центрального
+    каталога копятся во временном файле, и память не растёт с числом
+    заметок.
+    """
+    offset = 0
+    entries = 0
+    with tempfile.SpooledTemporaryFile(ZIP_SPOOL_SIZE) as directory:
+        for note in notes:
+            local, central = zip_entry(
+                f'{note.slug}.md',
+                note_as_markdown(note).encode(),
+                note.updated_at,
+                offset,
+            )
+            directory.write(central)
+            offset += len(local)
+            entries += 1
+            yield local
+        size = directory.tell()
+        directory.seek(0)
+        while True:
+            chunk = directory.read(ZIP_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    yield zip_end(entries, size, offset)
+
+
+FORMATS = {
+    'jsonl': ExportFormat('application/x-ndjson', 'jsonl', write_jsonl),
+    'csv': ExportFormat('text/csv', 'csv', write_csv),
+    'zip': ExportFormat('application/zip', 'zip', write_zip),
+}
+
+
+def export_notes(author, export_format, chunk_size=CHUNK_SIZE):
+    """Поток байтов выгрузки заметок автора в выбранном формате."""
+    return FORMATS[export_format].writer(iter_notes(author, chunk_size))
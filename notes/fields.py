@@ -0,0 +1,119 @@
+"""Поле модели со сжатым текстом.
+
+Значение хранится в двоичном столбце: первый байт — способ хранения,
+остальное — текст в UTF-8 как есть или сжатый zlib. Короткие тексты
+и тексты, которые не ужимаются, хранятся как есть. Строки, записанные
+до перехода на сжатие, читаются без изменений.
+
+Из базы приходит сжатое значение CompressedText, распаковывается оно
+при первом обращении к атрибуту модели. Если текст так и не прочитали,
+при сохранении он записывается обратно без повторного сжатия. values()
+и values_list() отдают CompressedText: текст из него — str(value).
+"""
+import zlib
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+RAW = b'\x00'
+ZLIB = b'\x01'
+# Тексты короче порога (в байтах UTF-8) не сжимаются.
+COMPRESS_THRESHOLD = 512
+COMPRESS_LEVEL = 6
+
+
+class CompressedText(bytes):
+    """Значение поля в том виде, в каком оно лежит в базе."""
+
+    def __str__(self):
+        return decompress(self)
+
+
+def compress(text, threshold=COMPRESS_THRESHOLD, level=COMPRESS_LEVEL):
+    data = text.encode()
+    if len(data) >= threshold:
+        packed = zlib.compress(data, level)
+        if len(packed) < len(data):
+            return CompressedText(ZLIB + packed)
+    return CompressedText(RAW + data)
+
+
+def decompress(value):
+    flag, data = value[:1], value[1:]
+    if flag == ZLIB:
+        data = zlib.decompress(data)
+    elif flag != RAW:
+        raise ValueError(f'Неизвестный способ хранения текста: {flag!r}')
+    return data.decode()
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Распаковывает значение при первом обращении и запоминает текст.
+
+    Дескриптор данных: иначе значение из __dict__ экземпляра
+    возвращалось бы в обход __get__.
+    """
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = decompress(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, compress_threshold=COMPRESS_THRESHOLD,
+                 compress_level=COMPRESS_LEVEL, **kwargs):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.compress_threshold != COMPRESS_THRESHOLD:
+            kwargs['compress_threshold'] = self.compress_threshold
+        if self.compress_level != COMPRESS_LEVEL:
+            kwargs['compress_level'] = self.compress_level
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        # Строка — значение, записанное до перехода на сжатие.
+        if value is None or isinstance(value, str):
+            return value
+        return CompressedText(value)
+
+    def to_python(self, value):
+        if isinstance(value, CompressedText):
+            return decompress(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # Непрочитанное значение записывается как есть, без распаковки.
+        value = model_instance.__dict__.get(self.attname)
+        if isinstance(value, CompressedText):
+            return value
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, CompressedText):
+            return value
+        return compress(
+            super().get_prep_value(value),
+            self.compress_threshold,
+            self.compress_level,
+        )
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
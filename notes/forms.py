@@ -1,7 +1,4 @@
-from pytils.translit import slugify
-
 from django import forms
-from django.core.exceptions import ValidationError
 
 from .models import Note
 
@@ -10,20 +7,38 @@ WARNING = ' - такой slug уже существует, придумайте
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    # Текст хранится в NoteBlob, поэтому поле объявлено явно.
+    text = forms.CharField(
+        label='Текст',
+        widget=forms.Textarea,
+        help_text='Добавьте подробностей',
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
-    def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
-            raise ValidationError(slug + WARNING)
-        return slug
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial.setdefault('text', self.instance.text)
+
+    def save(self, commit=True):
+        self.instance.text = self.cleaned_data['text']
+        return super().save(commit)
+
+    def validate_unique(self):
+        """Уникальность slug проверяет сама заметка при сохранении.
+
+        Отдельный запрос exists() здесь не защищает от гонки и лишь
+        добавляет обращение к базе.
+        """
+        exclude = self._get_validation_exclusions()
+        exclude.append('slug')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as error:
+            self._update_errors(error)
+
+    def add_slug_taken_error(self):
+        self.add_error('slug', self.instance.slug + WARNING)
@@ -0,0 +1,277 @@
+import copy
+import csv
+import json
+from collections import Counter, namedtuple
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import revisions
+from .forms import NoteForm
+from .models import Note, NoteBlob, NoteRevision, legacy_text, make_excerpt
+from .sharding import author_db
+from .signals import notes_bulk_created, notes_bulk_updated
+from .slugs import (
+    DEFAULT_SLUG, SlugTakenError, allocate_slugs, fetch_taken_slugs,
+    release_slugs, reserve_slugs, slug_registry, slugify_title
+)
+
+BATCH_SIZE = 1000
+MAX_ATTEMPTS = 3
+# Строки проверяются полями NoteForm, но все поля необязательны,
+# а текст из файла сохраняется как есть, без обрезки пробелов.
+FIELDS = copy.deepcopy(NoteForm.base_fields)
+for field in FIELDS.values():
+    field.required = False
+FIELDS['text'].strip = False
+DEFAULTS = {'title': Note._meta.get_field('title').default}
+
+# errors: {номер строки с 1: {поле: [сообщения]}} для пропущенных строк.
+ImportResult = namedtuple('ImportResult', ('created', 'batches', 'errors'))
+
+
+def read_jsonl(lines):
+    """Словари строк файла; испорченная строка отдаётся как есть."""
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+def read_csv(lines):
+    yield from csv.DictReader(lines)
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def clean_row(row):
+    """Проверяет строку импорта полями NoteForm.
+
+    Возвращает очищенные данные и словарь ошибок по полям, как
+    form.errors; при ошибках данные None.
+    """
+    if not isinstance(row, dict):
+        return None, {'__all__': ['Ожидается JSON-объект.']}
+    data, errors = {}, {}
+    for name, field in FIELDS.items():
+        value = row.get(name, '')
+        if value is None:
+            value = ''
+        if not isinstance(value, str):
+            errors[name] = ['Ожидается строка.']
+            continue
+        try:
+            data[name] = field.clean(value) or DEFAULTS.get(name, '')
+        except ValidationError as error:
+            errors[name] = error.messages
+    if errors:
+        return None, errors
+    return data, {}
+
+
+def build_note(data, author):
+    return Note(
+        title=data['title'],
+        text=data['text'],
+        excerpt=make_excerpt(data['text']),
+        slug=data['slug'],
+        author=author,
+    )
+
+
+def slug_base(note):
+    return note.slug or slugify_title(note.title) or DEFAULT_SLUG
+
+
+def create_batch(notes, bases, using):
+    """Создаёт пачку заметок одним bulk_create в одной транзакции.
+
+    Slug подбираются в памяти по заранее выбранному множеству занятых.
+    При шардировании они сначала занимаются в реестре NoteSlug.
+    """
+    registry = slug_registry(Note)
+    queryset = Note.objects.using(using)
+    taken = fetch_taken_slugs(
+        bases, queryset if registry is None else registry
+    )
+    slugs = allocate_slugs(bases, taken)
+    if registry is not None:
+        reserve_slugs(registry, slugs, notes[0].author_id)
+    try:
+        with transaction.atomic(using=using):
+            attach_blobs(notes, using)
+            for note, slug in zip(notes, slugs):
+                note.slug = slug
+                note.legacy_text = legacy_text(note.text)
+            queryset.bulk_create(notes)
+            store_batch(notes, queryset, using)
+            NoteRevision.objects.record_created(notes, using)
+    except Exception:
+        if registry is not None:
+            release_slugs(registry, slugs)
+        raise
+
+
+def update_batch(notes, using):
+    """Сохраняет пачку изменённых заметок одним bulk_update.
+
+    Заметки загружены с текстом и изменены в памяти. Указанный slug
+    должен быть свободен, иначе SlugTakenError; пустой подбирается по
+    заголовку. Тексты, ревизии и подписчики обновляются пачкой.
+    """
+    registry = slug_registry(Note)
+    queryset = Note.objects.using(using)
+    old_slugs = dict(
+        queryset.filter(pk__in=[note.pk for note in notes]).values_list(
+            'pk', 'slug'
+        )
+    )
+    reserved = assign_slugs(notes, old_slugs, queryset, registry)
+    try:
+        with transaction.atomic(using=using):
+            blobs = NoteBlob.objects.using(using)
+            changed = [
+                note for note in notes
+                if note.blob_id != revisions.digest(note.text)
+            ]
+            released = [note.blob_id for note in changed]
+            digests = blobs.acquire(note.text for note in changed)
+            for note, digest in zip(changed, digests):
+                note.blob_id = digest
+            blobs.release(released)
+            now = timezone.now()
+            for note in notes:
+                note.excerpt = make_excerpt(note.text)
+                note.legacy_text = legacy_text(note.text)
+                note.updated_at = now
+            queryset.bulk_update(
+                notes,
+                ('title', 'slug', 'excerpt', 'legacy_text', 'blob',
+                 'updated_at'),
+            )
+            NoteRevision.objects.record_updated(notes, using)
+            for note in notes:
+                note._text_changed = False
+            notes_bulk_updated.send(sender=Note, notes=notes, using=using)
+    except Exception:
+        if reserved:
+            release_slugs(registry, reserved)
+        raise
+    if reserved:
+        release_slugs(registry, [
+            old_slugs[note.pk] for note in notes
+            if note.slug != old_slugs[note.pk]
+        ])
+
+
+def assign_slugs(notes, old_slugs, queryset, registry):
+    """Проверяет и подбирает slug изменённых заметок.
+
+    Slug, который заметка меняет, не должен быть занят, в том числе
+    другими заметками пачки. Возвращает slug, занятые в реестре.
+    """
+    others = queryset if registry is None else registry
+    bases = {}
+    for note in notes:
+        if not note.slug:
+            base = slugify_title(note.title) or DEFAULT_SLUG
+            if base == old_slugs[note.pk]:
+                note.slug = base
+            else:
+                bases[note] = base
+    explicit = [
+        note.slug for note in notes
+        if note.slug and note.slug != old_slugs[note.pk]
+    ]
+    repeated = [slug for slug, count in Counter(explicit).items() if count > 1]
+    taken = repeated or list(
+        others.filter(slug__in=explicit).values_list('slug', flat=True)[:1]
+    )
+    if taken:
+        raise SlugTakenError(taken[0])
+    if bases:
+        taken = fetch_taken_slugs(bases.values(), others)
+        taken.update(explicit)
+        for note, slug in zip(bases, allocate_slugs(bases.values(), taken)):
+            note.slug = slug
+    reserved = explicit + [note.slug for note in bases]
+    if registry is None or not reserved:
+        return []
+    reserve_slugs(registry, reserved, notes[0].author_id)
+    return reserved
+
+
+def attach_blobs(notes, using):
+    """Ссылки новых заметок на их тексты в NoteBlob, до bulk_create."""
+    digests = NoteBlob.objects.using(using).acquire(
+        note.text for note in notes
+    )
+    for note, digest in zip(notes, digests):
+        note.blob_id = digest
+
+
+def store_batch(notes, queryset, using):
+    """Назначает id новым заметкам и оповещает подписчиков."""
+    # SQLite не возвращает id из bulk_create: достаём их по slug.
+    ids = dict(
+        queryset.filter(
+            slug__in=[note.slug for note in notes]
+        ).values_list('slug', 'id')
+    )
+    for note in notes:
+        note.pk = ids[note.slug]
+        note._state.adding = False
+        note._state.db = using
+        note._text_changed = False
+    notes_bulk_created.send(sender=Note, notes=notes, using=using)
+
+
+def import_notes(author, rows, batch_size=BATCH_SIZE, progress=None):
+    """Импортирует заметки автора из потока словарей пачками.
+
+    Строки с ошибками пропускаются, ошибки возвращаются в результате.
+    progress(read, None) вызывается после каждой зафиксированной пачки
+    с числом прочитанных строк, включая пропущенные.
+    """
+    using = author_db(author.pk, Note, write=True)
+    rows = iter(rows)
+    created = batches = read = 0
+    errors = {}
+    while True:
+        rows_batch = list(islice(rows, batch_size))
+        if not rows_batch:
+            return ImportResult(created, batches, errors)
+        batch = []
+        for number, row in enumerate(rows_batch, read + 1):
+            data, row_errors = clean_row(row)
+            if row_errors:
+                errors[number] = row_errors
+            else:
+                batch.append(build_note(data, author))
+        read += len(rows_batch)
+        if not batch:
+            if progress:
+                progress(read, None)
+            continue
+        bases = [slug_base(note) for note in batch]
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                create_batch(batch, bases, using)
+                break
+            except IntegrityError:
+                # Параллельная запись заняла выбранный slug: подбираем заново.
+                if attempt == MAX_ATTEMPTS:
+                    raise
+        created += len(batch)
+        batches += 1
+        if progress:
+            progress(read, None)
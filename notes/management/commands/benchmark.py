@@ -0,0 +1,170 @@
+import json
+import resource
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from notes import benchmark
+
+BASELINE = Path(benchmark.__file__).with_name('benchmark_baseline.json')
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def isolated_storage(directory):
+    """Настройки, уводящие файлы задач и общие кэши в directory.
+
+    Прогон пишет результаты задач под pk временной базы и кэширует
+    сессии и пользователей с её ключами: в хранилищах работающего
+    сервера они перезаписали бы чужие данные. Кэши процесса остаются
+    как есть, остальные заменяются файловыми во временном каталоге.
+    """
+    caches = {}
+    for alias, config in settings.CACHES.items():
+        location = str(directory / 'caches' / alias)
+        if config['BACKEND'] == FILE_CACHE:
+            config = {**config, 'LOCATION': location}
+        elif config['BACKEND'] != LOCMEM_CACHE:
+            config = {'BACKEND': FILE_CACHE, 'LOCATION': location}
+        caches[alias] = config
+    return {
+        'CACHES': caches,
+        'TASKS': {
+            **settings.TASKS,
+            'RESULTS_ROOT': directory / 'task_results',
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетические данные во временной базе, прогоняет '
+            'все маршруты notes и auth и сравнивает результат с базовым.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--notes', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument(
+            '--scenario', nargs='*', help='Только указанные сценарии.'
+        )
+        parser.add_argument('--baseline', type=Path, default=BASELINE)
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help=('Записать результат как новый базовый; с --scenario '
+                  'заменяются только указанные сценарии.'),
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.5,
+            help=('Допустимое ухудшение p95 относительно базового; '
+                  'на общих машинах разброс p95 доходит до десятков '
+                  'процентов.'),
+        )
+
+    def handle(self, *args, **options):
+        dataset = benchmark.Dataset(
+            options['users'], options['notes'], options['seed']
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            if connection.vendor == 'sqlite':
+                # Тестовая база SQLite по умолчанию в памяти: миллионы
+                # заметок туда не поместятся, да и диск не участвовал бы.
+                connection.settings_dict['TEST'] = {
+                    **connection.settings_dict.get('TEST', {}),
+                    'NAME': str(directory / 'benchmark.sqlite3'),
+                }
+            results = self.run_benchmark(dataset, options, directory)
+        self.report(results, dataset, options)
+
+    def run_benchmark(self, dataset, options, directory):
+        creation = connection.creation
+        old_name = creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Как в продакшене: без DEBUG не копится журнал SQL-запросов.
+            with override_settings(DEBUG=False, **isolated_storage(directory)):
+                users = dataset.generate()
+                ctx = benchmark.Context(users, options['seed'])
+                results = benchmark.run(
+                    ctx, options['iterations'], options['scenario']
+                )
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+        return results
+
+    def report(self, results, dataset, options):
+        baseline = self.load_baseline(options['baseline'], dataset)
+        for name, result in results.items():
+            line = (
+                f'{name:<20} p50 {result.p50:7.1f} ms  '
+                f'p95 {result.p95:7.1f} ms  p99 {result.p99:7.1f} ms  '
+                f'{result.rps:7.1f} req/s  peak {result.peak_kib:8.0f} KiB'
+            )
+            if name in baseline:
+                change = result.p95 / baseline[name]['p95'] - 1
+                line += f'  p95 {change:+.0%}'
+            if result.errors:
+                line += f'  ошибок: {result.errors}'
+            self.stdout.write(line)
+        # ru_maxrss в Linux — в килобайтах.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(f'Пик памяти процесса: {peak_rss / 1024:.0f} MiB')
+        if options['save_baseline']:
+            self.save_baseline(
+                results,
+                dataset,
+                options,
+                baseline if options['scenario'] else {},
+            )
+            return
+        if not baseline:
+            return
+        regressions = benchmark.compare(
+            results, baseline, options['tolerance']
+        )
+        if regressions:
+            raise CommandError('Не прошли сравнение: ' + ', '.join(
+                f'{name} (нет базового результата)' if change is None
+                else f'{name} (p95 {change:+.0%})'
+                for name, change in sorted(regressions.items())
+            ))
+
+    def save_baseline(self, results, dataset, options, saved):
+        saved = {
+            **saved,
+            **{
+                name: {
+                    key: round(value, 2)
+                    for key, value in result._asdict().items()
+                }
+                for name, result in results.items()
+            },
+        }
+        options['baseline'].write_text(json.dumps(
+            {
+                'dataset': dataset.params(),
+                'iterations': options['iterations'],
+                'results': saved,
+            },
+            indent=2,
+            sort_keys=True,
+        ) + '\n')
+
+    def load_baseline(self, path, dataset):
+        if not path.exists():
+            return {}
+        baseline = json.loads(path.read_text())
+        if baseline['dataset'] != dataset.params():
+            self.stderr.write(
+                'Базовый результат снят на других данных '
+                f'({baseline["dataset"]}), сравнение пропущено.'
+            )
+            return {}
+        return baseline['results']
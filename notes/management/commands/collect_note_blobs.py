@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from notes.models import NoteBlob, RevisionContent
+from notes.sharding import get_shards
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Удаляет тексты заметок и ревизий, на которые не осталось '
+            'ссылок, и показывает, сколько места сэкономила дедупликация.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Сначала пересчитать счётчики ссылок по заметкам.',
+        )
+        parser.add_argument(
+            '--database',
+            nargs='*',
+            help='Базы с заметками; по умолчанию все шарды.',
+        )
+
+    def handle(self, *args, **options):
+        for alias in options['database'] or dict.fromkeys(get_shards()):
+            blobs = NoteBlob.objects.using(alias)
+            if options['recount']:
+                blobs.recount()
+            deleted = blobs.collect_garbage(options['batch_size'])
+            contents = RevisionContent.objects.using(alias).collect_garbage(
+                options['batch_size']
+            )
+            self.stdout.write(
+                f'{alias}: удалено текстов: {deleted}, '
+                f'содержимого ревизий: {contents}'
+            )
+            stats = blobs.stats()
+            share = stats['saved'] / (stats['logical'] or 1)
+            self.stdout.write(
+                f'{alias}: ссылок {stats["references"]}, '
+                f'текстов {stats["blobs"]}, '
+                f'хранится {stats["stored"]} байт '
+                f'вместо {stats["logical"]}, '
+                f'сэкономлено {stats["saved"]} ({share:.0%})'
+            )
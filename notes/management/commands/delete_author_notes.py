@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import tasks
+from notes.deletion import CHUNK_SIZE, delete_author_notes, delete_user
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Удаляет заметки авторов пачками короткими транзакциями, '
+            'показывая ход удаления; с --delete-user — и самих авторов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('author_ids', nargs='+', type=int)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--delete-user',
+            action='store_true',
+            help='После заметок удалить и пользователя.',
+        )
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Поставить в очередь фоновых задач, см. run_tasks.',
+        )
+
+    def handle(self, *args, **options):
+        for author_id in options['author_ids']:
+            if options['background']:
+                task = tasks.enqueue(
+                    'notes.delete_author',
+                    author_id=author_id,
+                    delete_user=options['delete_user'],
+                    chunk_size=options['chunk_size'],
+                )
+                self.stdout.write(f'{author_id}: в очереди задача {task}')
+                continue
+            kwargs = {
+                'chunk_size': options['chunk_size'],
+                'progress': self.progress(author_id),
+            }
+            if options['delete_user']:
+                try:
+                    user = User.objects.get(pk=author_id)
+                except User.DoesNotExist:
+                    raise CommandError(f'Нет пользователя {author_id}.')
+                deleted = delete_user(user, **kwargs)
+            else:
+                deleted = delete_author_notes(author_id, **kwargs)
+            self.stdout.write(f'{author_id}: удалено заметок: {deleted}')
+
+    def progress(self, author_id):
+        def report(deleted, total):
+            self.stdout.write(f'{author_id}: {deleted} из {total}')
+            self.stdout.flush()
+        return report
@@ -0,0 +1,40 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает все заметки пользователя потоком.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('Пользователь не найден.')
+        chunks = export.export_notes(
+            author, options['format'], options['chunk_size']
+        )
+        if options['output'] is None:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -0,0 +1,66 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import importer, tasks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Импортирует заметки пользователя из файла JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=importer.READERS,
+            help='По умолчанию определяется по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Поставить в очередь фоновых задач, см. run_tasks.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('Пользователь не найден.')
+        import_format = options['format'] or (
+            os.path.splitext(options['path'])[1].lstrip('.').lower()
+        )
+        if import_format not in importer.READERS:
+            raise CommandError('Не удалось определить формат файла.')
+        if options['background']:
+            # Воркер читает файл позже и, возможно, из другого каталога.
+            task = tasks.enqueue(
+                'notes.import',
+                owner_id=author.pk,
+                path=os.path.abspath(options['path']),
+                import_format=import_format,
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(f'Задача поставлена в очередь: {task}')
+            return
+        with open(options['path'], encoding='utf-8', newline='') as lines:
+            result = importer.import_notes(
+                author,
+                importer.READERS[import_format](lines),
+                options['batch_size'],
+            )
+        for number, errors in result.errors.items():
+            for field, messages in errors.items():
+                self.stderr.write(
+                    f'Строка {number}, {field}: {" ".join(messages)}'
+                )
+        self.stdout.write(
+            f'Создано заметок: {result.created}, пачек: {result.batches}, '
+            f'пропущено строк: {len(result.errors)}'
+        )
@@ -0,0 +1,110 @@
+import random
+import string
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notes.fields import COMPRESS_LEVEL, compress, decompress
+from notes.models import Note, NoteBlob, make_excerpt
+
+User = get_user_model()
+
+
+def prose(size):
+    words = ('заметка', 'текст', 'данные', 'lorem', 'ipsum', 'dolor')
+    rng = random.Random(size)
+    return ' '.join(rng.choice(words) for _ in range(size // 6))[:size]
+
+
+def log(size):
+    lines = (
+        f'2024-01-01T00:00:{index % 60:02d} INFO worker-{index % 8} '
+        f'request {index} done in {index % 997} ms'
+        for index in range(size // 40 + 1)
+    )
+    return '\n'.join(lines)[:size]
+
+
+def noise(size):
+    rng = random.Random(size)
+    return ''.join(rng.choice(string.printable) for _ in range(size))
+
+
+SAMPLES = {'prose': prose, 'log': log, 'noise': noise}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер хранения и время чтения текстов заметок '
+            'со сжатием и без него на сгенерированных данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[200, 2000, 50000]
+        )
+        parser.add_argument('--notes', type=int, default=500)
+        parser.add_argument('--level', type=int, default=COMPRESS_LEVEL)
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        old_name = creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            author = User.objects.create(username='measure')
+            for kind, make_text in SAMPLES.items():
+                for size in options['sizes']:
+                    text = make_text(size)
+                    self.report(
+                        author, f'{kind}/{size}', text,
+                        options['notes'], options['level'],
+                    )
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+
+    def report(self, author, label, text, count, level):
+        raw = len(text.encode())
+        stored = compress(text, level=level)
+        decode = self.per_call(lambda: text.encode().decode(), count)
+        unpack = self.per_call(lambda: decompress(stored), count)
+        lazy, eager = self.measure_reads(author, text, count)
+        self.stdout.write(
+            f'{label}: {raw} -> {len(stored)} bytes '
+            f'({len(stored) / raw:.0%}), decode {decode:.1f} us, '
+            f'decompress {unpack:.1f} us, page of {count} notes '
+            f'without text access {lazy:.1f} ms, with {eager:.1f} ms'
+        )
+
+    @staticmethod
+    def per_call(func, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        return (time.perf_counter() - start) / count * 1e6
+
+    @staticmethod
+    def measure_reads(author, text, count):
+        Note.objects.filter(author=author).delete()
+        key = NoteBlob.objects.acquire([text] * count)[0]
+        Note.objects.bulk_create(
+            (
+                Note(
+                    title=f'Note {index}',
+                    text=text,
+                    excerpt=make_excerpt(text),
+                    slug=f'note-{index}',
+                    author=author,
+                    blob_id=key,
+                )
+                for index in range(count)
+            ),
+            batch_size=500,
+        )
+        queryset = Note.objects.filter(author=author).with_text()
+        timings = []
+        for access in (False, True):
+            start = time.perf_counter()
+            for note in queryset.all():
+                if access:
+                    note.text
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notes.models import Note, NoteBlob, make_excerpt
+from notes.views import NotesList
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает полную и облегчённую выборку для списка заметок '
+            'на сгенерированных данных во временной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=20000)
+        parser.add_argument('--text-size', type=int, default=20000)
+        parser.add_argument('--pages', type=int, default=200)
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        old_name = creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            author = self.seed(options['notes'], options['text_size'])
+            queryset = Note.objects.filter(author=author).order_by('id')
+            full = queryset.with_text()
+            lean = queryset.only(*NotesList.list_fields)
+            for label, pages in (('full', full), ('lean', lean)):
+                elapsed, loaded = self.measure(
+                    pages, options['pages'], NotesList.paginate_by
+                )
+                self.stdout.write(
+                    f'{label}: {elapsed * 1000:.1f} ms, '
+                    f'{loaded} bytes of text loaded'
+                )
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count, text_size):
+        author = User.objects.create(username='measure')
+        text = ('Lorem ipsum dolor sit amet. ' * (text_size // 28 + 1))
+        # Тексты разные: иначе все заметки сослались бы на один NoteBlob.
+        texts = [f'{index}. {text}'[:text_size] for index in range(count)]
+        digests = NoteBlob.objects.acquire(texts)
+        Note.objects.bulk_create(
+            (
+                Note(
+                    title=f'Note {index}',
+                    text=text,
+                    excerpt=make_excerpt(text),
+                    slug=f'note-{index}',
+                    author=author,
+                    blob_id=key,
+                )
+                for index, (text, key) in enumerate(zip(texts, digests))
+            ),
+            batch_size=500,
+        )
+        return author
+
+    @staticmethod
+    def measure(queryset, pages, page_size):
+        loaded = 0
+        last_id = 0
+        start = time.perf_counter()
+        for _ in range(pages):
+            rows = list(queryset.filter(id__gt=last_id)[:page_size])
+            if not rows:
+                last_id = 0
+                continue
+            for note in rows:
+                # Текст загружен, если вместе с заметкой выбран NoteBlob.
+                if Note.blob.is_cached(note):
+                    loaded += len(note.text)
+            last_id = rows[-1].id
+        return time.perf_counter() - start, loaded
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from notes.benchmark import Dataset
+from notes.models import Note
+from yanote.compression import compress_bytes, compress_stream, get_config
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает процессорное время сжатия ответов gzip '
+            'с выигрышем в байтах на страницах тяжёлого пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=300)
+        parser.add_argument('--levels', type=int, nargs='+', default=[1, 6, 9])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        old_name = creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(DEBUG=False):
+                bodies = self.fetch_bodies(options['notes'], options['seed'])
+            flush_size = get_config()['FLUSH_SIZE']
+            for label, chunks in bodies.items():
+                for level in options['levels']:
+                    if len(chunks) == 1:
+                        self.report(
+                            f'{label} L{level}', chunks,
+                            lambda: [compress_bytes(chunks[0], level)],
+                            options['repeat'],
+                        )
+                        continue
+                    # Сброс после каждого куска — как у GZipMiddleware.
+                    for flush in (flush_size, 0):
+                        self.report(
+                            f'{label} L{level} flush={flush}', chunks,
+                            lambda: list(
+                                compress_stream(chunks, level, flush)
+                            ),
+                            options['repeat'],
+                        )
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+
+    @staticmethod
+    def fetch_bodies(notes, seed):
+        """Несжатые тела ответов; потоковые — списком кусков."""
+        author = Dataset(1, notes, seed).generate()[0]
+        client = Client()
+        client.force_login(author)
+        longest = max(
+            Note.objects.for_author(author).with_text(),
+            key=lambda note: len(note.text),
+        )
+        urls = {
+            'notes:list': reverse('notes:list'),
+            'notes:detail': reverse('notes:detail', args=(longest.slug,)),
+            'notes:api_list': reverse('notes:api_list'),
+            'notes:export jsonl': reverse('notes:export', args=('jsonl',)),
+        }
+        bodies = {}
+        for label, url in urls.items():
+            response = client.get(url)
+            if response.streaming:
+                bodies[label] = list(response.streaming_content)
+            else:
+                bodies[label] = [response.content]
+        return bodies
+
+    def report(self, label, chunks, compress, repeat):
+        raw = sum(len(chunk) for chunk in chunks)
+        start = time.process_time()
+        for _ in range(repeat):
+            blocks = compress()
+        cpu = (time.process_time() - start) / repeat
+        size = sum(len(block) for block in blocks)
+        self.stdout.write(
+            f'{label}: {raw} -> {size} bytes ({size / raw:.0%}), '
+            f'{len(blocks)} blocks, {cpu * 1000:.2f} ms CPU, '
+            f'{raw / cpu / 2 ** 20 if cpu else 0:.0f} MiB/s, '
+            f'saved {(raw - size) / 1024 / (cpu * 1000 or 1):.0f} KiB per ms'
+        )
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from notes.models import Note, NoteBlob
+from notes.revisions import digest
+from notes.sharding import get_shards
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Переносит тексты заметок из notes_note в NoteBlob пачками, '
+            'не останавливая приложение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear-legacy',
+            action='store_true',
+            help=('Очистить старый столбец text у перенесённых заметок. '
+                  'Только когда все процессы работают с NOTES_WRITE_'
+                  'LEGACY_TEXT = False.'),
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--database',
+            nargs='*',
+            help='Базы с заметками; по умолчанию все шарды.',
+        )
+
+    def handle(self, *args, **options):
+        for alias in options['database'] or dict.fromkeys(get_shards()):
+            notes = Note.objects.using(alias).order_by('id')
+            if options['clear_legacy']:
+                changed = self.clear_legacy(notes, options['batch_size'])
+            else:
+                changed = self.copy(notes, alias, options['batch_size'])
+            self.stdout.write(f'{alias}: изменено строк: {changed}')
+
+    @staticmethod
+    def copy(notes, using, batch_size):
+        """Тексты заметок без NoteBlob и изменённые старыми процессами."""
+        pending = notes.filter(
+            Q(blob__isnull=True) | ~Q(legacy_text='')
+        ).only('id', 'legacy_text', 'blob')
+        blobs = NoteBlob.objects.using(using)
+        changed = last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return changed
+            last_id = batch[-1].pk
+            # Старый процесс изменил текст только в notes_note.
+            stale = [
+                note for note in batch
+                if note.blob_id != digest(note.legacy_text)
+            ]
+            with transaction.atomic(using=using):
+                blobs.release(note.blob_id for note in stale)
+                digests = blobs.acquire(note.legacy_text for note in stale)
+                for note, key in zip(stale, digests):
+                    note.blob_id = key
+                notes.bulk_update(stale, ('blob',))
+            changed += len(stale)
+
+    @staticmethod
+    def clear_legacy(notes, batch_size):
+        max_id = notes.aggregate(max_id=Max('id'))['max_id'] or 0
+        migrated = notes.filter(blob__isnull=False).exclude(legacy_text='')
+        changed = 0
+        for start in range(0, max_id, batch_size):
+            changed += migrated.filter(
+                id__gt=start, id__lte=start + batch_size
+            ).update(legacy_text='')
+        return changed
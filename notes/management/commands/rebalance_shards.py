@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from notes import rebalance
+from notes.sharding import get_shards, shard_for_author
+
+
+class Command(BaseCommand):
+    help = ('Переносит заметки авторов в шарды, которые им назначает '
+            'текущий NOTE_SHARDS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            nargs='*',
+            help=('Базы, из которых забирать заметки; по умолчанию все '
+                  'шарды. Укажите выводимый из NOTE_SHARDS шард, чтобы '
+                  'освободить его.'),
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=rebalance.BATCH_SIZE
+        )
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--rebuild-registry',
+            action='store_true',
+            help='Заново заполнить реестр slug по всем шардам.',
+        )
+
+    def handle(self, *args, **options):
+        for source in options['source'] or get_shards():
+            for author_id in rebalance.misplaced_authors(source):
+                target = shard_for_author(author_id)
+                if options['dry_run']:
+                    self.stdout.write(
+                        f'Автор {author_id}: {source} -> {target}'
+                    )
+                    continue
+                moved = rebalance.move_author(
+                    author_id, source, target, options['batch_size']
+                )
+                self.stdout.write(
+                    f'Автор {author_id}: {source} -> {target}, '
+                    f'заметок: {moved}'
+                )
+        if options['rebuild_registry'] and not options['dry_run']:
+            registered = rebalance.rebuild_registry(options['batch_size'])
+            self.stdout.write(f'В реестре slug: {registered}')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from notes import search, tasks
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', help='По умолчанию — все шарды с заметками.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Поставить в очередь фоновых задач, см. run_tasks.',
+        )
+
+    def handle(self, *args, **options):
+        if options['background']:
+            task = tasks.enqueue(
+                'notes.reindex',
+                database=options['database'],
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(f'Задача поставлена в очередь: {task}')
+            return
+        indexed = search.rebuild_index(
+            options['database'], options['batch_size']
+        )
+        self.stdout.write(f'Проиндексировано заметок: {indexed}')
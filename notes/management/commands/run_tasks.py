@@ -0,0 +1,75 @@
+import signal
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from threading import Event
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from notes import tasks
+
+# Как часто, в секундах, возвращать брошенные задачи и чистить старые.
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди в базе пулом потоков. '
+            'SIGINT и SIGTERM дают дозавершить начатые задачи.')
+
+    def add_arguments(self, parser):
+        config = tasks.get_config()
+        parser.add_argument('--threads', type=int, default=config['THREADS'])
+        parser.add_argument(
+            '--poll-interval', type=float, default=config['POLL_INTERVAL']
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выйти, когда готовых задач не останется.',
+        )
+
+    def handle(self, *args, **options):
+        # Задачи упираются в базу, а не в процессор, поэтому хватает
+        # потоков: у каждого своё соединение.
+        stop = Event()
+        handlers = {
+            signum: signal.signal(signum, lambda *args: stop.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            processed = self.run_pool(stop, options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f'Выполнено задач: {processed}')
+
+    def run_pool(self, stop, options):
+        maintained = float('-inf')
+        with ThreadPoolExecutor(
+            options['threads'], thread_name_prefix='tasks'
+        ) as pool:
+            workers = [
+                pool.submit(self.work, stop, options)
+                for _ in range(options['threads'])
+            ]
+            running = workers
+            while running:
+                if time.monotonic() - maintained >= MAINTENANCE_INTERVAL:
+                    maintained = time.monotonic()
+                    tasks.requeue_stale()
+                    tasks.purge_expired()
+                done, running = wait(
+                    running, options['poll_interval'], FIRST_EXCEPTION
+                )
+                if any(future.exception() for future in done):
+                    stop.set()
+        return sum(future.result() for future in workers)
+
+    @staticmethod
+    def work(stop, options):
+        try:
+            return tasks.work(
+                stop, options['burst'], options['poll_interval']
+            )
+        finally:
+            connections.close_all()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from yanote.backends.sqlite3.base import DEFAULT_PRAGMAS, apply_pragmas
+
+PROFILES = {
+    # Поведение стандартного бэкенда Django: журнал отката,
+    # отложенные транзакции и тайм-аут модуля sqlite3 по умолчанию.
+    'default': {'pragmas': {}, 'begin': 'BEGIN'},
+    'tuned': {'pragmas': DEFAULT_PRAGMAS, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест SQLite: параллельные чтения и записи '
+            'с настройками по умолчанию и с профилем yanote.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        for name, profile in PROFILES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'loadtest.sqlite3')
+                self.seed(path, profile, options['rows'])
+                result = self.run_profile(path, profile, options)
+            self.stdout.write(
+                f'{name}: '
+                f'{result["reads"] / options["seconds"]:.0f} reads/s, '
+                f'{result["writes"] / options["seconds"]:.0f} writes/s, '
+                f'{result["errors"]} "database is locked" errors'
+            )
+
+    @staticmethod
+    def connect(path, profile):
+        connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        apply_pragmas(connection, profile['pragmas'])
+        return connection
+
+    def seed(self, path, profile, rows):
+        connection = self.connect(path, profile)
+        connection.execute(
+            'CREATE TABLE note (id INTEGER PRIMARY KEY, author_id INTEGER, '
+            'title TEXT, text TEXT)'
+        )
+        connection.execute('CREATE INDEX note_author ON note (author_id)')
+        connection.executemany(
+            'INSERT INTO note (author_id, title, text) VALUES (?, ?, ?)',
+            ((index % 100, f'Note {index}', 'x' * 500)
+             for index in range(rows)),
+        )
+        connection.close()
+
+    def run_profile(self, path, profile, options):
+        counters = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def count(name):
+            with lock:
+                counters[name] += 1
+
+        def reader(number):
+            connection = self.connect(path, profile)
+            while time.monotonic() < deadline:
+                try:
+                    connection.execute(
+                        'SELECT id, title FROM note WHERE author_id = ? '
+                        'ORDER BY id LIMIT 20', (number % 100,)
+                    ).fetchall()
+                    count('reads')
+                except sqlite3.OperationalError:
+                    count('errors')
+            connection.close()
+
+        def writer(number):
+            connection = self.connect(path, profile)
+            while time.monotonic() < deadline:
+                try:
+                    # Чтение и запись в одной транзакции, как при
+                    # сохранении заметки с проверкой slug.
+                    connection.execute(profile['begin'])
+                    connection.execute(
+                        'SELECT count(*) FROM note WHERE author_id = ?',
+                        (number,)
+                    ).fetchone()
+                    connection.execute(
+                        'INSERT INTO note (author_id, title, text) '
+                        'VALUES (?, ?, ?)', (number, 'New', 'y' * 500)
+                    )
+                    connection.execute('COMMIT')
+                    count('writes')
+                except sqlite3.OperationalError:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    count('errors')
+            connection.close()
+
+        threads = [
+            threading.Thread(target=reader, args=(number,))
+            for number in range(options['readers'])
+        ] + [
+            threading.Thread(target=writer, args=(number,))
+            for number in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counters
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик: '
+            'замена настоящей репликации для локальной проверки.')
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError(
+                'Реплики не настроены, см. YANOTE_SQLITE_REPLICAS.'
+            )
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        source = sqlite3.connect(str(primary.settings_dict['NAME']))
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(
+                    str(connections[alias].settings_dict['NAME'])
+                )
+                with target:
+                    source.backup(target)
+                target.close()
+                self.stdout.write(f'{alias}: скопировано')
+        finally:
+            source.close()
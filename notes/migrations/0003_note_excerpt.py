@@ -0,0 +1,41 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+EXCERPT_LENGTH = 200
+BATCH_SIZE = 1000
+
+
+def fill_excerpts(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    notes = Note.objects.using(schema_editor.connection.alias)
+    last_id = 0
+    while True:
+        batch = list(
+            notes.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for note in batch:
+            text = ' '.join(note.text.split())
+            if len(text) > EXCERPT_LENGTH:
+                text = text[:EXCERPT_LENGTH - 1].rstrip() + '…'
+            note.excerpt = text
+        notes.bulk_update(batch, ('excerpt',))
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Фрагмент текста'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_fts'),
+    ]
+
+    operations = [
+        # Существующие заметки получают время применения миграции.
+        migrations.AddField(
+            model_name='note',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Создана'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'updated_at'], name='note_author_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def record_existing_notes(apps, schema_editor):
+    """Существующие заметки попадают в журнал как созданные."""
+    Note = apps.get_model('notes', 'Note')
+    NoteChange = apps.get_model('notes', 'NoteChange')
+    using = schema_editor.connection.alias
+    notes = Note.objects.using(using).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(
+            notes.filter(id__gt=last_id)
+            .values_list('id', 'slug', 'author_id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        NoteChange.objects.using(using).bulk_create(
+            NoteChange(
+                note_id=note_id, slug=slug, author_id=author_id,
+                action='upsert',
+            )
+            for note_id, slug, author_id in batch
+        )
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0005_note_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField(db_index=True)),
+                ('slug', models.SlugField(db_index=False, max_length=100)),
+                ('action', models.CharField(choices=[('upsert', 'Создана или изменена'), ('delete', 'Удалена')], max_length=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notechange',
+            index=models.Index(fields=['author', 'id'], name='notechange_author_id_idx'),
+        ),
+        migrations.RunPython(record_existing_notes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0006_note_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSlug',
+            fields=[
+                ('slug', models.SlugField(max_length=100, primary_key=True, serialize=False)),
+                ('author_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:49
+
+from django.db import migrations
+
+import notes.fields
+
+BATCH_SIZE = 1000
+
+
+def iter_batches(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    notes = Note.objects.using(schema_editor.connection.alias).only(
+        'id', 'text'
+    )
+    last_id = 0
+    while True:
+        batch = list(
+            notes.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        yield notes, batch
+        last_id = batch[-1].id
+
+
+def compress_texts(apps, schema_editor):
+    # Старые строки читаются как str, сжатые — как CompressedText.
+    for notes, batch in iter_batches(apps, schema_editor):
+        legacy = [
+            note for note in batch if isinstance(note.__dict__['text'], str)
+        ]
+        if legacy:
+            notes.bulk_update(legacy, ('text',))
+
+
+def decompress_texts(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for _, batch in iter_batches(apps, schema_editor):
+            cursor.executemany(
+                'UPDATE notes_note SET text = %s WHERE id = %s',
+                [(note.text, note.id) for note in batch],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_shards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import notes.fields
+
+BATCH_SIZE = 1000
+
+COPY_SQL = (
+    'INSERT INTO notes_notebody (note_id, text) '
+    'SELECT id, text FROM notes_note AS note '
+    'WHERE id > %s AND id <= %s AND NOT EXISTS ('
+    'SELECT 1 FROM notes_notebody AS body WHERE body.note_id = note.id)'
+)
+RESTORE_SQL = (
+    'UPDATE notes_note SET text = ('
+    'SELECT text FROM notes_notebody WHERE note_id = notes_note.id) '
+    'WHERE EXISTS ('
+    'SELECT 1 FROM notes_notebody WHERE note_id = notes_note.id)'
+)
+
+
+def copy_bodies(apps, schema_editor):
+    # Миграция не атомарна: каждая пачка фиксируется сразу и не держит
+    # блокировку записи на всё время переноса.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MAX(id) FROM notes_note')
+        max_id = cursor.fetchone()[0] or 0
+        for start in range(0, max_id, BATCH_SIZE):
+            cursor.execute(COPY_SQL, [start, start + BATCH_SIZE])
+
+
+def restore_texts(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(RESTORE_SQL)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('notes', '0008_note_text_compressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteBody',
+            fields=[
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='notes.note')),
+                ('text', notes.fields.CompressedTextField(blank=True, verbose_name='Текст')),
+            ],
+        ),
+        # Столбец text остаётся на месте: старые процессы продолжают
+        # с ним работать, пока выкатывается новая версия.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='note',
+                    name='text',
+                ),
+                migrations.AddField(
+                    model_name='note',
+                    name='legacy_text',
+                    field=notes.fields.CompressedTextField(blank=True, db_column='text', default='', editable=False),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_bodies, restore_texts),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:15
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+import django.utils.timezone
+import notes.fields
+from notes import revisions
+
+BATCH_SIZE = 1000
+
+
+def create_first_revisions(apps, schema_editor):
+    # Текущий текст каждой заметки становится её первой ревизией.
+    # Пачки фиксируются по одной, как в 0009_note_body.
+    Note = apps.get_model('notes', 'Note')
+    NoteRevision = apps.get_model('notes', 'NoteRevision')
+    RevisionContent = apps.get_model('notes', 'RevisionContent')
+    using = schema_editor.connection.alias
+    notes = Note.objects.using(using).filter(
+        revisions__isnull=True
+    ).select_related('body').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(notes.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        texts = {}
+        for note in batch:
+            try:
+                texts[note.pk] = note.body.text
+            except Note.body.RelatedObjectDoesNotExist:
+                texts[note.pk] = note.legacy_text
+        with transaction.atomic(using=using):
+            RevisionContent.objects.using(using).bulk_create(
+                (
+                    RevisionContent(digest=revisions.digest(text), data=text)
+                    for text in set(texts.values())
+                ),
+                ignore_conflicts=True,
+            )
+            NoteRevision.objects.using(using).bulk_create(
+                NoteRevision(
+                    note_id=note.pk,
+                    number=1,
+                    title=note.title,
+                    content_id=revisions.digest(texts[note.pk]),
+                    size=len(texts[note.pk]),
+                    created_at=note.updated_at,
+                )
+                for note in batch
+            )
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('notes', '0009_note_body'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevisionContent',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('data', notes.fields.CompressedTextField()),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='notes.revisioncontent')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер')),
+                ('title', models.CharField(max_length=100, verbose_name='Заголовок')),
+                ('size', models.PositiveIntegerField(verbose_name='Символов')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создана')),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='notes.revisioncontent')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='notes.note')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='noterevision',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='note_revision_number_uniq'),
+        ),
+        migrations.RunPython(
+            create_first_revisions, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:21
+
+from collections import Counter
+
+from django.db import migrations, models, transaction
+from django.db.models import F
+import django.db.models.deletion
+import notes.fields
+from notes import revisions
+
+BATCH_SIZE = 1000
+
+
+def move_bodies(apps, schema_editor):
+    # Тексты из NoteBody переносятся в NoteBlob пачками, каждая пачка
+    # фиксируется сразу, как в 0009_note_body.
+    Note = apps.get_model('notes', 'Note')
+    NoteBlob = apps.get_model('notes', 'NoteBlob')
+    NoteBody = apps.get_model('notes', 'NoteBody')
+    using = schema_editor.connection.alias
+    bodies = NoteBody.objects.using(using).filter(
+        note__blob__isnull=True
+    ).order_by('note_id')
+    blobs = NoteBlob.objects.using(using)
+    last_id = 0
+    while True:
+        batch = list(bodies.filter(note_id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        texts = {body.note_id: body.text for body in batch}
+        digests = {
+            note_id: revisions.digest(text) for note_id, text in texts.items()
+        }
+        counts = Counter(digests.values())
+        with transaction.atomic(using=using):
+            existing = set(
+                blobs.filter(pk__in=counts).values_list('pk', flat=True)
+            )
+            for key in existing:
+                blobs.filter(pk=key).update(
+                    refcount=F('refcount') + counts[key]
+                )
+            created = {}
+            for note_id, text in texts.items():
+                key = digests[note_id]
+                if key not in existing:
+                    created[key] = NoteBlob(
+                        digest=key,
+                        text=text,
+                        size=len(text.encode()),
+                        refcount=counts[key],
+                    )
+            blobs.bulk_create(created.values())
+            Note.objects.using(using).bulk_update(
+                [
+                    Note(pk=note_id, blob_id=key)
+                    for note_id, key in digests.items()
+                ],
+                ('blob',),
+            )
+        last_id = batch[-1].note_id
+
+
+def restore_bodies(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    NoteBody = apps.get_model('notes', 'NoteBody')
+    using = schema_editor.connection.alias
+    notes = Note.objects.using(using).filter(
+        blob__isnull=False
+    ).select_related('blob').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(notes.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        NoteBody.objects.using(using).bulk_create(
+            NoteBody(note_id=note.pk, text=note.blob.text) for note in batch
+        )
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('notes', '0010_note_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('text', notes.fields.CompressedTextField(blank=True, verbose_name='Текст')),
+                ('size', models.PositiveIntegerField(verbose_name='Байт')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Ссылок')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='noteblob',
+            index=models.Index(condition=models.Q(('refcount__lte', 0)), fields=['refcount'], name='noteblob_unreferenced_idx'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='blob',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='notes.noteblob'),
+        ),
+        migrations.RunPython(move_bodies, restore_bodies),
+        migrations.DeleteModel(
+            name='NoteBody',
+        ),
+    ]
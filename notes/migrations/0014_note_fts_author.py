@@ -0,0 +1,56 @@
+from django.db import migrations
+
+FTS_TABLE = 'notes_note_fts'
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+
+
+def rebuild_fts_table(schema_editor, column, definition, value):
+    # FTS5 хранит копию столбцов, поэтому индекс переносится без
+    # обращения к заметкам: новая таблица заполняется из старой.
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {FTS_TABLE}_new USING fts5('
+        f'title, text, {definition}, {TOKENIZE})'
+    )
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE}_new (rowid, title, text, {column}) '
+        f'SELECT rowid, title, text, {value} FROM {FTS_TABLE}'
+    )
+    schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+    schema_editor.execute(
+        f'ALTER TABLE {FTS_TABLE}_new RENAME TO {FTS_TABLE}'
+    )
+
+
+def index_author(apps, schema_editor):
+    # Автор ищется внутри MATCH, а не фильтром после него: иначе FTS5
+    # находит и ранжирует совпадения всех пользователей.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    rebuild_fts_table(
+        schema_editor, 'author', 'author', "'a' || author_id"
+    )
+    # Столбец автора не влияет на релевантность.
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+        "VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')"
+    )
+
+
+def unindex_author(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    rebuild_fts_table(
+        schema_editor, 'author_id', 'author_id UNINDEXED',
+        'CAST(substr(author, 2) AS INTEGER)',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0013_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_author, unindex_author),
+    ]
@@ -1,7 +1,76 @@
+from collections import Counter, defaultdict
+from functools import partial
+
 from django.conf import settings
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import revisions
+from .fields import CompressedTextField
+from .sharding import REGISTRY_DB, db_for_author
+from .slugs import SLUG_MAX_LENGTH, save_with_unique_slug
+
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Короткий фрагмент текста заметки для списков."""
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length - 1].rstrip() + '…'
+
+
+class AuthorQuerySet(models.QuerySet):
+
+    def for_author(self, author):
+        """Записи автора из его шарда."""
+        queryset = self.filter(author=author)
+        shard = db_for_author(author.pk)
+        return queryset.using(shard) if shard else queryset
+
+
+class NoteQuerySet(AuthorQuerySet):
+
+    def create(self, **kwargs):
+        # QuerySet.create() передаёт в save() базу, выбранную роутером
+        # без экземпляра; без using() шард выбирается по самой заметке.
+        if self._db is not None:
+            return super().create(**kwargs)
+        note = self.model(**kwargs)
+        note.save(force_insert=True)
+        return note
+
+    def with_text(self):
+        """Заметки вместе с текстом из NoteBlob одним запросом."""
+        return self.select_related('blob')
+
+    def only_fields(self, *fields):
+        """only(), в котором можно указать text."""
+        if 'text' not in fields:
+            return self.only(*fields)
+        fields = [field for field in fields if field != 'text']
+        return self.with_text().only(*fields, 'blob', 'blob__text')
+
 
-from pytils.translit import slugify
+class NoteManager(models.Manager.from_queryset(NoteQuerySet)):
+
+    def get_queryset(self):
+        # Старый столбец текста читается, только если у заметки нет NoteBlob.
+        return super().get_queryset().defer('legacy_text')
+
+
+def legacy_text(text):
+    """Значение старого столбца текста при записи заметки.
+
+    Пока выкатывается версия с NoteBlob, старые процессы читают текст
+    из notes_note: NOTES_WRITE_LEGACY_TEXT = True продолжает его писать.
+    """
+    if getattr(settings, 'NOTES_WRITE_LEGACY_TEXT', False):
+        return text
+    return ''
 
 
 class Note(models.Model):
@@ -11,29 +80,552 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
-        'Текст',
-        help_text='Добавьте подробностей'
+    # Текст заметки живёт в NoteBlob (см. свойство text). Столбец остался
+    # от прежней схемы и очищается командой migrate_note_bodies.
+    legacy_text = CompressedTextField(
+        db_column='text', blank=True, default='', editable=False
+    )
+    # Одинаковые тексты разных заметок хранятся одной записью NoteBlob.
+    blob = models.ForeignKey(
+        'NoteBlob',
+        on_delete=models.PROTECT,
+        null=True,
+        editable=False,
+        related_name='+',
     )
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
-        max_length=100,
+        max_length=SLUG_MAX_LENGTH,
         unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
                    'латиницу, цифры, дефисы и знаки подчёркивания')
     )
+    excerpt = models.CharField(
+        'Фрагмент текста',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False,
+    )
+    # Без ограничения внешнего ключа: заметки могут лежать в шарде,
+    # где нет таблицы пользователей. Заметки удалённого пользователя
+    # удаляются пачками по сигналу pre_delete (см. notes.deletion),
+    # а не каскадом, который загрузил бы их все в память.
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
     )
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NoteManager()
+
+    class Meta:
+        indexes = (
+            # Покрывает выборку заметок автора с курсорной пагинацией.
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+            # Покрывает вычисление валидаторов для условных запросов.
+            models.Index(
+                fields=('author', 'updated_at'),
+                name='note_author_updated_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    # Изменялся ли текст после загрузки заметки.
+    _text_changed = False
+
+    @property
+    def text(self):
+        """Текст заметки, читается из NoteBlob при первом обращении."""
+        if '_text' not in self.__dict__:
+            self._text = self.load_text()
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if '_text' in self.__dict__ and not self._text_changed:
+            # Прежний текст — база дельты для новой ревизии.
+            self._previous_text = self._text
+        self._text = value
+        self._text_changed = True
+
+    def load_text(self):
+        if self._state.adding:
+            return ''
+        if self.blob_id is None:
+            # Заметку записал процесс, не знающий о NoteBlob.
+            return self.legacy_text
+        return self.blob.text
+
+    def refresh_from_db(self, using=None, fields=None):
+        if fields is None:
+            self.__dict__.pop('_text', None)
+            self.__dict__.pop('_previous_text', None)
+            self._text_changed = False
+        super().refresh_from_db(using, fields)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        adding = self._state.adding
+        write_body = adding or self._text_changed
+        if write_body:
+            self.excerpt = make_excerpt(self.text)
+            self.legacy_text = legacy_text(self.text)
+        released = None
+        with transaction.atomic(using=using):
+            blobs = NoteBlob.objects.using(using)
+            if write_body and self.blob_id != revisions.digest(self.text):
+                released = self.blob_id
+                self.blob_id, = blobs.acquire((self.text,))
+            save_with_unique_slug(
+                self, partial(super().save, *args, **kwargs), using
+            )
+            if released is not None:
+                blobs.release((released,))
+            if write_body:
+                NoteRevision.objects.record(
+                    self,
+                    using,
+                    self.__dict__.pop('_previous_text', None),
+                    created=adding,
+                )
+        self._text_changed = False
+
+
+class NoteChange(models.Model):
+    """Последнее изменение заметки в журнале синхронизации.
+
+    id служит курсором: для каждой заметки хранится только последняя
+    запись, удаление оставляет запись-надгробие.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = (
+        (UPSERT, 'Создана или изменена'),
+        (DELETE, 'Удалена'),
+    )
+
+    # Без ограничения внешнего ключа: надгробия пишутся и при каскадном
+    # удалении пользователя, а убираются после удаления его самого.
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    note_id = models.BigIntegerField(db_index=True)
+    slug = models.SlugField(max_length=SLUG_MAX_LENGTH, db_index=False)
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AuthorQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='notechange_author_id_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.action} {self.slug}'
+
+
+class NoteSlug(models.Model):
+    """Реестр slug всех шардов, хранится в основной базе."""
+    slug = models.SlugField(max_length=SLUG_MAX_LENGTH, primary_key=True)
+    author_id = models.BigIntegerField()
+
+    def __str__(self):
+        return self.slug
+
+
+class NoteBlobQuerySet(models.QuerySet):
+
+    def acquire(self, texts):
+        """Добавляет по ссылке на каждый текст, создавая недостающие записи.
+
+        Возвращает ключи текстов в том же порядке.
+        """
+        texts = list(texts)
+        digests = [revisions.digest(text) for text in texts]
+        counts = Counter(digests)
+        existing = set(self.filter(pk__in=counts).values_list('pk', flat=True))
+        created = {}
+        for key, text in zip(digests, texts):
+            if key not in existing and key not in created:
+                created[key] = NoteBlob(
+                    digest=key,
+                    text=text,
+                    size=len(text.encode()),
+                    refcount=counts[key],
+                )
+        # Запись, которую успел создать параллельный процесс, останется
+        # с заниженным счётчиком; сборщик мусора проверяет и сами ссылки.
+        self.bulk_create(created.values(), ignore_conflicts=True)
+        self._shift({key: counts[key] for key in existing}, 1)
+        return digests
+
+    def release(self, digests):
+        """Снимает по ссылке с каждого ключа; None пропускается."""
+        self._shift(Counter(key for key in digests if key is not None), -1)
+
+    def _shift(self, counts, sign):
+        # Одно обновление на каждое встретившееся число ссылок.
+        by_count = defaultdict(list)
+        for key, count in counts.items():
+            by_count[count].append(key)
+        for count, keys in by_count.items():
+            self.filter(pk__in=keys).update(
+                refcount=F('refcount') + sign * count
+            )
+
+    def unreferenced(self):
+        return self.filter(refcount__lte=0).filter(
+            ~Exists(Note.objects.filter(blob=OuterRef('pk')))
+        )
+
+    def collect_garbage(self, batch_size=1000):
+        """Удаляет тексты без ссылок пачками, возвращает их число."""
+        deleted = 0
+        while True:
+            keys = list(
+                self.unreferenced().values_list('pk', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            # Условие проверяется ещё раз: текст мог снова понадобиться.
+            deleted += self.unreferenced().filter(pk__in=keys)._raw_delete(
+                self.db
+            )
+
+    def recount(self):
+        """Пересчитывает счётчики ссылок по заметкам."""
+        references = Note.objects.filter(blob=OuterRef('pk')).order_by()
+        return self.update(
+            refcount=Coalesce(
+                Subquery(
+                    references.values('blob').annotate(
+                        count=Count('pk')
+                    ).values('count')
+                ),
+                0,
+            )
+        )
+
+    def stats(self):
+        """Сколько байт текста хранится и сколько заняли бы копии."""
+        stats = self.filter(refcount__gt=0).aggregate(
+            blobs=Count('pk'),
+            references=Sum('refcount'),
+            stored=Sum('size'),
+            logical=Sum(F('size') * F('refcount')),
+        )
+        stats = {key: value or 0 for key, value in stats.items()}
+        stats['saved'] = stats['logical'] - stats['stored']
+        return stats
+
 
+class NoteBlob(models.Model):
+    """Текст заметки, адресуемый по SHA-256, со счётчиком ссылок.
+
+    Строки notes_note остаются узкими: списки, поиск по slug
+    и администратор не читают страницы SQLite с длинными текстами.
+    Текст загружает только тот, кому он нужен: Note.objects.with_text()
+    или обращение к Note.text. Записи без ссылок удаляет команда
+    collect_note_blobs.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    text = CompressedTextField('Текст', blank=True)
+    size = models.PositiveIntegerField('Байт')
+    refcount = models.IntegerField('Ссылок', default=0)
+
+    objects = NoteBlobQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('refcount',),
+                name='noteblob_unreferenced_idx',
+                condition=models.Q(refcount__lte=0),
+            ),
+        )
+
+    def __str__(self):
+        return self.digest
+
+
+class RevisionContentQuerySet(models.QuerySet):
+
+    def unreferenced(self):
+        return self.filter(
+            ~Exists(NoteRevision.objects.filter(content=OuterRef('pk'))),
+            ~Exists(RevisionContent.objects.filter(base=OuterRef('pk'))),
+        )
+
+    def collect_garbage(self, batch_size=1000):
+        """Удаляет содержимое удалённых ревизий, возвращает число записей.
+
+        Удалённая дельта может оставить без ссылок свою базу: такие
+        записи удаляются следующими пачками.
+        """
+        deleted = 0
+        while True:
+            keys = list(
+                self.unreferenced().values_list('pk', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += self.unreferenced().filter(pk__in=keys)._raw_delete(
+                self.db
+            )
+
+
+class RevisionContent(models.Model):
+    """Текст ревизии, адресуемый по SHA-256: одинаковый текст хранится раз.
+
+    Снимок (base пуст) хранит текст целиком, остальные записи — дельту
+    от base (см. notes.revisions). depth — число дельт до снимка.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    base = models.ForeignKey(
+        'self',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    depth = models.PositiveSmallIntegerField(default=0)
+    data = CompressedTextField()
+
+    objects = RevisionContentQuerySet.as_manager()
+
+    def __str__(self):
+        return self.digest
+
+    @classmethod
+    def build(cls, text, base=None, base_text=None):
+        """Несохранённое содержимое: дельта от base, если она выгодна."""
+        key = revisions.digest(text)
+        if base is not None and base.depth + 1 < revisions.SNAPSHOT_INTERVAL:
+            delta = revisions.make_delta(base_text, text)
+            if delta is not None:
+                return cls(
+                    digest=key, base=base, depth=base.depth + 1, data=delta
+                )
+        return cls(digest=key, data=text)
+
+    def get_text(self):
+        """Текст ревизии: снимок и не больше SNAPSHOT_INTERVAL - 1 дельт."""
+        chain = [self]
+        while chain[-1].base_id is not None:
+            chain.append(
+                type(self).objects.using(self._state.db).get(
+                    digest=chain[-1].base_id
+                )
+            )
+        text = chain.pop().data
+        for content in reversed(chain):
+            text = revisions.apply_delta(text, content.data)
+        return text
+
+
+class NoteRevisionQuerySet(models.QuerySet):
+
+    def record(self, note, using, previous_text=None, created=False):
+        """Записывает текущие заголовок и текст заметки новой ревизией."""
+        queryset = self.using(using)
+        latest = None
+        if not created:
+            latest = queryset.filter(note=note).select_related(
+                'content'
+            ).order_by('-number').first()
+        revision = next_revision(note, latest, previous_text)
+        if revision is None:
+            return latest
+        RevisionContent.objects.using(using).bulk_create(
+            (revision.content,), ignore_conflicts=True
+        )
+        revision.save(using=using)
+        return revision
+
+    def record_updated(self, notes, using):
+        """Ревизии пачки изменённых заметок, как record() для каждой.
+
+        Прежний текст заметки берётся из _previous_text, который
+        оставляет сеттер Note.text.
+        """
+        queryset = self.using(using)
+        latest = {
+            revision.note_id: revision
+            for revision in queryset.filter(
+                note__in=notes,
+                number=Subquery(
+                    queryset.filter(note=OuterRef('note')).order_by(
+                        '-number'
+                    ).values('number')[:1]
+                ),
+            ).select_related('content')
+        }
+        created = []
+        for note in notes:
+            revision = next_revision(
+                note,
+                latest.get(note.pk),
+                note.__dict__.pop('_previous_text', None),
+            )
+            if revision is not None:
+                created.append(revision)
+        RevisionContent.objects.using(using).bulk_create(
+            {revision.content_id: revision.content
+             for revision in created}.values(),
+            ignore_conflicts=True,
+        )
+        queryset.bulk_create(created)
+
+    def record_created(self, notes, using):
+        """Первые ревизии массово созданных заметок."""
+        contents = {}
+        for note in notes:
+            content = RevisionContent.build(note.text)
+            contents[content.digest] = content
+        RevisionContent.objects.using(using).bulk_create(
+            contents.values(), ignore_conflicts=True
+        )
+        self.using(using).bulk_create(
+            NoteRevision(
+                note_id=note.pk,
+                number=1,
+                title=note.title,
+                content_id=revisions.digest(note.text),
+                size=len(note.text),
+            )
+            for note in notes
+        )
+
+
+def next_revision(note, latest, previous_text=None):
+    """Несохранённая ревизия после latest или None, если нечего записать.
+
+    Содержимое ревизии — в revision.content, его нужно сохранить первым.
+    """
+    text = note.text
+    key = revisions.digest(text)
+    if latest is None:
+        content = RevisionContent.build(text)
+    elif latest.content_id == key and latest.title == note.title:
+        return None
+    else:
+        base = latest.content
+        if previous_text is None or (
+            revisions.digest(previous_text) != base.digest
+        ):
+            previous_text = base.get_text()
+        content = RevisionContent.build(text, base, previous_text)
+    return NoteRevision(
+        note=note,
+        number=latest.number + 1 if latest else 1,
+        title=note.title,
+        content=content,
+        size=len(text),
+    )
+
+
+class NoteRevision(models.Model):
+    """Версия заметки: заголовок и ссылка на текст в RevisionContent."""
+    note = models.ForeignKey(
+        Note, on_delete=models.CASCADE, related_name='revisions'
+    )
+    number = models.PositiveIntegerField('Номер')
+    title = models.CharField('Заголовок', max_length=100)
+    content = models.ForeignKey(
+        RevisionContent, on_delete=models.PROTECT, related_name='+'
+    )
+    size = models.PositiveIntegerField('Символов')
+    created_at = models.DateTimeField('Создана', default=timezone.now)
+
+    objects = NoteRevisionQuerySet.as_manager()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='note_revision_number_uniq'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id}#{self.number}'
+
+    @property
+    def text(self):
+        return self.content.get_text()
+
+
+class TaskManager(models.Manager):
+
+    def get_queryset(self):
+        # Очередь читается из основной базы: реплика отстаёт от воркеров.
+        return super().get_queryset().using(REGISTRY_DB)
+
+
+class Task(models.Model):
+    """Фоновая задача в очереди, её выполняет команда run_tasks.
+
+    done и total — ход выполнения, result — имя файла результата
+    в TASKS['RESULTS_ROOT']. heartbeat_at обновляется вместе с ходом:
+    задачу, которая давно молчит, воркер считает брошенной.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готова'),
+        (FAILED, 'Не удалась'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    kwargs = models.JSONField('Аргументы', default=dict)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    status = models.CharField(
+        'Состояние', max_length=7, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    done = models.PositiveIntegerField('Сделано', default=0)
+    total = models.PositiveIntegerField('Всего', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    result = models.CharField('Результат', max_length=255, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    objects = TaskManager()
+
+    class Meta:
+        indexes = (
+            # Покрывает выбор следующей задачи воркером.
+            models.Index(
+                fields=('status', 'run_after'), name='task_queue_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.name}#{self.pk}'
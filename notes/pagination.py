@@ -0,0 +1,87 @@
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """Страница курсорной пагинации.
+
+    Запрос к базе выполняется только при первом обращении к записям.
+    """
+
+    def __init__(self, queryset, per_page, key, after=None, before=None):
+        self._queryset = queryset
+        self.per_page = per_page
+        self.key = key
+        self.after = after
+        self.before = before
+
+    @cached_property
+    def _page(self):
+        """Выбирает на запись больше: так видно, есть ли следующая страница."""
+        if self.before is not None:
+            queryset = self._queryset.filter(
+                **{f'{self.key}__lt': self.before}
+            ).order_by(f'-{self.key}')
+            rows = list(queryset[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return rows, True, has_more
+        queryset = self._queryset.order_by(self.key)
+        if self.after is not None:
+            queryset = queryset.filter(**{f'{self.key}__gt': self.after})
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        return rows[:self.per_page], has_more, self.after is not None
+
+    @property
+    def object_list(self):
+        return self._page[0]
+
+    def has_next(self):
+        return self._page[1]
+
+    def has_previous(self):
+        return self._page[2]
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return getattr(self.object_list[-1], self.key)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return getattr(self.object_list[0], self.key)
+        return None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __contains__(self, item):
+        return item in self.object_list
+
+
+class KeysetPaginator:
+    """Пагинация по ключу: без OFFSET и без подсчёта всех записей."""
+
+    def __init__(self, per_page, key='id'):
+        self.per_page = per_page
+        self.key = key
+
+    def page(self, queryset, after=None, before=None):
+        return KeysetPage(queryset, self.per_page, self.key, after, before)
+
+
+def parse_cursor(value):
+    """Курсор из строки запроса или None, если значение некорректно."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor >= 0 else None
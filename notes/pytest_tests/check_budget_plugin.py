@@ -0,0 +1,70 @@
+import pytest
+
+# Тесты запускаются в том же процессе, где настройки Django уже загружены,
+# поэтому плагин pytest-django внутри отключаем.
+PLUGINS = ('-p', 'yanote.pytest_budgets', '-p', 'no:django')
+
+# Запрос без обращения к серверу: плагину важны только маршрут и метод.
+TESTS = '''
+from types import SimpleNamespace
+
+import pytest
+from django.test import override_settings
+
+from yanote import budgets
+
+REQUEST = SimpleNamespace(
+    method='GET',
+    resolver_match=SimpleNamespace(view_name='notes:list', func=None),
+)
+
+
+@override_settings(
+    QUERY_BUDGETS={'notes:list': {'queries': 1, 'ms': 10}},
+    QUERY_BUDGET_MODE='off',
+)
+def check(queries, ms):
+    budgets.check(REQUEST, queries, ms / 1000)
+
+
+def test_within_budget():
+    check(queries=1, ms=0)
+
+
+def test_queries_exceeded():
+    check(queries=2, ms=0)
+
+
+@pytest.mark.no_query_budget
+def test_marked():
+    check(queries=2, ms=0)
+
+
+def test_latency_exceeded():
+    check(queries=1, ms=50)
+'''
+
+# Внутренние тесты превышают бюджеты нарочно, а записывает превышения
+# и внешний плагин.
+pytestmark = pytest.mark.no_query_budget
+
+
+@pytest.fixture
+def tests_file(pytester):
+    pytester.makepyfile(TESTS)
+    return pytester
+
+
+def test_query_budget_fails_test(tests_file):
+    result = tests_file.runpytest(*PLUGINS)
+    result.assert_outcomes(passed=3, failed=1)
+    result.stdout.fnmatch_lines([
+        '*test_queries_exceeded*',
+        '*notes:list GET: SQL-запросов 2, бюджет 1*',
+    ])
+
+
+def test_latency_is_checked_on_request(tests_file):
+    result = tests_file.runpytest(*PLUGINS, '--query-budget-latency')
+    result.assert_outcomes(passed=2, failed=2)
+    result.stdout.fnmatch_lines(['*notes:list GET: 50.0 мс, бюджет 10 мс*'])
@@ -0,0 +1,135 @@
+from django.db import transaction
+
+from . import search
+from .importer import attach_blobs, store_batch
+from .models import (
+    Note, NoteBlob, NoteChange, NoteRevision, NoteSlug, RevisionContent,
+    legacy_text
+)
+from .sharding import REGISTRY_DB, get_shards, shard_for_author
+
+BATCH_SIZE = 500
+
+
+def misplaced_authors(source):
+    """Авторы, чьи заметки лежат в source, но должны жить в другом шарде."""
+    author_ids = (
+        Note.objects.using(source)
+        .order_by()
+        .values_list('author_id', flat=True)
+        .distinct()
+    )
+    return [
+        author_id for author_id in author_ids
+        if shard_for_author(author_id) != source
+    ]
+
+
+def move_author(author_id, source, target, batch_size=BATCH_SIZE):
+    """Переносит заметки автора из source в target пачками.
+
+    Заметки получают в target новые id; slug, тексты, история ревизий
+    и время создания и изменения сохраняются. Перенос можно повторить
+    после сбоя: уже скопированные заметки только удаляются из source. Журнал
+    синхронизации автора пересоздаётся в target, поэтому клиентам
+    нужна полная синхронизация с нулевого курсора.
+    """
+    moved = 0
+    source_notes = Note.objects.using(source).filter(author_id=author_id)
+    target_notes = Note.objects.using(target)
+    while True:
+        batch = list(source_notes.with_text().order_by('id')[:batch_size])
+        if not batch:
+            break
+        old_ids = [note.pk for note in batch]
+        old_blobs = [note.blob_id for note in batch]
+        copied = set(
+            target_notes.filter(
+                slug__in=[note.slug for note in batch]
+            ).values_list('slug', flat=True)
+        )
+        notes = [note for note in batch if note.slug not in copied]
+        stamps = [(note.created_at, note.updated_at) for note in notes]
+        source_ids = [note.pk for note in notes]
+        with transaction.atomic(using=target):
+            for note in notes:
+                # Текст читается из NoteBlob источника до сброса id.
+                note.text = note.text
+                note.legacy_text = legacy_text(note.text)
+                note.pk = None
+                note._state.adding = True
+            attach_blobs(notes, target)
+            target_notes.bulk_create(notes)
+            store_batch(notes, target_notes, target)
+            for note, (created_at, updated_at) in zip(notes, stamps):
+                note.created_at, note.updated_at = created_at, updated_at
+            target_notes.bulk_update(notes, ('created_at', 'updated_at'))
+            copy_revisions(
+                dict(zip(source_ids, (note.pk for note in notes))),
+                source,
+                target,
+            )
+        with transaction.atomic(using=source):
+            # Без сигналов: иначе освободились бы slug в реестре
+            # и в журнале остались бы надгробия перенесённых заметок.
+            NoteRevision.objects.using(source).filter(
+                note_id__in=old_ids
+            )._raw_delete(source)
+            source_notes.filter(pk__in=old_ids)._raw_delete(source)
+            NoteBlob.objects.using(source).release(old_blobs)
+            search.unindex_notes(old_ids, source)
+        moved += len(batch)
+    NoteChange.objects.using(source).filter(author_id=author_id).delete()
+    return moved
+
+
+def copy_revisions(note_ids, source, target):
+    """Копирует ревизии заметок {id в source: id в target} с их текстами.
+
+    Содержимое ревизий копируется вместе с цепочками дельт. В source оно
+    остаётся: его могут разделять ревизии других заметок.
+    """
+    revisions = list(
+        NoteRevision.objects.using(source).filter(note_id__in=note_ids)
+    )
+    contents = {}
+    digests = {revision.content_id for revision in revisions}
+    # Цепочка не длиннее SNAPSHOT_INTERVAL: столько же и запросов.
+    while digests:
+        found = RevisionContent.objects.using(source).in_bulk(digests)
+        contents.update(found)
+        digests = {
+            content.base_id for content in found.values()
+            if content.base_id and content.base_id not in contents
+        }
+    RevisionContent.objects.using(target).bulk_create(
+        contents.values(), ignore_conflicts=True
+    )
+    for revision in revisions:
+        revision.pk = None
+        revision.note_id = note_ids[revision.note_id]
+    NoteRevision.objects.using(target).bulk_create(revisions)
+
+
+def rebuild_registry(batch_size=BATCH_SIZE):
+    """Заполняет реестр slug по заметкам всех шардов."""
+    registry = NoteSlug.objects.using(REGISTRY_DB)
+    registry.all().delete()
+    registered = 0
+    for shard in dict.fromkeys(get_shards()):
+        notes = Note.objects.using(shard).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(
+                notes.filter(id__gt=last_id)
+                .values_list('id', 'slug', 'author_id')[:batch_size]
+            )
+            if not batch:
+                break
+            registry.bulk_create(
+                NoteSlug(slug=slug, author_id=author_id)
+                for _, slug, author_id in batch
+            )
+            registered += len(batch)
+            last_id = batch[-1][0]
+    return registered
@@ -0,0 +1,45 @@
+"""Дельты между версиями текста заметки.
+
+Дельта — JSON-список: пара [начало, конец] копирует строки базового
+текста, строка вставляется как есть. Удалённые строки просто не
+упоминаются. Строки режутся с сохранением переводов строк, поэтому
+apply_delta(base, make_delta(base, text)) == text.
+"""
+import hashlib
+import json
+from difflib import SequenceMatcher
+
+# Каждая SNAPSHOT_INTERVAL-я версия в цепочке хранится целиком: чтобы
+# восстановить любую, нужно применить не больше SNAPSHOT_INTERVAL - 1 дельт.
+SNAPSHOT_INTERVAL = 10
+# Дельта, которая не меньше этой доли текста, не стоит цепочки.
+DELTA_MAX_RATIO = 0.5
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def make_delta(base, text, max_ratio=DELTA_MAX_RATIO):
+    """Дельта от base к text или None, если она не короче доли текста."""
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, base_lines, lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j1 != j2:
+            ops.append(''.join(lines[j1:j2]))
+    delta = json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+    if len(delta) >= len(text) * max_ratio:
+        return None
+    return delta
+
+
+def apply_delta(base, delta):
+    base_lines = base.splitlines(keepends=True)
+    return ''.join(
+        ''.join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(delta)
+    )
@@ -0,0 +1,208 @@
+import re
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note, NoteChange
+from .sharding import author_db, get_shards
+
+FTS_TABLE = 'notes_note_fts'
+# Таблица, в которой индекс строится заново, пока поиск идёт по старому.
+SHADOW_TABLE = f'{FTS_TABLE}_rebuild'
+FTS_SCHEMA = "title, text, author, tokenize = 'unicode61 remove_diacritics 2'"
+# Столбец автора не влияет на релевантность.
+FTS_RANK = 'bm25(1.0, 1.0, 0.0)'
+RESULTS_LIMIT = 50
+SNIPPET_TOKENS = 16
+# Служебные символы, которыми FTS5 отмечает совпадения во фрагменте:
+# после экранирования HTML они заменяются на теги подсветки.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SEARCH_SQL = (
+    'SELECT note.id, note.slug, note.title, note.excerpt, '
+    f"snippet({FTS_TABLE}, -1, '{MARK_START}', '{MARK_END}', '…', "
+    f'{SNIPPET_TOKENS}) AS snippet '
+    f'FROM {FTS_TABLE} '
+    f'JOIN notes_note AS note ON note.id = {FTS_TABLE}.rowid '
+    f'WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s'
+)
+
+
+def is_supported(using):
+    """Полнотекстовый индекс есть только в SQLite."""
+    return connections[using].vendor == 'sqlite'
+
+
+def author_token(author_id):
+    """Слово столбца author: по нему FTS5 сразу отбирает заметки автора."""
+    return f'a{author_id}'
+
+
+def build_match_query(query, author_id):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки и ищется по префиксу в заголовке
+    и тексте, слова объединяются через AND. Операторы FTS5 из ввода
+    не интерпретируются. Автор входит в сам запрос, поэтому FTS5
+    не находит и не ранжирует заметки других пользователей.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    phrases = ' '.join(f'"{word}"*' for word in words)
+    return (
+        f'author : "{author_token(author_id)}" '
+        f'AND {{title text}} : ({phrases})'
+    )
+
+
+def index_notes(notes, using=None, table=FTS_TABLE):
+    """Добавляет или обновляет заметки в поисковом индексе."""
+    notes = list(notes)
+    if not notes:
+        return
+    using = using or router.db_for_write(Note, instance=notes[0])
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {table} WHERE rowid = %s',
+            [(note.pk,) for note in notes],
+        )
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, title, text, author) '
+            'VALUES (%s, %s, %s, %s)',
+            [
+                (note.pk, note.title, note.text, author_token(note.author_id))
+                for note in notes
+            ],
+        )
+
+
+def unindex_notes(ids, using, table=FTS_TABLE):
+    """Удаляет заметки из поискового индекса."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {table} WHERE rowid = %s',
+            [(pk,) for pk in ids],
+        )
+
+
+def create_shadow_table(using):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SHADOW_TABLE}')
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {SHADOW_TABLE} USING fts5({FTS_SCHEMA})'
+        )
+        cursor.execute(
+            f'INSERT INTO {SHADOW_TABLE} ({SHADOW_TABLE}, rank) '
+            'VALUES (%s, %s)',
+            ('rank', FTS_RANK),
+        )
+
+
+def index_changes(since, using, batch_size):
+    """Переносит в новый индекс заметки, изменённые после записи since.
+
+    Изменения берутся из журнала синхронизации. Возвращает id последней
+    перенесённой записи журнала.
+    """
+    changes = NoteChange.objects.using(using).order_by('id')
+    notes = Note.objects.using(using).with_text()
+    while True:
+        batch = list(
+            changes.filter(id__gt=since).values_list('id', 'note_id')[
+                :batch_size
+            ]
+        )
+        if not batch:
+            return since
+        ids = [note_id for _, note_id in batch]
+        with transaction.atomic(using=using):
+            unindex_notes(ids, using, SHADOW_TABLE)
+            index_notes(notes.filter(pk__in=ids), using, SHADOW_TABLE)
+        since = batch[-1][0]
+
+
+def rebuild_index(using=None, batch_size=1000, progress=None):
+    """Перестраивает индекс с нуля, читая заметки пачками.
+
+    Без using перестраиваются индексы всех шардов. Новый индекс
+    строится в отдельной таблице, каждая пачка — в своей короткой
+    транзакции, и запись заметок не ждёт конца перестройки. Изменения,
+    сделанные за это время, переносятся по журналу синхронизации, после
+    чего новая таблица заменяет старую: поиск не видит индекс пустым.
+    progress(indexed, total) вызывается после каждой пачки вне
+    транзакции.
+    """
+    if using is None:
+        return sum(
+            rebuild_index(alias, batch_size, progress)
+            for alias in dict.fromkeys(get_shards())
+        )
+    if not is_supported(using):
+        return 0
+    since = NoteChange.objects.using(using).aggregate(
+        last=Max('id')
+    )['last'] or 0
+    notes = Note.objects.using(using).with_text().order_by('id')
+    total = notes.count() if progress else None
+    create_shadow_table(using)
+    last_id = 0
+    indexed = 0
+    while True:
+        batch = list(notes.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic(using=using):
+            index_notes(batch, using, SHADOW_TABLE)
+        indexed += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(indexed, total)
+    since = index_changes(since, using, batch_size)
+    with transaction.atomic(using=using):
+        index_changes(since, using, batch_size)
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DROP TABLE {FTS_TABLE}')
+            cursor.execute(
+                f'ALTER TABLE {SHADOW_TABLE} RENAME TO {FTS_TABLE}'
+            )
+    return indexed
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и подсвечивает найденные слова."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def search_notes(author, query, limit=RESULTS_LIMIT):
+    """Заметки автора, подходящие под запрос, от более релевантных."""
+    match = build_match_query(query, author.pk)
+    if not match:
+        return []
+    using = author_db(author.pk, Note)
+    if not is_supported(using):
+        notes = list(
+            Note.objects.using(using)
+            .filter(author=author, title__icontains=query)
+            .only('id', 'slug', 'title', 'excerpt')[:limit]
+        )
+        for note in notes:
+            note.snippet = escape(note.excerpt)
+        return notes
+    notes = list(
+        Note.objects.using(using).raw(SEARCH_SQL, (match, limit))
+    )
+    for note in notes:
+        note.snippet = highlight(note.snippet)
+    return notes
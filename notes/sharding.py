@@ -0,0 +1,103 @@
+"""Шардирование заметок по автору.
+
+Заметки автора и все связанные с ними данные приложения notes (журнал
+синхронизации, поисковый индекс) лежат в базе NOTE_SHARDS[author_id %
+len(NOTE_SHARDS)]. Пока в NOTE_SHARDS одна база, шардирование выключено
+и маршрутизатор ни во что не вмешивается.
+
+Запросы по автору строятся через Note.objects.for_author(), записи
+экземпляров маршрутизируются ShardRouter по author_id. Уникальность slug
+между шардами обеспечивает реестр NoteSlug в основной базе.
+"""
+from django.conf import settings
+from django.db import router
+
+REGISTRY_DB = 'default'
+# Модели notes, которые живут только в основной базе.
+GLOBAL_MODELS = {'noteslug', 'task'}
+
+
+def get_shards():
+    return list(getattr(settings, 'NOTE_SHARDS', [REGISTRY_DB]))
+
+
+def get_shard_databases():
+    """Базы с заметками: текущие шарды и выводимые из NOTE_SHARDS."""
+    return {*get_shards(), *getattr(settings, 'NOTE_SHARD_DATABASES', ())}
+
+
+def is_sharded():
+    return len(get_shards()) > 1
+
+
+def shard_for_author(author_id, shards=None):
+    shards = get_shards() if shards is None else shards
+    return shards[author_id % len(shards)]
+
+
+def db_for_author(author_id):
+    """Шард автора или None, если шардирование выключено."""
+    if not is_sharded():
+        return None
+    return shard_for_author(author_id)
+
+
+def author_db(author_id, model, write=False):
+    """База для данных автора: его шард или решение остальных роутеров."""
+    shard = db_for_author(author_id)
+    if shard:
+        return shard
+    if write:
+        return router.db_for_write(model)
+    return router.db_for_read(model)
+
+
+def is_sharded_model(model):
+    return (
+        model._meta.app_label == 'notes'
+        and model._meta.model_name not in GLOBAL_MODELS
+    )
+
+
+class ShardRouter:
+    """Направляет записи заметок в шард их автора."""
+
+    def _db_for_instance(self, model, instance):
+        if not is_sharded() or not is_sharded_model(model):
+            return None
+        # Подсказкой бывает и связанный объект, например автор заметки.
+        if instance is None or not is_sharded_model(instance._meta.model):
+            return None
+        author_id = getattr(instance, 'author_id', None)
+        # Новая заметка получает _state.db от присвоенного автора, то есть
+        # основную базу, поэтому её шард определяется по author_id.
+        if author_id is not None and (
+            instance._state.adding or not instance._state.db
+        ):
+            return shard_for_author(author_id)
+        return instance._state.db
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        if is_sharded() and model._meta.model_name in GLOBAL_MODELS:
+            return REGISTRY_DB
+        return self._db_for_instance(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Автор живёт в основной базе, его заметки — в шарде. Объекты
+        # берутся через _meta: request.user — SimpleLazyObject.
+        if is_sharded() and (
+            is_sharded_model(obj1._meta.model)
+            or is_sharded_model(obj2._meta.model)
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REGISTRY_DB or db not in get_shard_databases():
+            return None
+        if app_label != 'notes':
+            return False
+        return model_name not in GLOBAL_MODELS
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from yanote.auth import forget_user
+
+from . import deletion, search, sharding, slugs, sync
+from .models import Note, NoteBlob, NoteChange
+
+# Отправляется после массового создания заметок в обход save():
+# аргументы notes (созданные заметки с id) и using.
+notes_bulk_created = Signal()
+# Отправляется после изменения пачки заметок одним bulk_update:
+# аргументы notes (изменённые заметки с текстом) и using.
+notes_bulk_updated = Signal()
+# Отправляется при удалении пачки заметок в обход Collector, внутри
+# её транзакции: аргументы notes (id, slug, author_id, blob_id) и using.
+notes_bulk_deleted = Signal()
+
+
+@receiver(post_save, sender=Note)
+def index_note(sender, instance, using, **kwargs):
+    """Обновляет заметку в поисковом индексе."""
+    search.index_notes((instance,), using)
+
+
+@receiver(notes_bulk_created, sender=Note)
+@receiver(notes_bulk_updated, sender=Note)
+def index_bulk_notes(sender, notes, using, **kwargs):
+    """Обновляет пачку созданных или изменённых заметок в индексе."""
+    search.index_notes(notes, using)
+
+
+@receiver(post_delete, sender=Note)
+def unindex_note(sender, instance, using, **kwargs):
+    """Убирает удалённую заметку из поискового индекса."""
+    search.unindex_notes((instance.pk,), using)
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def unindex_deleted_notes(sender, notes, using, **kwargs):
+    """Убирает пачку удалённых заметок из поискового индекса."""
+    search.unindex_notes([note.pk for note in notes], using)
+
+
+@receiver(post_delete, sender=Note)
+def release_note_blob(sender, instance, using, **kwargs):
+    """Снимает ссылку удалённой заметки с её текста в NoteBlob."""
+    NoteBlob.objects.using(using).release((instance.blob_id,))
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def release_deleted_notes_blobs(sender, notes, using, **kwargs):
+    """Снимает ссылки пачки удалённых заметок с их текстов."""
+    NoteBlob.objects.using(using).release(note.blob_id for note in notes)
+
+
+@receiver(post_save, sender=Note)
+def record_saved_note(sender, instance, using, **kwargs):
+    """Записывает изменение заметки в журнал синхронизации."""
+    sync.record_changes((instance,), NoteChange.UPSERT, using)
+
+
+@receiver(notes_bulk_created, sender=Note)
+def record_created_notes(sender, notes, using, **kwargs):
+    """Записывает массово созданные заметки в журнал синхронизации."""
+    sync.record_changes(notes, NoteChange.UPSERT, using, compact=False)
+
+
+@receiver(notes_bulk_updated, sender=Note)
+def record_updated_notes(sender, notes, using, **kwargs):
+    """Записывает пачку изменённых заметок в журнал синхронизации."""
+    sync.record_changes(notes, NoteChange.UPSERT, using)
+
+
+@receiver(post_delete, sender=Note)
+def record_deleted_note(sender, instance, using, **kwargs):
+    """Оставляет в журнале синхронизации надгробие удалённой заметки."""
+    sync.record_changes((instance,), NoteChange.DELETE, using)
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def record_deleted_notes(sender, notes, using, **kwargs):
+    """Оставляет в журнале надгробия пачки удалённых заметок."""
+    sync.record_changes(notes, NoteChange.DELETE, using)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_deleted_user_changes(sender, instance, using, **kwargs):
+    """Удаляет журнал синхронизации удалённого пользователя."""
+    sync.forget_author(
+        instance.pk, sharding.db_for_author(instance.pk) or using
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance, **kwargs):
+    """Сохранённый или удалённый пользователь больше не берётся из кэша."""
+    forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=Note)
+def release_deleted_note_slug(sender, instance, **kwargs):
+    """Освобождает slug удалённой заметки в реестре шардов."""
+    registry = slugs.slug_registry(sender)
+    if registry is not None:
+        slugs.release_slugs(registry, (instance.slug,))
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def release_deleted_notes_slugs(sender, notes, **kwargs):
+    """Освобождает slug пачки удалённых заметок в реестре шардов."""
+    registry = slugs.slug_registry(sender)
+    if registry is not None:
+        slugs.release_slugs(registry, [note.slug for note in notes])
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_notes(sender, instance, using, **kwargs):
+    """Удаляет заметки пользователя пачками вместо каскада Collector.
+
+    Collector не видит заметок в других шардах и загрузил бы в память
+    все заметки автора. Пачки в базе пользователя фиксируются только
+    вместе с ним: короткие блокировки даёт deletion.delete_user,
+    который удаляет заметки до пользователя.
+    """
+    deletion.delete_author_notes(instance.pk, using)
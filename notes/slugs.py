@@ -0,0 +1,174 @@
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from pytils.translit import slugify
+
+from . import sharding
+
+SLUG_MAX_LENGTH = 100
+DEFAULT_SLUG = 'note'
+# Сколько диапазонов slug объединять в одном запросе.
+RANGE_QUERY_SIZE = 100
+# Для скольких цифр суффикса искать занятые варианты slug.
+SUFFIX_DIGITS = 6
+# Сколько раз пробовать сохранить заметку при гонке за один slug.
+MAX_ATTEMPTS = 5
+
+
+class SlugTakenError(IntegrityError):
+    """Указанный пользователем slug уже занят другой заметкой."""
+
+
+@lru_cache(maxsize=4096)
+def transliterate(title):
+    """Транслитерация заголовка, результаты запоминаются."""
+    return slugify(title)
+
+
+def slugify_title(title, max_length=SLUG_MAX_LENGTH):
+    return transliterate(title)[:max_length]
+
+
+def with_suffix(base, number, max_length=SLUG_MAX_LENGTH):
+    """Добавляет к slug суффикс -2, -3… не выходя за максимальную длину."""
+    if number < 2:
+        return base[:max_length]
+    suffix = f'-{number}'
+    return base[:max_length - len(suffix)] + suffix
+
+
+def suffix_stems(base, max_length=SLUG_MAX_LENGTH):
+    """Начала вариантов base с суффиксами, как их строит with_suffix.
+
+    У длинного base суффикс заменяет конец, поэтому начало зависит
+    от числа цифр суффикса.
+    """
+    return {
+        base[:max_length - digits - 1] + '-'
+        for digits in range(1, SUFFIX_DIGITS + 1)
+    }
+
+
+def stem_range(stem):
+    """Slug, начинающиеся со stem, как диапазон по индексу.
+
+    В отличие от startswith (LIKE в SQLite) диапазон использует
+    уникальный индекс slug. stem оканчивается на «-», а «.» — следующий
+    за ним символ.
+    """
+    return Q(slug__gte=stem, slug__lt=stem[:-1] + '.')
+
+
+def fetch_taken_slugs(bases, queryset):
+    """Занятые slug среди bases и их вариантов с суффиксами."""
+    bases = set(bases)
+    taken = set(
+        queryset.filter(slug__in=bases).values_list('slug', flat=True)
+    )
+    stems = sorted({
+        stem for base in taken for stem in suffix_stems(base)
+    })
+    for start in range(0, len(stems), RANGE_QUERY_SIZE):
+        condition = reduce(
+            or_, map(stem_range, stems[start:start + RANGE_QUERY_SIZE])
+        )
+        taken.update(
+            queryset.filter(condition).values_list('slug', flat=True)
+        )
+    return taken
+
+
+def allocate_slugs(bases, taken):
+    """Подбирает свободные slug для bases, дополняя множество taken.
+
+    Повторяющиеся и уже занятые значения получают суффиксы -2, -3…
+    """
+    allocated = []
+    for base in bases:
+        number = 1
+        slug = with_suffix(base, number)
+        while slug in taken:
+            number += 1
+            slug = with_suffix(base, number)
+        taken.add(slug)
+        allocated.append(slug)
+    return allocated
+
+
+def slug_registry(model):
+    """Реестр slug при включённом шардировании, иначе None."""
+    if not sharding.is_sharded():
+        return None
+    registry = model._meta.apps.get_model('notes', 'NoteSlug')
+    return registry._default_manager.using(sharding.REGISTRY_DB)
+
+
+def reserve_slugs(registry, slugs, author_id):
+    """Занимает slug в реестре; занятый другим slug — IntegrityError."""
+    with transaction.atomic(using=sharding.REGISTRY_DB):
+        registry.bulk_create(
+            registry.model(slug=slug, author_id=author_id) for slug in slugs
+        )
+
+
+def release_slugs(registry, slugs):
+    registry.filter(slug__in=slugs).delete()
+
+
+def save_with_unique_slug(note, save, using=None):
+    """Сохраняет заметку, гарантируя уникальность slug.
+
+    Заранее наличие slug в базе не проверяется: сохранение сразу пробует
+    вставить запись, а уникальный индекс разрешает гонку. Если занят
+    slug, подобранный по заголовку, одним запросом выбираются занятые
+    варианты с суффиксами и сохранение повторяется. Занятый slug, который
+    указал пользователь, приводит к SlugTakenError.
+
+    При шардировании уникальный индекс — первичный ключ реестра NoteSlug:
+    slug сначала занимается в реестре, затем заметка сохраняется в шард.
+    """
+    model = type(note)
+    using = using or router.db_for_write(model, instance=note)
+    explicit = bool(note.slug)
+    base = note.slug or slugify_title(note.title) or DEFAULT_SLUG
+    note.slug = base
+    registry = slug_registry(model)
+    old_slug = None
+    if registry is not None and note.pk is not None:
+        old_slug = model._default_manager.using(using).filter(
+            pk=note.pk
+        ).values_list('slug', flat=True).first()
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            reserved = registry is not None and note.slug != old_slug
+            if reserved:
+                reserve_slugs(registry, (note.slug,), note.author_id)
+            try:
+                with transaction.atomic(using=using):
+                    save()
+            except Exception:
+                if reserved:
+                    release_slugs(registry, (note.slug,))
+                raise
+            if reserved and old_slug:
+                release_slugs(registry, (old_slug,))
+            return
+        except IntegrityError:
+            if registry is None:
+                others = model._default_manager.using(using).exclude(
+                    pk=note.pk
+                )
+            elif note.slug != old_slug:
+                others = registry
+            else:
+                raise
+            if not others.filter(slug=note.slug).exists():
+                raise
+            if explicit:
+                raise SlugTakenError(note.slug)
+            if attempt == MAX_ATTEMPTS:
+                raise
+            taken = fetch_taken_slugs((base,), others)
+            note.slug, = allocate_slugs((base,), taken)
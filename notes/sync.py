@@ -0,0 +1,70 @@
+from django.db.models import Max
+
+from .models import Note, NoteChange
+
+PAGE_SIZE = 500
+
+
+def record_changes(notes, action, using, compact=True):
+    """Записывает изменение заметок в журнал синхронизации.
+
+    Сначала вставляются новые записи, затем удаляются прежние записи
+    тех же заметок: так наибольший id в журнале никогда не уменьшается
+    и SQLite не выдаст уже показанный клиентам курсор повторно.
+    Для только что созданных заметок прежних записей нет, и compact=False
+    избавляет от лишнего запроса.
+    """
+    notes = list(notes)
+    if not notes:
+        return
+    changes = NoteChange.objects.using(using)
+    changes.bulk_create(
+        NoteChange(
+            author_id=note.author_id,
+            note_id=note.pk,
+            slug=note.slug,
+            action=action,
+        )
+        for note in notes
+    )
+    if not compact:
+        return
+    ids = [note.pk for note in notes]
+    latest = (
+        changes.filter(note_id__in=ids)
+        .values('note_id')
+        .annotate(latest=Max('id'))
+        .values('latest')
+    )
+    changes.filter(note_id__in=ids).exclude(id__in=latest).delete()
+
+
+def forget_author(author_id, using):
+    """Удаляет журнал удалённого пользователя."""
+    NoteChange.objects.using(using).filter(author_id=author_id).delete()
+
+
+def changes_since(author, since, limit=PAGE_SIZE):
+    """Изменения заметок автора после курсора since.
+
+    Возвращает список пар (изменение, заметка или None), новый курсор
+    и признак того, что изменений больше, чем поместилось.
+    """
+    changes = list(
+        NoteChange.objects.for_author(author).filter(id__gt=since)
+        .order_by('id')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    notes = Note.objects.for_author(author).with_text().in_bulk(
+        [
+            change.note_id for change in changes
+            if change.action == NoteChange.UPSERT
+        ]
+    )
+    cursor = changes[-1].id if changes else since
+    return (
+        [(change, notes.get(change.note_id)) for change in changes],
+        cursor,
+        has_more,
+    )
@@ -0,0 +1,314 @@
+"""Фоновые задачи в очереди в основной базе, без внешнего брокера.
+
+Функция задачи регистрируется декоратором @task('имя') и получает
+запись Task и её kwargs. enqueue() ставит задачу в очередь, воркер
+(команда run_tasks) забирает её условным UPDATE, так что задачу
+выполняет ровно один поток. Упавшая задача повторяется до max_attempts
+раз с удвоением паузы. Ход выполнения задача сообщает через
+progress_reporter(); задача, которая дольше LEASE секунд не сообщала
+о ходе, считается брошенной и возвращается в очередь.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.db.models import F
+from django.utils import timezone
+
+from . import deletion, export, importer, search
+from .models import Note, Task
+
+DEFAULTS = {
+    'THREADS': 2,
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 3,
+    # Пауза перед второй попыткой, дальше она удваивается.
+    'RETRY_DELAY': 10,
+    'LEASE': 600,
+    'PROGRESS_INTERVAL': 1,
+    'RESULTS_ROOT': 'task_results',
+    'RESULT_TTL': 24 * 60 * 60,
+}
+
+# Сколько раз повторять запись в очередь, упёршуюся в блокировку.
+LOCK_RETRIES = 5
+
+logger = logging.getLogger('notes.tasks')
+
+_registry = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TASKS', {})}
+
+
+def retry_locked(func):
+    """Повторяет запись в очередь, если база или таблица заблокирована.
+
+    Блокировки таблиц общего кэша SQLite (тестовая база в памяти)
+    не ждут busy_timeout, и потоки воркера получают ошибку сразу.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if 'locked' not in str(error) or attempt == LOCK_RETRIES - 1:
+                    raise
+                time.sleep(0.01 * 2 ** attempt)
+    return wrapper
+
+
+def task(name):
+    """Регистрирует функцию задачи под именем name."""
+    def register(func):
+        _registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, owner_id=None, max_attempts=None, **kwargs):
+    """Ставит задачу в очередь; kwargs должны сериализоваться в JSON."""
+    if name not in _registry:
+        raise ValueError(f'Неизвестная задача: {name}')
+    return Task.objects.create(
+        name=name,
+        owner_id=owner_id,
+        kwargs=kwargs,
+        max_attempts=max_attempts or get_config()['MAX_ATTEMPTS'],
+    )
+
+
+def worker_name():
+    return (
+        f'{socket.gethostname()}:{os.getpid()}:'
+        f'{threading.current_thread().name}'
+    )
+
+
+@retry_locked
+def claim(worker):
+    """Забирает следующую готовую задачу или возвращает None."""
+    ready = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=timezone.now()
+    )
+    while True:
+        pk = ready.order_by('run_after', 'id').values_list(
+            'pk', flat=True
+        ).first()
+        if pk is None:
+            return None
+        # Задачу мог забрать другой поток: тогда берём следующую.
+        if ready.filter(pk=pk).update(
+            status=Task.RUNNING,
+            worker=worker[:100],
+            attempts=F('attempts') + 1,
+            heartbeat_at=timezone.now(),
+        ):
+            return Task.objects.get(pk=pk)
+
+
+def run(task):
+    """Выполняет забранную задачу и записывает исход."""
+    try:
+        func = _registry.get(task.name)
+        if func is None:
+            raise LookupError(f'Неизвестная задача: {task.name}')
+        result = func(task, **task.kwargs)
+    except Exception as error:
+        logger.exception('Задача %s не удалась', task)
+        retry_or_fail(task, f'{type(error).__name__}: {error}')
+        return False
+    finish(task, result)
+    return True
+
+
+@retry_locked
+def finish(task, result):
+    now = timezone.now()
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.DONE,
+        result=result or '',
+        heartbeat_at=now,
+        finished_at=now,
+    )
+
+
+@retry_locked
+def retry_or_fail(task, error):
+    """Возвращает задачу в очередь с паузой или отмечает неудачу."""
+    now = timezone.now()
+    tasks = Task.objects.filter(pk=task.pk)
+    if task.attempts < task.max_attempts:
+        delay = get_config()['RETRY_DELAY'] * 2 ** (task.attempts - 1)
+        tasks.update(
+            status=Task.PENDING,
+            error=error,
+            run_after=now + timedelta(seconds=delay),
+        )
+    else:
+        tasks.update(status=Task.FAILED, error=error, finished_at=now)
+
+
+def work(stop=None, burst=True, poll_interval=None):
+    """Цикл воркера, возвращает число выполненных задач.
+
+    В режиме burst цикл заканчивается, когда готовых задач не осталось,
+    иначе — когда установлено событие stop.
+    """
+    if poll_interval is None:
+        poll_interval = get_config()['POLL_INTERVAL']
+    worker = worker_name()
+    processed = 0
+    while stop is None or not stop.is_set():
+        task = claim(worker)
+        if task is None:
+            if burst or stop is None:
+                break
+            stop.wait(poll_interval)
+            continue
+        run(task)
+        processed += 1
+    return processed
+
+
+def progress_reporter(task, interval=None):
+    """progress(done, total) для долгих функций: сохраняет ход задачи.
+
+    Пишет в базу не чаще раза в interval секунд, последний шаг — всегда.
+    """
+    if interval is None:
+        interval = get_config()['PROGRESS_INTERVAL']
+    reported = float('-inf')
+
+    def report(done, total=None):
+        nonlocal reported
+        task.done, task.total = done, total
+        now = time.monotonic()
+        if now - reported < interval and done != total:
+            return
+        reported = now
+        Task.objects.filter(pk=task.pk).update(
+            done=done, total=total, heartbeat_at=timezone.now()
+        )
+    return report
+
+
+@retry_locked
+def requeue_stale():
+    """Возвращает в очередь задачи, воркер которых пропал.
+
+    Задача, исчерпавшая попытки, отмечается неудачной: вероятно,
+    она сама роняет воркер.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=get_config()['LEASE']),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED,
+        error='Воркер перестал отвечать.',
+        finished_at=now,
+    )
+    return failed + stale.update(
+        status=Task.PENDING, worker='', run_after=now
+    )
+
+
+def result_path(name):
+    return Path(get_config()['RESULTS_ROOT']) / name
+
+
+@retry_locked
+def purge_expired():
+    """Удаляет завершённые задачи старше RESULT_TTL и их файлы."""
+    expired = Task.objects.filter(
+        status__in=(Task.DONE, Task.FAILED),
+        finished_at__lt=timezone.now() - timedelta(
+            seconds=get_config()['RESULT_TTL']
+        ),
+    )
+    for name in expired.exclude(result='').values_list('result', flat=True):
+        result_path(name).unlink(missing_ok=True)
+    return expired.delete()[0]
+
+
+def get_owner(task):
+    return get_user_model().objects.get(pk=task.owner_id)
+
+
+@task('notes.export')
+def export_notes(task, export_format):
+    """Выгрузка заметок владельца задачи в файл результата."""
+    author = get_owner(task)
+    report = progress_reporter(task)
+    total = Note.objects.for_author(author).count()
+
+    def counted(notes):
+        for done, note in enumerate(notes, 1):
+            yield note
+            report(done, total)
+
+    export_format = export.FORMATS[export_format]
+    name = f'{task.pk}.{export_format.extension}'
+    path = result_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as output:
+        for chunk in export_format.writer(counted(export.iter_notes(author))):
+            output.write(chunk)
+    report(total, total)
+    return name
+
+
+@task('notes.import')
+def import_notes(task, path, import_format,
+                 batch_size=importer.BATCH_SIZE):
+    """Импорт файла заметок владельцу задачи.
+
+    Каждая пачка фиксируется отдельно, поэтому повтор пропускает
+    строки, которые прошлая попытка уже сохранила.
+    """
+    # Ход пишется после каждой пачки: по нему повтор ищет место начала.
+    report = progress_reporter(task, interval=0)
+    skipped = task.done
+    with open(path, encoding='utf-8', newline='') as lines:
+        result = importer.import_notes(
+            get_owner(task),
+            islice(importer.READERS[import_format](lines), skipped, None),
+            batch_size,
+            progress=lambda read, total: report(skipped + read),
+        )
+    for number, errors in result.errors.items():
+        logger.warning(
+            'Задача %s: строка %d пропущена: %s',
+            task, skipped + number, errors,
+        )
+
+
+@task('notes.reindex')
+def rebuild_search_index(task, database=None, batch_size=1000):
+    search.rebuild_index(database, batch_size, progress_reporter(task))
+
+
+@task('notes.delete_author')
+def delete_author_notes(task, author_id, delete_user=False,
+                        chunk_size=deletion.CHUNK_SIZE):
+    """Удаление заметок автора, с delete_user — и его самого."""
+    kwargs = {'chunk_size': chunk_size, 'progress': progress_reporter(task)}
+    user = get_user_model().objects.filter(pk=author_id).first()
+    # При повторе пользователь уже может быть удалён.
+    if delete_user and user is not None:
+        deletion.delete_user(user, **kwargs)
+    else:
+        deletion.delete_author_notes(author_id, **kwargs)
@@ -0,0 +1,55 @@
+from django import template
+
+from notes.cache import fragment_cache
+
+register = template.Library()
+
+
+class NoteCacheNode(template.Node):
+
+    def __init__(self, nodelist, name, author_id, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.author_id = author_id
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = fragment_cache.make_key(
+            self.name.resolve(context),
+            self.author_id.resolve(context),
+            [value.resolve(context) for value in self.vary_on],
+        )
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            fragment = self.nodelist.render(context)
+            fragment_cache.set(key, fragment)
+        return fragment
+
+
+@register.tag('notecache')
+def do_notecache(parser, token):
+    """Кэширует фрагмент шаблона для автора заметок.
+
+    Использование::
+
+        {% notecache "list" user.pk view.etag %}
+            ...
+        {% endnotecache %}
+
+    Фрагмент сам не сбрасывается, поэтому среди значений после id
+    автора должна быть версия данных фрагмента, например ETag
+    страницы, посчитанный из базы.
+    """
+    nodelist = parser.parse(('endnotecache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} принимает имя фрагмента и id автора.'
+        )
+    return NoteCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -0,0 +1,229 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes import api
+from notes.importer import import_notes
+from notes.models import Note, NoteBlob, NoteChange, NoteRevision
+
+User = get_user_model()
+
+
+class TestNotesApi(TestCase):
+    LIST_URL = reverse('notes:api_list')
+    BATCH_URL = reverse('notes:api_batch')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_user = User.objects.create(username='Просто пользователь')
+        cls.note = Note.objects.create(
+            title='Заголовок', text='Текст заметки', author=cls.author
+        )
+        cls.other_note = Note.objects.create(
+            title='Чужая', text='Чужой текст', author=cls.other_user
+        )
+
+    def batch(self, payload):
+        return self.author_client.post(
+            self.BATCH_URL,
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def test_anonymous_gets_401(self):
+        response = self.client.get(self.LIST_URL)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_list_fields_and_scope(self):
+        response = self.author_client.get(
+            self.LIST_URL, {'fields': 'id,title'}
+        )
+        self.assertEqual(
+            response.json(),
+            {
+                'results': [{'id': self.note.id, 'title': self.note.title}],
+                'next': None,
+            },
+        )
+
+    def test_unknown_field(self):
+        response = self.author_client.get(
+            self.LIST_URL, {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_list_cursor(self):
+        for index in range(3):
+            Note.objects.create(
+                title=f'Заметка {index}', text='Текст', author=self.author
+            )
+        response = self.author_client.get(self.LIST_URL, {'limit': 2})
+        first_page = response.json()
+        response = self.author_client.get(
+            self.LIST_URL, {'limit': 2, 'after': first_page['next']}
+        )
+        second_page = response.json()
+        self.assertIsNone(second_page['next'])
+        ids = [note['id'] for note in first_page['results']]
+        ids += [note['id'] for note in second_page['results']]
+        self.assertEqual(
+            ids,
+            list(
+                Note.objects.filter(author=self.author)
+                .order_by('id').values_list('id', flat=True)
+            ),
+        )
+
+    def test_detail(self):
+        response = self.author_client.get(
+            reverse('notes:api_detail', args=(self.note.slug,))
+        )
+        self.assertEqual(response.json()['text'], self.note.text)
+        response = self.author_client.get(
+            reverse('notes:api_detail', args=(self.other_note.slug,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_batch(self):
+        response = self.batch({
+            'create': [
+                {'title': 'Новая', 'text': 'Первая'},
+                {'title': 'Новая', 'text': 'Вторая'},
+            ],
+            'update': [{'slug': self.note.slug, 'text': 'Изменённый'}],
+            'delete': [self.other_note.slug],
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertEqual(
+            [note['slug'] for note in data['created']], ['novaya', 'novaya-2']
+        )
+        self.assertEqual(data['deleted'], [])
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, 'Изменённый')
+        self.assertTrue(Note.objects.filter(pk=self.other_note.pk).exists())
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 3)
+
+    def test_batch_is_atomic(self):
+        response = self.batch({
+            'create': [{'title': 'Новая', 'text': 'Текст'}],
+            'delete': [self.note.slug],
+            'update': [{'slug': self.note.slug, 'text': ''}],
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.json()['operation'], 'update')
+        self.assertEqual(Note.objects.count(), 2)
+
+    def test_batch_limit(self):
+        response = self.batch({'delete': ['slug'] * (api.BATCH_LIMIT + 1)})
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_batch_shape_errors_name_the_element(self):
+        cases = (
+            ([], {}),
+            ({'create': 'abc'}, {'operation': 'create'}),
+            ({'update': [1]}, {'operation': 'update', 'index': 0}),
+            (
+                {'update': [{'slug': self.note.slug}, {'slug': ['x']}]},
+                {'operation': 'update', 'index': 1},
+            ),
+            ({'update': [{'text': 'Без slug'}]}, {'operation': 'update'}),
+            (
+                {'create': [{'title': 'Заголовок', 'text': None}]},
+                {'operation': 'create', 'index': 0},
+            ),
+            ({'delete': ['slug', 5]}, {'operation': 'delete', 'index': 1}),
+        )
+        for payload, details in cases:
+            with self.subTest(payload=payload):
+                response = self.batch(payload)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                data = response.json()
+                self.assertEqual(
+                    {key: data[key] for key in details}, details
+                )
+
+    def test_batch_update_slugs(self):
+        taken = self.batch({'update': [
+            {'slug': self.note.slug, 'new_slug': self.other_note.slug},
+        ]})
+        self.assertEqual(taken.status_code, HTTPStatus.CONFLICT)
+        response = self.batch({'update': [
+            {'slug': self.note.slug, 'title': 'Новый', 'new_slug': ''},
+        ]})
+        self.assertEqual(response.json()['updated'][0]['slug'], 'novyij')
+        self.assertTrue(Note.objects.filter(slug='novyij').exists())
+
+
+class TestNotesApiBatchCost(TestCase):
+    BATCH_URL = reverse('notes:api_batch')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        import_notes(
+            cls.author,
+            [
+                {'title': f'Заметка {index}', 'text': f'Текст {index}'}
+                for index in range(api.BATCH_LIMIT)
+            ],
+        )
+        cls.slugs = list(Note.objects.values_list('slug', flat=True))
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def batch(self, payload):
+        return self.client.post(
+            self.BATCH_URL,
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def test_update_is_written_in_bulk(self):
+        payload = {'update': [
+            {'slug': slug, 'text': f'Новый текст {slug}'}
+            for slug in self.slugs
+        ]}
+        # Пользователь, чтение заметок и их slug, тексты, bulk_update,
+        # ревизии, поисковый индекс, журнал и точки сохранения.
+        with self.assertNumQueries(18):
+            response = self.batch(payload)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        note = Note.objects.get(slug=self.slugs[0])
+        self.assertEqual(note.text, f'Новый текст {self.slugs[0]}')
+        self.assertEqual(note.revisions.count(), 2)
+        self.assertEqual(
+            NoteRevision.objects.count(), 2 * api.BATCH_LIMIT
+        )
+        self.assertFalse(
+            NoteBlob.objects.filter(refcount__gt=0).exclude(
+                digest__in=Note.objects.values('blob')
+            ).exists()
+        )
+        self.assertEqual(
+            NoteChange.objects.filter(action=NoteChange.UPSERT).count(),
+            api.BATCH_LIMIT,
+        )
+
+    def test_delete_uses_chunked_path(self):
+        # Пользователь, slug удаляемых, одна пачка delete_notes
+        # и точки сохранения.
+        with self.assertNumQueries(13):
+            response = self.batch({'delete': self.slugs})
+        self.assertCountEqual(response.json()['deleted'], self.slugs)
+        self.assertFalse(Note.objects.exists())
+        self.assertEqual(
+            NoteChange.objects.filter(action=NoteChange.DELETE).count(),
+            api.BATCH_LIMIT,
+        )
@@ -0,0 +1,91 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase, override_settings
+from django.urls import get_resolver
+
+from notes import benchmark
+from notes.management.commands.benchmark import (
+    FILE_CACHE, LOCMEM_CACHE, isolated_storage
+)
+from notes.models import Note
+
+
+class TestBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = benchmark.Dataset(users=3, notes=30, seed=1)
+        cls.users = cls.dataset.generate(batch_size=7)
+
+    def test_dataset_is_reproducible(self):
+        self.assertEqual(Note.objects.count(), 30)
+        counts = benchmark.Dataset(3, 30, seed=1).notes_per_user()
+        self.assertEqual(sum(counts), 30)
+        self.assertEqual(
+            benchmark.Dataset(3, 30, seed=1).notes_per_user(), counts
+        )
+
+    def test_scenarios_cover_every_route(self):
+        resolver = get_resolver()
+        routes = {
+            f'{namespace}:{name}'
+            for namespace in ('notes', 'users')
+            for name in resolver.namespace_dict[namespace][1].reverse_dict
+            if isinstance(name, str)
+        }
+        covered = {name.split()[0] for name in benchmark.SCENARIOS}
+        self.assertEqual(routes - covered, set())
+
+    def test_every_scenario_succeeds(self):
+        ctx = benchmark.Context(self.users, seed=1)
+        with TemporaryDirectory() as results_root:
+            with override_settings(TASKS={'RESULTS_ROOT': results_root}):
+                results = benchmark.run(ctx, iterations=1)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result.errors, 0)
+
+    def test_benchmark_storage_is_temporary(self):
+        directory = Path('/tmp/benchmark')
+        with override_settings(CACHES={
+            'default': {'BACKEND': LOCMEM_CACHE},
+            'shared': {
+                'BACKEND': FILE_CACHE,
+                'LOCATION': '/srv/cache',
+                'OPTIONS': {'MAX_ENTRIES': 10},
+            },
+            'redis': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://cache:6379',
+                'OPTIONS': {'db': 1},
+            },
+        }):
+            storage = isolated_storage(directory)
+        self.assertEqual(
+            storage['TASKS']['RESULTS_ROOT'], directory / 'task_results'
+        )
+        caches = storage['CACHES']
+        self.assertEqual(caches['default'], {'BACKEND': LOCMEM_CACHE})
+        self.assertEqual(caches['shared'], {
+            'BACKEND': FILE_CACHE,
+            'LOCATION': '/tmp/benchmark/caches/shared',
+            'OPTIONS': {'MAX_ENTRIES': 10},
+        })
+        self.assertEqual(caches['redis'], {
+            'BACKEND': FILE_CACHE,
+            'LOCATION': '/tmp/benchmark/caches/redis',
+        })
+
+    def test_compare_reports_missing_baseline(self):
+        results = {
+            name: benchmark.Result(
+                p50=10, p95=p95, p99=20, rps=100, peak_kib=1, errors=0
+            )
+            for name, p95 in (('fast', 10), ('slow', 20), ('new', 10))
+        }
+        baseline = {'fast': {'p95': 10}, 'slow': {'p95': 10}}
+        self.assertEqual(
+            benchmark.compare(results, baseline, tolerance=0.5),
+            {'slow': 1.0, 'new': None},
+        )
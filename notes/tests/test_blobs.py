@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.importer import import_notes
+from notes.models import Note, NoteBlob, RevisionContent
+from notes.revisions import digest
+
+User = get_user_model()
+
+TEMPLATE = 'Шаблон встречи: цели, участники, решения. ' * 20
+
+
+class TestNoteBlobs(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.reader = User.objects.create(username='Читатель')
+        cls.note = Note.objects.create(
+            title='Встреча', text=TEMPLATE, author=cls.author
+        )
+        cls.copy = Note.objects.create(
+            title='Ещё встреча', text=TEMPLATE, author=cls.reader
+        )
+
+    def refcount(self, text):
+        return NoteBlob.objects.get(pk=digest(text)).refcount
+
+    def test_identical_texts_share_blob(self):
+        self.assertEqual(self.note.blob_id, self.copy.blob_id)
+        self.assertEqual(NoteBlob.objects.count(), 1)
+        self.assertEqual(self.refcount(TEMPLATE), 2)
+        size = len(TEMPLATE.encode())
+        self.assertEqual(
+            NoteBlob.objects.stats(),
+            {
+                'blobs': 1,
+                'references': 2,
+                'stored': size,
+                'logical': size * 2,
+                'saved': size,
+            },
+        )
+
+    def test_edit_moves_reference(self):
+        note = Note.objects.get(pk=self.note.pk)
+        note.text = 'Свой текст'
+        note.save()
+        self.assertEqual(self.refcount(TEMPLATE), 1)
+        self.assertEqual(self.refcount('Свой текст'), 1)
+        self.assertEqual(Note.objects.get(pk=note.pk).text, 'Свой текст')
+
+    def test_unchanged_text_keeps_refcount(self):
+        note = Note.objects.get(pk=self.note.pk)
+        note.text = TEMPLATE
+        with CaptureQueriesContext(connection) as queries:
+            note.save()
+        self.assertFalse(
+            [query for query in queries if 'notes_noteblob' in query['sql']]
+        )
+        self.assertEqual(self.refcount(TEMPLATE), 2)
+
+    def test_delete_view_releases_reference(self):
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('notes:delete', args=(self.note.slug,)))
+        self.assertEqual(self.refcount(TEMPLATE), 1)
+
+    def test_user_cascade_releases_references(self):
+        Note.objects.create(title='Третья', text=TEMPLATE, author=self.author)
+        self.author.delete()
+        self.assertEqual(self.refcount(TEMPLATE), 1)
+
+    def test_import_reuses_blobs(self):
+        rows = [{'title': f'Импорт {index}', 'text': TEMPLATE}
+                for index in range(3)]
+        import_notes(self.author, rows)
+        self.assertEqual(NoteBlob.objects.count(), 1)
+        self.assertEqual(self.refcount(TEMPLATE), 5)
+
+    def test_garbage_collection(self):
+        self.note.delete()
+        self.copy.delete()
+        Note.objects.create(title='Другая', text='Текст', author=self.author)
+        self.assertEqual(NoteBlob.objects.collect_garbage(), 1)
+        self.assertEqual(
+            list(NoteBlob.objects.values_list('pk', flat=True)),
+            [digest('Текст')],
+        )
+
+    def test_referenced_blob_survives_wrong_refcount(self):
+        NoteBlob.objects.update(refcount=0)
+        self.assertEqual(NoteBlob.objects.collect_garbage(), 0)
+        NoteBlob.objects.recount()
+        self.assertEqual(self.refcount(TEMPLATE), 2)
+
+    def test_revision_contents_are_collected(self):
+        note = Note.objects.get(pk=self.note.pk)
+        note.text = TEMPLATE + 'Итоги.'
+        note.save()
+        note.delete()
+        self.copy.delete()
+        self.assertEqual(RevisionContent.objects.collect_garbage(), 2)
+        self.assertFalse(RevisionContent.objects.exists())
+
+    def test_command_reports_savings(self):
+        self.note.delete()
+        Note.objects.create(title='Копия', text=TEMPLATE, author=self.reader)
+        Note.objects.create(title='Короткая', text='Текст', author=self.author)
+        NoteBlob.objects.acquire(('Забытый текст',))
+        NoteBlob.objects.release((digest('Забытый текст'),))
+        out = StringIO()
+        call_command('collect_note_blobs', stdout=out)
+        size = len(TEMPLATE.encode())
+        self.assertIn('удалено текстов: 1', out.getvalue())
+        self.assertIn(
+            f'хранится {size + 10} байт вместо {size * 2 + 10}, '
+            f'сэкономлено {size}',
+            out.getvalue(),
+        )
@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from notes.fields import compress
+from notes.models import Note
+
+User = get_user_model()
+
+
+class TestNoteBody(TestCase):
+    NOTE_TEXT = 'Текст заметки'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.note = Note.objects.create(
+            title='Заголовок', text=cls.NOTE_TEXT, author=cls.author
+        )
+
+    def legacy_column(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT text FROM notes_note WHERE id = %s', [self.note.pk]
+            )
+            return bytes(cursor.fetchone()[0])
+
+    def set_legacy_column(self, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE notes_note SET text = %s WHERE id = %s',
+                [bytes(compress(text)), self.note.pk],
+            )
+
+    def test_text_is_stored_in_blob(self):
+        self.assertEqual(
+            Note.objects.get(pk=self.note.pk).blob.text, self.NOTE_TEXT
+        )
+        self.assertEqual(self.legacy_column(), compress(''))
+
+    def test_detail_loads_blob_with_note(self):
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(
+            reverse('notes:detail', args=(self.note.slug,))
+        )
+        self.assertTrue(
+            Note.blob.is_cached(response.context['note'])
+        )
+        self.assertContains(response, self.NOTE_TEXT)
+
+    def test_note_without_blob_reads_legacy_column(self):
+        Note.objects.update(blob=None)
+        self.set_legacy_column('Старый текст')
+        self.assertEqual(Note.objects.get().text, 'Старый текст')
+
+    @override_settings(NOTES_WRITE_LEGACY_TEXT=True)
+    def test_legacy_column_is_written_during_rollout(self):
+        note = Note.objects.create(
+            title='Новая', text='Новый текст', author=self.author
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT text FROM notes_note WHERE id = %s', [note.pk]
+            )
+            self.assertEqual(
+                bytes(cursor.fetchone()[0]), compress('Новый текст')
+            )
+
+    def test_command_copies_missing_and_stale_bodies(self):
+        other = Note.objects.create(
+            title='Другая', text='Другой текст', author=self.author
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE notes_note SET text = %s, blob_id = NULL '
+                'WHERE id = %s',
+                [bytes(compress('Другой текст')), other.pk],
+            )
+        # Старый процесс изменил текст только в notes_note.
+        self.set_legacy_column('Изменённый текст')
+        call_command('migrate_note_bodies', stdout=StringIO())
+        self.assertEqual(
+            dict(Note.objects.values_list('pk', 'blob__text')),
+            {
+                self.note.pk: compress('Изменённый текст'),
+                other.pk: compress('Другой текст'),
+            },
+        )
+
+    def test_command_clears_legacy_column(self):
+        self.set_legacy_column(self.NOTE_TEXT)
+        call_command(
+            'migrate_note_bodies', clear_legacy=True, stdout=StringIO()
+        )
+        self.assertEqual(self.legacy_column(), compress(''))
+        self.assertEqual(Note.objects.get().text, self.NOTE_TEXT)
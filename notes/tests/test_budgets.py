@@ -0,0 +1,114 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from notes.models import Note
+from yanote import budgets, metrics
+
+User = get_user_model()
+
+NOTES_PAGE = reverse('notes:list')
+
+
+def route_names(resolver=None, namespace=None):
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in ('notes', 'users'):
+                yield from route_names(pattern, pattern.namespace)
+        elif isinstance(pattern, URLPattern) and namespace and pattern.name:
+            yield f'{namespace}:{pattern.name}'
+
+
+# Тестовый клиент приходит с 127.0.0.1: так ему доступен /metrics.
+@override_settings(
+    QUERY_BUDGET_MODE='log',
+    QUERY_BUDGET_SAMPLE_RATE=1,
+    METRICS_ALLOWED_IPS=['127.0.0.1'],
+)
+class TestQueryBudgets(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        Note.objects.create(title='Заголовок', text='Текст', author=cls.author)
+
+    def setUp(self):
+        budgets.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_every_route_has_budget(self):
+        for name in route_names():
+            with self.subTest(name=name):
+                self.assertIn(name, settings.QUERY_BUDGETS)
+
+    def test_within_budget(self):
+        with budgets.record_violations() as violations:
+            self.client.get(NOTES_PAGE)
+        self.assertEqual(violations, [])
+
+    # Бюджет превышается нарочно.
+    @pytest.mark.no_query_budget
+    @override_settings(QUERY_BUDGETS={'notes:list': {'queries': 0}})
+    def test_query_budget_exceeded(self):
+        with budgets.record_violations() as violations:
+            with self.assertLogs('yanote.budgets', 'WARNING'):
+                self.client.get(NOTES_PAGE)
+        self.assertEqual(len(violations), 1)
+        violation = violations[0]
+        self.assertEqual(violation.route, 'notes:list GET')
+        self.assertEqual(violation.kind, 'queries')
+        self.assertEqual(violation.limit, 0)
+        self.assertGreater(violation.actual, 0)
+
+    # Бюджет превышается нарочно.
+    @pytest.mark.no_query_budget
+    @override_settings(QUERY_BUDGETS={'notes:list': {'ms': 0}})
+    def test_latency_budget_exceeded(self):
+        with budgets.record_violations() as violations:
+            with self.assertLogs('yanote.budgets', 'WARNING'):
+                self.client.get(NOTES_PAGE)
+        self.assertEqual([item.kind for item in violations], ['ms'])
+
+    # Бюджет превышается нарочно.
+    @pytest.mark.no_query_budget
+    @override_settings(QUERY_BUDGETS={
+        'notes:list': {'queries': 100},
+        'notes:list GET': {'queries': 0},
+    })
+    def test_method_budget_wins(self):
+        with budgets.record_violations() as violations:
+            with self.assertLogs('yanote.budgets', 'WARNING'):
+                self.client.get(NOTES_PAGE)
+        self.assertEqual(len(violations), 1)
+
+    # Бюджет превышается нарочно.
+    @pytest.mark.no_query_budget
+    @override_settings(
+        QUERY_BUDGETS={'notes:list': {'queries': 0}}, QUERY_BUDGET_MODE='off'
+    )
+    def test_violations_are_counted(self):
+        self.client.get(NOTES_PAGE)
+        self.client.get(NOTES_PAGE)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yanote_budget_violations_total'
+            '{route="notes:list GET",kind="queries"} 2',
+            body,
+        )
+
+    # Бюджет превышается нарочно.
+    @pytest.mark.no_query_budget
+    @override_settings(QUERY_BUDGETS={})
+    def test_decorated_view(self):
+        view = metrics.metrics_view
+        try:
+            budgets.query_budget(queries=-1)(view)
+            with budgets.record_violations() as violations:
+                with self.assertLogs('yanote.budgets', 'WARNING'):
+                    self.client.get(reverse('metrics'))
+        finally:
+            del view.query_budget
+        self.assertEqual(violations[0].route, 'metrics GET')
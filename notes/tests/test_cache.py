@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes.cache import FragmentCache, LRUCache, fragment_cache
+from notes.models import Note
+
+User = get_user_model()
+
+
+class TestFragmentCache(TestCase):
+    NOTES_PAGE = reverse('notes:list')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            title='Заголовок',
+            text='Текст заметки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        fragment_cache.clear()
+        fragment_cache.reset_stats()
+
+    def test_cached_list_skips_notes_query(self):
+        self.author_client.get(self.NOTES_PAGE)
+        with self.assertNumQueries(1):
+            # Сессия и пользователь — из кэша, остаётся запрос валидаторов.
+            response = self.author_client.get(self.NOTES_PAGE)
+        self.assertContains(response, self.note.title)
+        self.assertEqual(fragment_cache.stats()['local_hits'], 1)
+
+    def test_note_change_invalidates_fragments(self):
+        detail_url = reverse('notes:detail', args=(self.note.slug,))
+        self.author_client.get(self.NOTES_PAGE)
+        self.author_client.get(detail_url)
+        self.note.title = 'Новый заголовок'
+        self.note.save()
+        for url in (self.NOTES_PAGE, detail_url):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertContains(response, 'Новый заголовок')
+
+    def test_change_in_other_process_is_seen(self):
+        detail_url = reverse('notes:detail', args=(self.note.slug,))
+        self.author_client.get(self.NOTES_PAGE)
+        self.author_client.get(detail_url)
+        # Другой воркер меняет заметку: кэш этого процесса он не трогает,
+        # меняются только записи в базе.
+        other = Note.objects.get(pk=self.note.pk)
+        other.title = 'Из другого процесса'
+        other.save()
+        for url in (self.NOTES_PAGE, detail_url):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertContains(response, 'Из другого процесса')
+        other.delete()
+        response = self.author_client.get(self.NOTES_PAGE)
+        self.assertNotContains(response, 'Из другого процесса')
+
+    def test_stats_are_for_staff_only(self):
+        url = reverse('notes:cache_stats')
+        response = self.author_client.get(url)
+        self.assertEqual(response.status_code, 403)
+        self.author.is_staff = True
+        self.author.save()
+        response = self.author_client.get(url)
+        self.assertIn('misses', response.json())
+
+
+class TestFragmentCacheTiers(TestCase):
+
+    def test_lru_is_bounded(self):
+        cache = LRUCache(max_entries=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key, timeout=60)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'c')
+        self.assertEqual(len(cache), 2)
+
+    def test_shared_tier_is_used_across_processes(self):
+        worker = FragmentCache(10, 60, shared_cache='default')
+        other_worker = FragmentCache(10, 60, shared_cache='default')
+        key = worker.make_key('list', 1, ['etag'])
+        worker.set(key, 'fragment')
+        self.assertEqual(other_worker.make_key('list', 1, ['etag']), key)
+        self.assertEqual(other_worker.get(key), 'fragment')
+        self.assertEqual(other_worker.shared_hits, 1)
@@ -0,0 +1,110 @@
+import gzip
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from notes.models import Note
+from yanote.compression import compress_stream
+
+User = get_user_model()
+
+GZIP = {'HTTP_ACCEPT_ENCODING': 'gzip, deflate'}
+
+
+class TestCompressStream(SimpleTestCase):
+
+    def test_stream_round_trip(self):
+        chunks = [f'строка {index}\n'.encode() for index in range(5000)]
+        blocks = list(compress_stream(chunks, 6, 4096))
+        self.assertGreater(len(blocks), 2)
+        self.assertEqual(gzip.decompress(b''.join(blocks)), b''.join(chunks))
+
+    def test_small_chunks_are_coalesced(self):
+        chunks = [b'x' * 10] * 100
+        blocks = list(compress_stream(chunks, 6, 16 * 1024))
+        self.assertEqual(len(blocks), 1)
+
+
+class TestCompressionMiddleware(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.note = Note.objects.create(
+            title='Заголовок',
+            text='Длинный текст заметки. ' * 500,
+            author=cls.author,
+        )
+        cls.detail_url = reverse('notes:detail', args=(cls.note.slug,))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_page_is_compressed(self):
+        plain = self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url, **GZIP)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content) / 5)
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+
+    def test_plain_response_varies_on_encoding(self):
+        response = self.client.get(self.detail_url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_small_response_is_not_compressed(self):
+        note = Note.objects.create(
+            title='Короткая', text='Текст', author=self.author
+        )
+        response = self.client.get(
+            reverse('notes:api_detail', args=(note.slug,)), **GZIP
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertLess(len(response.content), 1024)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_zip_is_not_compressed(self):
+        url = reverse('notes:export', args=('zip',))
+        response = self.client.get(url, **GZIP)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_export_is_compressed(self):
+        url = reverse('notes:export', args=('jsonl',))
+        response = self.client.get(url, **GZIP)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(body)['slug'], self.note.slug)
+
+    def test_etag_is_weak_and_still_matches(self):
+        response = self.client.get(self.detail_url, **GZIP)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=etag, **GZIP
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_csrf_form_works_with_compression(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.get(reverse('notes:add'), **GZIP)
+        token = response.context['csrf_token']
+        response = client.post(
+            reverse('notes:add'),
+            {
+                'title': 'Новая', 'text': 'Текст',
+                'csrfmiddlewaretoken': str(token),
+            },
+            **GZIP,
+        )
+        self.assertRedirects(response, reverse('notes:success'))
@@ -0,0 +1,99 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from notes.models import Note, NoteChange
+
+User = get_user_model()
+
+
+class TestConditionalGet(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_user = User.objects.create(username='Просто пользователь')
+        cls.other_client = Client()
+        cls.other_client.force_login(cls.other_user)
+        cls.note = Note.objects.create(
+            title='Заголовок',
+            text='Текст заметки',
+            author=cls.author,
+        )
+        cls.urls = (
+            reverse('notes:list'),
+            reverse('notes:detail', args=(cls.note.slug,)),
+        )
+
+    def test_timestamps_are_set(self):
+        self.assertIsNotNone(self.note.created_at)
+        self.assertGreaterEqual(self.note.updated_at, self.note.created_at)
+
+    def test_repeat_view_is_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.author_client.get(url)['ETag']
+                with self.assertNumQueries(1):
+                    # Сессия и пользователь из кэша, запрос валидаторов.
+                    response = self.author_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertIn('private', response['Cache-Control'])
+
+    def test_changes_update_validators(self):
+        etags = [self.author_client.get(url)['ETag'] for url in self.urls]
+        self.note.text = 'Новый текст'
+        self.note.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.author_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_list_etag_changes_after_delete(self):
+        url = reverse('notes:list')
+        etag = self.author_client.get(url)['ETag']
+        self.note.delete()
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_list_validator_does_not_read_notes(self):
+        url = reverse('notes:list')
+        etag = self.author_client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        sql, = (query['sql'] for query in queries)
+        self.assertIn('notes_notechange', sql)
+        self.assertNotIn('"notes_note"', sql)
+        plan = NoteChange.objects.for_author(self.author).order_by(
+            '-id'
+        ).values('id')[:1].explain()
+        self.assertIn('notechange_author_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_detail_last_modified(self):
+        url = reverse('notes:detail', args=(self.note.slug,))
+        response = self.author_client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=http_date(
+                self.note.updated_at.timestamp()
+            ),
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_differs_between_users(self):
+        url = reverse('notes:list')
+        etag = self.author_client.get(url)['ETag']
+        response = self.other_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
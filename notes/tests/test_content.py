@@ -4,6 +4,7 @@ from django.urls import reverse
 
 from notes.forms import NoteForm
 from notes.models import Note
+from notes.views import NotesList
 
 
 User = get_user_model()
@@ -53,3 +54,62 @@ class TestNotesPage(TestCase):
                 self.assertIsInstance(
                     response.context.get('form'), NoteForm
                 )
+
+
+class TestNotesPagination(TestCase):
+    NOTES_PAGE = reverse('notes:list')
+    NOTES_COUNT = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text='Текст',
+                excerpt='Текст',
+                slug=f'note-{index}',
+                author=cls.author,
+            )
+            for index in range(cls.NOTES_COUNT)
+        )
+
+    def test_cursor_pages(self):
+        response = self.author_client.get(self.NOTES_PAGE)
+        page = response.context['page_obj']
+        first_page = list(response.context['note_list'])
+        self.assertEqual(len(first_page), NotesList.paginate_by)
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+        response = self.author_client.get(
+            self.NOTES_PAGE, {'after': page.next_cursor}
+        )
+        page = response.context['page_obj']
+        second_page = list(response.context['note_list'])
+        self.assertEqual(
+            len(second_page), self.NOTES_COUNT - NotesList.paginate_by
+        )
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+
+        response = self.author_client.get(
+            self.NOTES_PAGE, {'before': page.previous_cursor}
+        )
+        self.assertEqual(list(response.context['note_list']), first_page)
+
+    def test_list_does_not_load_text(self):
+        response = self.author_client.get(self.NOTES_PAGE)
+        for note in response.context['note_list']:
+            self.assertFalse(Note.blob.is_cached(note))
+            self.assertNotIn('legacy_text', note.__dict__)
+            self.assertEqual(note.excerpt, 'Текст')
+
+    def test_numbered_pages(self):
+        response = self.author_client.get(self.NOTES_PAGE, {'page': 2})
+        self.assertEqual(
+            len(response.context['note_list']),
+            self.NOTES_COUNT - NotesList.paginate_by
+        )
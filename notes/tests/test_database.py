@@ -0,0 +1,23 @@
+from django.db import connection
+from django.test import TestCase
+
+from yanote.backends.sqlite3.base import DEFAULT_PRAGMAS
+
+
+class TestSqliteProfile(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        self.assertEqual(
+            self.pragma('busy_timeout'), DEFAULT_PRAGMAS['busy_timeout']
+        )
+        self.assertEqual(
+            self.pragma('cache_size'), DEFAULT_PRAGMAS['cache_size']
+        )
+        # 1 — NORMAL.
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('foreign_keys'), 1)
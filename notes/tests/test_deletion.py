@@ -0,0 +1,137 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes import search
+from notes.deletion import delete_notes, delete_user
+from notes.importer import import_notes
+from notes.models import Note, NoteBlob, NoteChange, NoteRevision
+
+User = get_user_model()
+
+NOTES_COUNT = 5
+
+
+class TestChunkedDeletion(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.reader = User.objects.create(username='Читатель')
+        import_notes(
+            cls.author,
+            [
+                {'title': f'Заметка {index}', 'text': 'Общий текст'}
+                for index in range(NOTES_COUNT)
+            ],
+        )
+        cls.other = Note.objects.create(
+            title='Чужая', text='Общий текст', author=cls.reader
+        )
+
+    def test_notes_are_deleted_in_chunks(self):
+        calls = []
+        deleted = delete_notes(
+            Note.objects.filter(author=self.author),
+            chunk_size=2,
+            progress=lambda *args: calls.append(args),
+        )
+        self.assertEqual(deleted, NOTES_COUNT)
+        self.assertEqual(calls, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(list(Note.objects.all()), [self.other])
+        self.assertEqual(
+            list(NoteRevision.objects.values_list('note_id', flat=True)),
+            [self.other.pk],
+        )
+
+    def test_chunk_reads_narrow_rows(self):
+        # Одна неполная пачка: чтение узких строк, ревизии, заметки,
+        # поисковый индекс, счётчик текста и два запроса журнала.
+        with self.assertNumQueries(9):
+            delete_notes(Note.objects.filter(author=self.author))
+
+    def test_deleted_notes_notify_subscribers(self):
+        delete_notes(Note.objects.filter(author=self.author), chunk_size=2)
+        self.assertEqual(NoteBlob.objects.get().refcount, 1)
+        self.assertEqual(
+            NoteChange.objects.filter(
+                author_id=self.author.pk, action=NoteChange.DELETE
+            ).count(),
+            NOTES_COUNT,
+        )
+        if search.is_supported('default'):
+            found = search.search_notes(self.reader, 'Общий')
+            self.assertEqual([note.pk for note in found], [self.other.pk])
+
+    def test_user_deletion_removes_notes_in_chunks(self):
+        delete_user(self.author, chunk_size=2)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(list(Note.objects.all()), [self.other])
+        self.assertFalse(
+            NoteChange.objects.filter(author_id=self.author.pk).exists()
+        )
+
+    def test_plain_user_delete_does_not_cascade_through_collector(self):
+        self.author.delete()
+        self.assertEqual(list(Note.objects.all()), [self.other])
+        self.assertEqual(NoteBlob.objects.get().refcount, 1)
+
+    def test_command_reports_progress(self):
+        out = StringIO()
+        call_command(
+            'delete_author_notes', str(self.author.pk),
+            chunk_size=3, delete_user=True, stdout=out,
+        )
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            [
+                f'{self.author.pk}: 3 из 5',
+                f'{self.author.pk}: 5 из 5',
+                f'{self.author.pk}: удалено заметок: 5',
+            ],
+        )
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+
+
+class TestAdminDeletion(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        cls.author = User.objects.create(username='Автор заметки')
+        import_notes(
+            cls.author,
+            [{'title': f'Заметка {index}', 'text': 'Текст'}
+             for index in range(30)],
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_bulk_delete_confirmation_is_bounded(self):
+        ids = list(Note.objects.values_list('pk', flat=True))
+        url = reverse('admin:notes_note_changelist')
+        data = {'action': 'delete_selected', '_selected_action': ids}
+        response = self.client.post(url, data)
+        self.assertContains(response, '… и ещё 10')
+        response = self.client.post(url, {**data, 'post': 'yes'})
+        self.assertRedirects(response, url)
+        self.assertFalse(Note.objects.exists())
+
+    def test_user_delete_view(self):
+        url = reverse('admin:auth_user_delete', args=(self.author.pk,))
+        response = self.client.get(url)
+        self.assertEqual(
+            dict(response.context['model_count']),
+            {
+                User._meta.verbose_name_plural: 1,
+                Note._meta.verbose_name_plural: 30,
+            },
+        )
+        self.client.post(url, {'post': 'yes'})
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Note.objects.exists())
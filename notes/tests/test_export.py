@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import zipfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes import export
+from notes.models import Note
+
+User = get_user_model()
+
+
+class TestNotesExport(TestCase):
+    NOTES_COUNT = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        other_user = User.objects.create(username='Просто пользователь')
+        for index in range(cls.NOTES_COUNT):
+            Note.objects.create(
+                title=f'Заметка {index}',
+                text=f'Текст, "{index}"\nвторая строка',
+                author=cls.author,
+            )
+        Note.objects.create(
+            title='Чужая', text='Чужой текст', author=other_user
+        )
+
+    def download(self, export_format):
+        response = self.author_client.get(
+            reverse('notes:export', args=(export_format,))
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl(self):
+        lines = self.download('jsonl').decode().splitlines()
+        notes = [json.loads(line) for line in lines]
+        self.assertEqual(len(notes), self.NOTES_COUNT)
+        self.assertEqual(notes[0]['text'], 'Текст, "0"\nвторая строка')
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.download('csv').decode())))
+        self.assertEqual(len(rows), self.NOTES_COUNT)
+        self.assertEqual(rows[-1]['title'], f'Заметка {self.NOTES_COUNT - 1}')
+
+    def test_zip(self):
+        archive = zipfile.ZipFile(io.BytesIO(self.download('zip')))
+        self.assertIsNone(archive.testzip())
+        names = archive.namelist()
+        self.assertEqual(len(names), self.NOTES_COUNT)
+        note = Note.objects.filter(author=self.author).first()
+        self.assertEqual(
+            archive.read(f'{note.slug}.md').decode(),
+            export.note_as_markdown(note),
+        )
+
+    def test_large_zip_uses_zip64(self):
+        # Пороги ZIP64 занижены, чтобы не выгружать гигабайты.
+        with mock.patch.multiple(
+            export, ZIP64_LIMIT=100, ZIP_MAX_ENTRIES=3, ZIP_SPOOL_SIZE=100
+        ):
+            content = self.download('zip')
+        self.assertIn(b'PK\x06\x06', content)
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(len(archive.namelist()), self.NOTES_COUNT)
+        self.assertGreater(archive.infolist()[-1].header_offset, 100)
+
+    def test_notes_are_read_in_chunks(self):
+        with self.assertNumQueries(3):
+            notes = list(export.iter_notes(self.author, chunk_size=3))
+        self.assertEqual(len(notes), self.NOTES_COUNT)
+
+    def test_unknown_format(self):
+        response = self.author_client.get(
+            reverse('notes:export', args=('xml',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
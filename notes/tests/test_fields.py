@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from notes import fields
+from notes.models import Note, NoteBlob
+
+User = get_user_model()
+
+
+class TestCompressedTextField(TestCase):
+    LONG_TEXT = 'Строка журнала. ' * 500
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.note = Note.objects.create(
+            title='Журнал', text=cls.LONG_TEXT, author=cls.author
+        )
+
+    def stored(self, note):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT text FROM notes_noteblob WHERE digest = %s',
+                [note.blob_id],
+            )
+            return bytes(cursor.fetchone()[0])
+
+    def test_long_text_is_compressed(self):
+        stored = self.stored(self.note)
+        self.assertTrue(stored.startswith(fields.ZLIB))
+        self.assertLess(len(stored), len(self.LONG_TEXT) // 10)
+
+    def test_short_text_is_stored_raw(self):
+        note = Note.objects.create(
+            title='Коротко', text='Текст', author=self.author
+        )
+        self.assertEqual(self.stored(note), fields.RAW + 'Текст'.encode())
+
+    def test_text_is_decompressed_on_access(self):
+        body = NoteBlob.objects.get(pk=self.note.blob_id)
+        self.assertIsInstance(body.__dict__['text'], fields.CompressedText)
+        self.assertEqual(body.text, self.LONG_TEXT)
+        self.assertEqual(body.__dict__['text'], self.LONG_TEXT)
+
+    def test_save_without_access_keeps_text(self):
+        body = NoteBlob.objects.get(pk=self.note.blob_id)
+        body.save()
+        self.assertIsInstance(body.__dict__['text'], fields.CompressedText)
+        self.assertEqual(
+            NoteBlob.objects.get(pk=self.note.blob_id).text, self.LONG_TEXT
+        )
+
+    def test_legacy_raw_text_is_read(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE notes_noteblob SET text = %s WHERE digest = %s',
+                ['Старый текст', self.note.blob_id],
+            )
+        self.assertEqual(
+            Note.objects.get(pk=self.note.pk).text, 'Старый текст'
+        )
@@ -0,0 +1,119 @@
+import io
+import json
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from pytils.translit import slugify
+
+from notes import importer, search, slugs
+from notes.models import Note
+
+User = get_user_model()
+
+
+class TestNotesImport(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.existing = Note.objects.create(
+            title='Заметка', text='Уже есть', author=cls.author
+        )
+
+    def test_duplicate_titles_get_suffixes(self):
+        rows = [{'title': 'Заметка', 'text': f'Текст {i}'} for i in range(5)]
+        result = importer.import_notes(self.author, rows, batch_size=2)
+        self.assertEqual(result, importer.ImportResult(5, 3, {}))
+        base = slugify('Заметка')
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {base, *(f'{base}-{number}' for number in range(2, 7))},
+        )
+
+    def test_long_titles_get_suffixes(self):
+        title = 'ж' * 100
+        rows = [{'title': title, 'text': f'Текст {i}'} for i in range(3)]
+        for batch_size in (2, 1):
+            result = importer.import_notes(
+                self.author, rows, batch_size=batch_size
+            )
+            self.assertEqual(result.created, 3)
+        base = slugify(title)[:100]
+        self.assertEqual(
+            set(Note.objects.filter(title=title).values_list(
+                'slug', flat=True
+            )),
+            {base, *(f'{base[:98]}-{number}' for number in range(2, 7))},
+        )
+
+    def test_taken_slugs_use_index(self):
+        stems = slugs.suffix_stems('zametka')
+        plan = Note.objects.filter(
+            reduce(or_, map(slugs.stem_range, stems))
+        ).values('slug').explain()
+        self.assertIn('SEARCH', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_invalid_rows_are_skipped_with_errors(self):
+        rows = [
+            {'title': 'Плохой slug', 'slug': 'bad slug/../x'},
+            {'title': 5},
+            {'title': 'Верная', 'text': 'Текст', 'slug': 'vernaya'},
+            {'text': ['не строка']},
+            {'title': 'Д' * 101},
+            'не объект',
+        ]
+        result = importer.import_notes(self.author, rows, batch_size=2)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.batches, 1)
+        self.assertEqual(sorted(result.errors), [1, 2, 4, 5, 6])
+        self.assertEqual(list(result.errors[1]), ['slug'])
+        self.assertEqual(result.errors[2], {'title': ['Ожидается строка.']})
+        self.assertEqual(list(result.errors[4]), ['text'])
+        self.assertEqual(list(result.errors[5]), ['title'])
+        self.assertEqual(list(result.errors[6]), ['__all__'])
+        self.assertEqual(
+            list(Note.objects.filter(author=self.author).values_list(
+                'slug', flat=True
+            ).order_by('id')),
+            [self.existing.slug, 'vernaya'],
+        )
+
+    def test_import_is_batched(self):
+        rows = [{'title': f'Заметка {i}', 'text': 'Текст'} for i in range(15)]
+        with CaptureQueriesContext(connection) as one_batch:
+            importer.import_notes(self.author, rows[:5], batch_size=5)
+        # Число запросов на пачку не зависит от её размера.
+        with self.assertNumQueries(len(one_batch)):
+            importer.import_notes(self.author, rows[5:], batch_size=10)
+        self.assertEqual(Note.objects.count(), 16)
+
+    def test_imported_notes_are_searchable(self):
+        importer.import_notes(
+            self.author, [{'title': 'Рецепт', 'text': 'Пирог с вишней'}]
+        )
+        note = Note.objects.get(title='Рецепт')
+        self.assertEqual(note.excerpt, 'Пирог с вишней')
+        self.assertEqual(
+            list(search.search_notes(self.author, 'вишней')), [note]
+        )
+
+    def test_readers(self):
+        jsonl = io.StringIO(
+            json.dumps({'title': 'A', 'text': 'B'}) + '\n\n'
+        )
+        self.assertEqual(
+            list(importer.read_jsonl(jsonl)), [{'title': 'A', 'text': 'B'}]
+        )
+        # Испорченная строка не прерывает импорт: её отвергнет clean_row.
+        broken = io.StringIO('{"title": \n')
+        self.assertEqual(list(importer.read_jsonl(broken)), ['{"title":'])
+        csv_lines = io.StringIO('title,text,slug\nA,"B, C",a-slug\n')
+        self.assertEqual(
+            list(importer.read_csv(csv_lines)),
+            [{'title': 'A', 'text': 'B, C', 'slug': 'a-slug'}],
+        )
@@ -5,7 +5,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from pytils.translit import slugify
 
-from notes.forms import WARNING
+from notes.forms import WARNING, NoteForm
 from notes.models import Note
 
 User = get_user_model()
@@ -75,6 +75,33 @@ class TestNoteCreation(TestCase):
         expected_slug = slugify(self.data['title'])
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_same_title_gets_suffix(self):
+        self.data.pop('slug')
+        for _ in range(3):
+            self.auth_author.post(self.add_url, data=self.data)
+        base = slugify(self.NOTE_TITLE)
+        self.assertEqual(
+            list(Note.objects.order_by('id').values_list('slug', flat=True)),
+            [base, f'{base}-2', f'{base}-3'],
+        )
+
+    def test_long_title_gets_suffix(self):
+        self.data.pop('slug')
+        self.data['title'] = 'ж' * 100
+        for _ in range(3):
+            response = self.auth_author.post(self.add_url, data=self.data)
+            self.assertRedirects(response, self.done_url)
+        base = slugify(self.data['title'])[:100]
+        self.assertEqual(
+            list(Note.objects.order_by('id').values_list('slug', flat=True)),
+            [base, f'{base[:98]}-2', f'{base[:98]}-3'],
+        )
+
+    def test_create_does_not_probe_slug(self):
+        with self.assertNumQueries(0):
+            form = NoteForm(data=self.data)
+            self.assertTrue(form.is_valid())
+
 
 class TestNoteEditDelete(TestCase):
     NOTE_TITLE = 'Заметка'
@@ -127,6 +154,18 @@ class TestNoteEditDelete(TestCase):
         self.assertEqual(actual_note_slug, self.NEW_NOTE_SLUG)
         self.assertEqual(actual_note_author, expected_note_author)
 
+    def test_edit_to_taken_slug(self):
+        other_note = Note.objects.create(
+            title='Другая заметка', text='Текст', author=self.author
+        )
+        self.data['slug'] = other_note.slug
+        response = self.auth_author.post(self.note_edit_url, data=self.data)
+        self.assertFormError(
+            response, 'form', 'slug', errors=(other_note.slug + WARNING)
+        )
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, self.NOTE_TITLE)
+
     def test_author_can_delete_note(self):
         response = self.auth_author.delete(self.note_delete_url)
         self.assertRedirects(response, self.note_success_url)
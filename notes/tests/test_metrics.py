@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from notes.models import Note
+from yanote import metrics
+
+User = get_user_model()
+
+
+class TestRequestMetrics(TestCase):
+    NOTES_PAGE = reverse('notes:list')
+    METRICS_PAGE = reverse('metrics')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        Note.objects.create(title='Заголовок', text='Текст', author=cls.author)
+
+    def setUp(self):
+        metrics.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_server_timing_header(self):
+        response = self.client.get(self.NOTES_PAGE)
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'queries"', 'tpl;dur='):
+            self.assertIn(metric, timing)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_are_aggregated_by_route(self):
+        self.client.get(self.NOTES_PAGE)
+        self.client.get(self.NOTES_PAGE)
+        response = self.client.get(
+            self.METRICS_PAGE, HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        for line in (
+            'yanote_request_duration_seconds_count{route="notes:list"} 2',
+            'yanote_template_duration_seconds_count{route="notes:list"} 2',
+            'yanote_db_queries_bucket{route="notes:list",le="+Inf"} 2',
+            'notes_fragment_cache_lookups_total{result="miss"}',
+        ):
+            self.assertIn(line, body)
+
+    def test_metrics_are_internal(self):
+        # За прокси на том же сервере все запросы приходят с 127.0.0.1.
+        proxied = Client(REMOTE_ADDR='127.0.0.1')
+        cases = (
+            ('аноним через прокси', proxied, {}, {}),
+            ('не персонал', self.client, {}, {}),
+            (
+                'пустой токен',
+                proxied,
+                {'HTTP_AUTHORIZATION': 'Bearer '},
+                {'METRICS_TOKEN': ''},
+            ),
+            (
+                'чужой токен',
+                proxied,
+                {'HTTP_AUTHORIZATION': 'Bearer wrong'},
+                {'METRICS_TOKEN': 'secret'},
+            ),
+        )
+        for name, client, headers, settings in cases:
+            with self.subTest(name=name), override_settings(**settings):
+                response = client.get(self.METRICS_PAGE, **headers)
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_metrics_access(self):
+        staff = User.objects.create(username='Персонал', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        cases = (
+            ('персонал', staff_client, {}, {}),
+            (
+                'токен',
+                Client(),
+                {'HTTP_AUTHORIZATION': 'Bearer secret'},
+                {'METRICS_TOKEN': 'secret'},
+            ),
+            (
+                'адрес Prometheus',
+                Client(REMOTE_ADDR='10.0.0.5'),
+                {},
+                {'METRICS_ALLOWED_IPS': ['10.0.0.5']},
+            ),
+        )
+        for name, client, headers, settings in cases:
+            with self.subTest(name=name), override_settings(**settings):
+                response = client.get(self.METRICS_PAGE, **headers)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,163 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from notes import revisions
+from notes.importer import import_notes
+from notes.models import Note, NoteRevision, RevisionContent
+from notes.rebalance import copy_revisions
+
+User = get_user_model()
+
+TEXT = ''.join(f'Строка заметки номер {index}.\n' for index in range(50))
+
+
+def edited(text, index):
+    return text.replace(f'номер {index}.', f'номер {index} (правка).')
+
+
+class TestDelta(SimpleTestCase):
+
+    def test_round_trip(self):
+        text = edited(TEXT, 7) + 'Новая строка без перевода'
+        delta = revisions.make_delta(TEXT, text)
+        self.assertLess(len(delta), len(text) / 2)
+        self.assertEqual(revisions.apply_delta(TEXT, delta), text)
+
+    def test_unrelated_text_has_no_delta(self):
+        self.assertIsNone(revisions.make_delta(TEXT, 'Совсем другой текст'))
+
+
+class TestRevisions(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+
+    def setUp(self):
+        self.note = Note.objects.create(
+            title='Заголовок', text=TEXT, author=self.author
+        )
+
+    def edit(self, text, title=None):
+        note = Note.objects.with_text().get(pk=self.note.pk)
+        note.text
+        note.text = text
+        if title:
+            note.title = title
+        note.save()
+
+    def test_create_and_edit_record_revisions(self):
+        self.edit(edited(TEXT, 1), title='Новый заголовок')
+        history = list(self.note.revisions.order_by('number'))
+        self.assertEqual([item.number for item in history], [1, 2])
+        self.assertEqual(history[0].text, TEXT)
+        self.assertEqual(history[1].text, edited(TEXT, 1))
+        self.assertEqual(history[1].title, 'Новый заголовок')
+
+    def test_edit_is_stored_as_delta(self):
+        self.edit(edited(TEXT, 1))
+        content = self.note.revisions.get(number=2).content
+        self.assertEqual(content.depth, 1)
+        self.assertLess(len(content.data), len(TEXT) / 2)
+
+    def test_identical_texts_are_stored_once(self):
+        contents = RevisionContent.objects.count()
+        self.edit(edited(TEXT, 1))
+        self.edit(TEXT)
+        Note.objects.create(title='Копия', text=TEXT, author=self.author)
+        self.assertEqual(RevisionContent.objects.count(), contents + 1)
+        self.assertEqual(NoteRevision.objects.count(), 4)
+
+    def test_unchanged_save_adds_no_revision(self):
+        self.edit(TEXT)
+        self.assertEqual(self.note.revisions.count(), 1)
+
+    def test_chain_is_bounded(self):
+        text = TEXT
+        for index in range(revisions.SNAPSHOT_INTERVAL * 2):
+            text = edited(text, index)
+            self.edit(text)
+        history = self.note.revisions.select_related('content')
+        depths = [item.content.depth for item in history]
+        self.assertEqual(max(depths), revisions.SNAPSHOT_INTERVAL - 1)
+        self.assertEqual(depths.count(0), 3)
+        deepest = max(history, key=lambda item: item.content.depth)
+        with self.assertNumQueries(revisions.SNAPSHOT_INTERVAL - 1):
+            deepest.text
+        self.assertEqual(history.order_by('-number')[0].text, text)
+
+    def test_rebuild_without_previous_text(self):
+        note = Note.objects.get(pk=self.note.pk)
+        note.text = edited(TEXT, 3)
+        note.save()
+        self.assertEqual(
+            self.note.revisions.get(number=2).text, edited(TEXT, 3)
+        )
+
+    def test_import_records_first_revisions(self):
+        import_notes(self.author, [{'title': 'Из файла', 'text': TEXT}])
+        note = Note.objects.get(title='Из файла')
+        self.assertEqual(note.revisions.get().text, TEXT)
+
+    def test_copy_revisions(self):
+        self.edit(edited(TEXT, 1))
+        target = Note.objects.create(
+            title='Цель', text='Текст', author=self.author
+        )
+        target.revisions.all().delete()
+        copy_revisions({self.note.pk: target.pk}, 'default', 'default')
+        self.assertEqual(
+            [item.text for item in target.revisions.order_by('number')],
+            [TEXT, edited(TEXT, 1)],
+        )
+
+
+class TestRevisionViews(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.reader = User.objects.create(username='Читатель')
+        cls.note = Note.objects.create(
+            title='Заголовок', text=TEXT, author=cls.author
+        )
+        cls.note.text = edited(TEXT, 1)
+        cls.note.save()
+        cls.history_url = reverse('notes:history', args=(cls.note.slug,))
+        cls.revision_url = reverse(
+            'notes:revision', args=(cls.note.slug, 1)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_history_lists_revisions(self):
+        response = self.client.get(self.history_url)
+        numbers = [item.number for item in response.context['revisions']]
+        self.assertEqual(numbers, [2, 1])
+
+    def test_revision_shows_text(self):
+        response = self.client.get(self.revision_url)
+        self.assertContains(response, 'номер 1.')
+
+    def test_restore(self):
+        response = self.client.post(self.revision_url)
+        self.assertRedirects(
+            response, reverse('notes:detail', args=(self.note.slug,))
+        )
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(note.text, TEXT)
+        self.assertEqual(note.revisions.count(), 3)
+
+    def test_other_user_cannot_see_history(self):
+        self.client.force_login(self.reader)
+        for url in (self.history_url, self.revision_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.post(self.revision_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,118 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.cache import fragment_cache
+from notes.models import Note
+from yanote import routers
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class TestPrimaryReplicaRouter(TestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.tokens = (
+            routers._pinned.set(False), routers._wrote.set(False)
+        )
+
+    def tearDown(self):
+        routers._pinned.reset(self.tokens[0])
+        routers._wrote.reset(self.tokens[1])
+
+    def test_reads_go_to_replicas(self):
+        self.assertIn(
+            self.router.db_for_read(Note), ('replica1', 'replica2')
+        )
+
+    def test_reads_after_write_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Note), routers.PRIMARY)
+        self.assertEqual(self.router.db_for_read(Note), routers.PRIMARY)
+
+    def test_pinned_reads_go_to_primary(self):
+        routers._pinned.set(True)
+        self.assertEqual(self.router.db_for_read(Note), routers.PRIMARY)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(
+            self.router.allow_migrate('replica1', 'notes'), False
+        )
+        self.assertIsNone(self.router.allow_migrate('default', 'notes'))
+
+
+# Основная база под видом реплики: запросы работают, а решения
+# маршрутизатора видны по cookie.
+@override_settings(DATABASE_REPLICAS=['default'])
+class TestReplicaPinning(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.post(
+            reverse('notes:add'), {'title': 'Заметка', 'text': 'Текст'}
+        )
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_read_does_not_pin(self):
+        response = self.client.get(reverse('notes:list'))
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class TestReplicaReads(TestCase):
+    databases = {'default', 'replica1'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        # Пользователь уже попал в реплику.
+        User.objects.using('replica1').create(
+            pk=cls.author.pk, username=cls.author.username
+        )
+
+    def setUp(self):
+        fragment_cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.client.get(url)
+        return response, len(replica)
+
+    def test_reads_are_served_by_replica(self):
+        Note.objects.using('replica1').create(
+            title='Только в реплике', text='Текст', author=self.author
+        )
+        response, replica_queries = self.get(reverse('notes:list'))
+        self.assertContains(response, 'Только в реплике')
+        self.assertGreater(replica_queries, 0)
+
+    def test_own_write_is_read_from_primary(self):
+        response = self.client.post(
+            reverse('notes:add'), {'title': 'Новая', 'text': 'Текст'}
+        )
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        note = Note.objects.using('default').get(title='Новая')
+        url = reverse('notes:detail', args=(note.slug,))
+        response, replica_queries = self.get(url)
+        self.assertContains(response, 'Новая')
+        self.assertEqual(replica_queries, 0)
+        # Без cookie чтение идёт на реплику, до которой заметка
+        # ещё не дошла.
+        del self.client.cookies[routers.PIN_COOKIE]
+        response, replica_queries = self.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertGreater(replica_queries, 0)
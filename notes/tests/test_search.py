@@ -0,0 +1,151 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from notes import search
+from notes.importer import import_notes
+from notes.models import Note
+
+User = get_user_model()
+
+
+class TestNoteSearch(TestCase):
+    SEARCH_PAGE = reverse('notes:search')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_user = User.objects.create(username='Просто пользователь')
+
+        cls.note = Note.objects.create(
+            title='Список покупок',
+            text='Купить молоко и <b>хлеб</b>',
+            author=cls.author,
+        )
+        cls.other_note = Note.objects.create(
+            title='Чужие покупки',
+            text='Купить молоко',
+            author=cls.other_user,
+        )
+
+    def search(self, query):
+        response = self.author_client.get(self.SEARCH_PAGE, {'q': query})
+        return list(response.context['results'])
+
+    def test_search_is_scoped_by_author(self):
+        self.assertEqual(self.search('молоко'), [self.note])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        result, = self.search('хлеб')
+        self.assertIn('<mark>хлеб</mark>', result.snippet)
+        self.assertIn('&lt;b&gt;', result.snippet)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.note.text = 'Купить кефир'
+        self.note.save()
+        self.assertEqual(self.search('молоко'), [])
+        self.assertEqual(self.search('кефир'), [self.note])
+        self.note.delete()
+        self.assertEqual(self.search('кефир'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('("молоко* -'), [self.note])
+        self.assertEqual(self.search('  '), [])
+
+    def test_rebuild_index(self):
+        self.assertEqual(search.rebuild_index(), Note.objects.count())
+        self.assertEqual(self.search('покуп'), [self.note])
+
+    def test_failed_rebuild_keeps_index(self):
+        with self.assertRaises(ZeroDivisionError):
+            search.rebuild_index(
+                'default', progress=lambda *args: 1 / 0
+            )
+        self.assertEqual(self.search('покуп'), [self.note])
+
+    def test_rebuild_keeps_changes_made_meanwhile(self):
+        def change_notes(indexed, total):
+            if indexed > 1:
+                return
+            self.note.text = 'Купить кефир'
+            self.note.save()
+            self.other_note.delete()
+            Note.objects.create(
+                title='Новая', text='Купить сыр', author=self.author
+            )
+
+        search.rebuild_index('default', batch_size=1, progress=change_notes)
+        self.assertEqual(self.search('молоко'), [])
+        self.assertEqual(self.search('кефир'), [self.note])
+        self.assertEqual(len(self.search('сыр')), 1)
+        self.assertFalse(
+            Note.objects.raw(
+                f'SELECT rowid AS id FROM {search.FTS_TABLE} '
+                'WHERE rowid = %s',
+                (self.other_note.pk,),
+            )
+        )
+
+
+class TestRebuildTransactions(TransactionTestCase):
+
+    def test_progress_is_reported_outside_transaction(self):
+        author = User.objects.create(username='Автор заметки')
+        Note.objects.create(title='Заметка', text='Текст', author=author)
+        calls = []
+        search.rebuild_index(
+            'default',
+            progress=lambda *args: calls.append(
+                connection.in_atomic_block
+            ),
+        )
+        self.assertEqual(calls, [False])
+
+
+def count_vm_steps(func):
+    """Сколько шагов виртуальной машины SQLite занял вызов func."""
+    steps = 0
+
+    def count():
+        nonlocal steps
+        steps += 1
+    connection.ensure_connection()
+    connection.connection.set_progress_handler(count, 1)
+    try:
+        func()
+    finally:
+        connection.connection.set_progress_handler(None, 0)
+    return steps
+
+
+@skipUnless(search.is_supported('default'), 'Нужен SQLite с FTS5.')
+class TestSearchScaling(TestCase):
+    OTHER_NOTES = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.other_user = User.objects.create(username='Просто пользователь')
+        Note.objects.create(
+            title='Покупки', text='Купить молоко', author=cls.author
+        )
+
+    def test_cost_does_not_grow_with_other_authors_notes(self):
+        def run():
+            search.search_notes(self.author, 'молоко')
+        alone = count_vm_steps(run)
+        import_notes(
+            self.other_user,
+            [
+                {'title': f'Чужие покупки {index}', 'text': 'Купить молоко'}
+                for index in range(self.OTHER_NOTES)
+            ],
+        )
+        # Фильтр после MATCH прошёл бы по всем 2000 чужим совпадениям.
+        self.assertLess(count_vm_steps(run), alone * 2)
+        self.assertEqual(len(search.search_notes(self.author, 'молоко')), 1)
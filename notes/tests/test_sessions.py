@@ -0,0 +1,173 @@
+import copy
+import shutil
+import tempfile
+from http import HTTPStatus
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yanote import sessions
+from yanote.sessions import SessionStore
+
+User = get_user_model()
+
+NOTES_PAGE = reverse('notes:list')
+
+
+def session_data(session_key):
+    session = Session.objects.get(session_key=session_key)
+    return SessionStore().decode(session.session_data)
+
+
+class TestCachedAuth(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_tests_do_not_touch_server_cache(self):
+        location = Path(caches[settings.SESSION_CACHE_ALIAS]._dir)
+        self.assertFalse(location.is_relative_to(settings.BASE_DIR))
+
+    def get_tables(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return ' '.join(query['sql'] for query in queries)
+
+    def test_warm_request_skips_session_and_user(self):
+        self.get_tables(NOTES_PAGE)
+        sql = self.get_tables(NOTES_PAGE)
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn('auth_user', sql)
+
+    def test_user_change_is_visible(self):
+        self.client.get(NOTES_PAGE)
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        response = self.client.get(NOTES_PAGE)
+        self.assertEqual(response.wsgi_request.user.first_name, 'Новое имя')
+
+    def test_password_change_ends_session(self):
+        self.client.get(NOTES_PAGE)
+        self.author.set_password('new-password')
+        self.author.save()
+        response = self.client.get(NOTES_PAGE)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class TestTwoWorkers(TestCase):
+    """Выход и смена пароля в одном воркере видны в другом."""
+    BACKENDS = {
+        'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+        'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def worker(self, name, backend):
+        # Память LocMemCache у каждого процесса своя, а каталог файлового
+        # кэша — общий.
+        location = f'{self.root}/{name if backend == "locmem" else ""}'
+        cache = {'BACKEND': self.BACKENDS[backend], 'LOCATION': location}
+        return override_settings(CACHES={'default': cache, 'shared': cache})
+
+    def logout(self, client):
+        client.logout()
+
+    def change_password(self, client):
+        self.author.set_password('new-password')
+        self.author.save()
+
+    def test_auth_change_is_seen_by_other_worker(self):
+        for backend in self.BACKENDS:
+            for action in (self.logout, self.change_password):
+                with self.subTest(backend=backend, action=action.__name__):
+                    client = Client()
+                    # Вторая вкладка с той же cookie сессии: после выхода
+                    # client свою cookie забывает, а эта — нет.
+                    other_tab = Client()
+                    with self.worker('a', backend):
+                        client.force_login(self.author)
+                        other_tab.cookies = copy.copy(client.cookies)
+                        response = other_tab.get(NOTES_PAGE)
+                        self.assertEqual(response.status_code, HTTPStatus.OK)
+                    with self.worker('b', backend):
+                        action(client)
+                    with self.worker('a', backend):
+                        response = other_tab.get(NOTES_PAGE)
+                    self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+@override_settings(SESSION_WRITE_BEHIND=30)
+class TestWriteBehindSessions(TestCase):
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.store = SessionStore()
+        self.store['first'] = 1
+        self.store.create()
+
+    def tearDown(self):
+        sessions._pending.clear()
+
+    def change(self):
+        store = SessionStore(self.store.session_key)
+        store['second'] = 2
+        store.save()
+        return store
+
+    def test_new_session_is_written_at_once(self):
+        self.assertEqual(session_data(self.store.session_key), {'first': 1})
+
+    def test_change_is_deferred(self):
+        self.change()
+        self.assertNotIn('second', session_data(self.store.session_key))
+        store = SessionStore(self.store.session_key)
+        self.assertEqual(store['second'], 2)
+        self.assertEqual(sessions.flush_pending(force=True), 1)
+        self.assertEqual(session_data(self.store.session_key)['second'], 2)
+
+    def test_pending_change_waits_for_deadline(self):
+        self.change()
+        self.assertEqual(sessions.flush_pending(), 0)
+
+    def test_auth_change_is_written_at_once(self):
+        user = User.objects.create(username='Автор')
+        client = Client()
+        client.force_login(user)
+        self.assertEqual(
+            session_data(client.session.session_key)['_auth_user_id'],
+            str(user.pk),
+        )
+
+    @override_settings(SESSION_WRITE_BEHIND=0)
+    def test_write_behind_can_be_disabled(self):
+        self.change()
+        self.assertEqual(session_data(self.store.session_key)['second'], 2)
+
+    def test_deleted_session_is_not_written(self):
+        store = self.change()
+        store.delete()
+        self.assertEqual(sessions.flush_pending(force=True), 0)
+        self.assertFalse(
+            Session.objects.filter(session_key=store.session_key).exists()
+        )
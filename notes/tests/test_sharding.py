@@ -0,0 +1,244 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from notes import rebalance, search, sharding
+from notes.importer import import_notes
+from notes.models import Note, NoteBlob, NoteRevision, NoteSlug
+from notes.rebalance import rebuild_registry
+from notes.slugs import SlugTakenError
+
+User = get_user_model()
+
+
+class TestShardRouter(TestCase):
+
+    def setUp(self):
+        self.router = sharding.ShardRouter()
+
+    @override_settings(NOTE_SHARDS=['default', 'shard1'])
+    def test_author_picks_shard(self):
+        self.assertEqual(sharding.shard_for_author(2), 'default')
+        self.assertEqual(sharding.shard_for_author(3), 'shard1')
+        note = Note(author_id=3)
+        self.assertEqual(
+            self.router.db_for_write(Note, instance=note), 'shard1'
+        )
+        self.assertEqual(
+            self.router.db_for_write(NoteSlug), sharding.REGISTRY_DB
+        )
+
+    @override_settings(NOTE_SHARDS=['default', 'shard1'])
+    def test_only_notes_are_migrated_to_shards(self):
+        self.assertIs(self.router.allow_migrate('shard1', 'auth'), False)
+        self.assertIs(
+            self.router.allow_migrate('shard1', 'notes', 'noteslug'), False
+        )
+        self.assertIs(
+            self.router.allow_migrate('shard1', 'notes', 'note'), True
+        )
+        self.assertIsNone(self.router.allow_migrate('default', 'auth'))
+
+    def test_single_shard_is_not_routed(self):
+        self.assertIsNone(
+            self.router.db_for_write(Note, instance=Note(author_id=3))
+        )
+
+
+# Обе «шарды» — основная база: так проверяется реестр slug.
+@override_settings(NOTE_SHARDS=['default', 'default'])
+class TestSlugRegistry(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.other = User.objects.create(username='Другой автор')
+
+    def create(self, author, **fields):
+        return Note.objects.create(
+            title='Заметка', text='Текст', author=author, **fields
+        )
+
+    def test_save_reserves_slug(self):
+        note = self.create(self.author)
+        self.assertEqual(
+            NoteSlug.objects.get(slug=note.slug).author_id, self.author.pk
+        )
+
+    def test_registry_suffixes_taken_slug(self):
+        self.create(self.author)
+        note = self.create(self.other)
+        self.assertEqual(note.slug, 'zametka-2')
+
+    def test_taken_explicit_slug(self):
+        self.create(self.author, slug='taken')
+        with self.assertRaises(SlugTakenError):
+            self.create(self.other, slug='taken')
+
+    def test_slug_change_and_delete_release_registry(self):
+        note = self.create(self.author)
+        note.slug = 'renamed'
+        note.save()
+        self.assertEqual(
+            list(NoteSlug.objects.values_list('slug', flat=True)),
+            ['renamed'],
+        )
+        note.delete()
+        self.assertFalse(NoteSlug.objects.exists())
+
+    def test_import_reserves_slugs(self):
+        import_notes(self.author, [{'title': 'Заметка'}] * 2)
+        self.assertEqual(
+            set(NoteSlug.objects.values_list('slug', flat=True)),
+            {'zametka', 'zametka-2'},
+        )
+
+    def test_rebuild_registry(self):
+        self.create(self.author)
+        NoteSlug.objects.all().delete()
+        self.assertEqual(rebuild_registry(), 1)
+        self.assertTrue(NoteSlug.objects.filter(slug='zametka').exists())
+
+
+SHARDS = ['default', 'shard1']
+
+
+# Две настоящие базы: автор с чётным id живёт в default, с нечётным —
+# в shard1.
+@override_settings(NOTE_SHARDS=SHARDS)
+class TestShards(TestCase):
+    databases = {'default', 'shard1'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(pk=2, username='Автор')
+        cls.other = User.objects.create(pk=3, username='Другой автор')
+
+    def create(self, author, **fields):
+        fields.setdefault('title', 'Заметка')
+        return Note.objects.create(text='Текст', author=author, **fields)
+
+    def shard_slugs(self, shard, author):
+        return list(
+            Note.objects.using(shard).filter(author=author)
+            .order_by('slug').values_list('slug', flat=True)
+        )
+
+    def test_notes_live_in_author_shard(self):
+        note = self.create(self.other)
+        self.assertEqual(note._state.db, 'shard1')
+        self.assertEqual(self.shard_slugs('shard1', self.other), ['zametka'])
+        self.assertEqual(self.shard_slugs('default', self.other), [])
+        self.assertEqual(
+            list(Note.objects.for_author(self.other)), [note]
+        )
+        self.assertEqual(
+            NoteSlug.objects.using('default').get(slug='zametka').author_id,
+            self.other.pk,
+        )
+
+    def test_request_user_is_related_to_shard_note(self):
+        client = Client()
+        client.force_login(self.other)
+        response = client.post(
+            reverse('notes:api_batch'),
+            json.dumps({'create': [{'title': 'Из API', 'text': 'Текст'}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        client.post(
+            reverse('notes:add'), {'title': 'Из формы', 'text': 'Текст'}
+        )
+        self.assertEqual(
+            self.shard_slugs('shard1', self.other), ['iz-api', 'iz-formyi']
+        )
+
+    def test_slug_is_unique_across_shards(self):
+        self.create(self.author)
+        note = self.create(self.other)
+        self.assertEqual(note.slug, 'zametka-2')
+        with self.assertRaises(SlugTakenError):
+            self.create(self.other, slug='zametka')
+
+    def test_rebuild_registry_reads_every_shard(self):
+        self.create(self.author)
+        self.create(self.other)
+        NoteSlug.objects.all().delete()
+        self.assertEqual(rebuild_registry(), 2)
+        self.assertEqual(
+            dict(NoteSlug.objects.values_list('slug', 'author_id')),
+            {'zametka': self.author.pk, 'zametka-2': self.other.pk},
+        )
+
+    def create_misplaced(self, count):
+        """Заметки автора в default, как до добавления shard1."""
+        with override_settings(NOTE_SHARDS=['default']):
+            for index in range(count):
+                note = self.create(self.other, title=f'Заметка {index}')
+                note.text = 'Новый текст'
+                note.save()
+
+    def test_rebalance_moves_misplaced_author(self):
+        self.create_misplaced(3)
+        created = dict(
+            Note.objects.using('default').values_list('slug', 'created_at')
+        )
+        out = StringIO()
+        call_command(
+            'rebalance_shards', batch_size=2, rebuild_registry=True,
+            stdout=out,
+        )
+        self.assertIn('Автор 3: default -> shard1, заметок: 3', out.getvalue())
+        self.assertEqual(self.shard_slugs('default', self.other), [])
+        moved = Note.objects.using('shard1').with_text()
+        self.assertEqual(
+            dict(moved.values_list('slug', 'created_at')), created
+        )
+        self.assertEqual({note.text for note in moved}, {'Новый текст'})
+        self.assertEqual(
+            NoteRevision.objects.using('shard1').count(), 6
+        )
+        self.assertFalse(
+            NoteBlob.objects.using('default').filter(refcount__gt=0).exists()
+        )
+        self.assertEqual(NoteSlug.objects.count(), 3)
+
+    def test_failed_move_can_be_repeated(self):
+        self.create_misplaced(3)
+        unindex = search.unindex_notes
+        calls = []
+
+        def fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('Сбой')
+            unindex(*args)
+
+        with mock.patch.object(
+            search, 'unindex_notes', side_effect=fail_second_batch
+        ):
+            with self.assertRaises(RuntimeError):
+                rebalance.move_author(self.other.pk, 'default', 'shard1', 1)
+        # Вторая заметка уже скопирована, но из источника не удалена.
+        self.assertEqual(
+            self.shard_slugs('shard1', self.other),
+            ['zametka-0', 'zametka-1'],
+        )
+        self.assertEqual(
+            self.shard_slugs('default', self.other),
+            ['zametka-1', 'zametka-2'],
+        )
+        self.assertEqual(
+            rebalance.move_author(self.other.pk, 'default', 'shard1', 1), 2
+        )
+        self.assertEqual(self.shard_slugs('default', self.other), [])
+        self.assertEqual(
+            self.shard_slugs('shard1', self.other),
+            ['zametka-0', 'zametka-1', 'zametka-2'],
+        )
+        self.assertEqual(NoteRevision.objects.using('shard1').count(), 6)
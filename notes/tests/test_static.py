@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from yanote.staticfiles import IMMUTABLE_MAX_AGE, StaticFilesApplication
+
+CSS = '.note { color: black; }\n' * 100
+SMALL_CSS = 'a { color: red; }\n'
+
+
+def fallback(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+class TestStaticFiles(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        for name, content in (('site.css', CSS), ('small.css', SMALL_CSS)):
+            with open(os.path.join(cls.source, 'css', name), 'w') as file:
+                file.write(content)
+        with override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATIC_ROOT=cls.root,
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'
+            ],
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as manifest:
+            cls.hashed = json.load(manifest)['paths']['css/site.css']
+        cls.app = StaticFilesApplication(fallback, cls.root, '/static/')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.source)
+        shutil.rmtree(cls.root)
+        super().tearDownClass()
+
+    def request(self, path, method='GET', app=None, **headers):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': method, **headers}
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        result = (app or self.app)(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], body
+
+    def test_gzip_copies_are_built(self):
+        for name in (self.hashed, 'css/site.css'):
+            with self.subTest(name=name):
+                with gzip.open(os.path.join(self.root, name + '.gz')) as file:
+                    self.assertEqual(file.read().decode(), CSS)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, 'css/small.css.gz'))
+        )
+
+    def test_hashed_file_is_immutable(self):
+        status, headers, body = self.request(f'/static/{self.hashed}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body.decode(), CSS)
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(
+            headers['Cache-Control'],
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable',
+        )
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+    @override_settings(STATIC_MAX_AGE=60)
+    def test_unhashed_file_is_cached_briefly(self):
+        app = StaticFilesApplication(fallback, self.root, '/static/')
+        _, headers, _ = self.request('/static/css/site.css', app=app)
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=60')
+
+    def test_gzip_variant(self):
+        status, headers, body = self.request(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='br, gzip'
+        )
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertEqual(gzip.decompress(body).decode(), CSS)
+
+    def test_gzip_refused(self):
+        _, headers, _ = self.request(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip;q=0'
+        )
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_not_modified(self):
+        _, headers, _ = self.request(f'/static/{self.hashed}')
+        status, _, body = self.request(
+            f'/static/{self.hashed}', HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_head(self):
+        status, headers, body = self.request(
+            f'/static/{self.hashed}', method='HEAD'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(int(headers['Content-Length']), len(CSS))
+        self.assertEqual(body, b'')
+
+    def test_other_paths_go_to_django(self):
+        for path in ('/notes/', '/static/missing.css', '/static/../x'):
+            with self.subTest(path=path):
+                self.assertEqual(self.request(path)[2], b'django')
+
+    def test_post_not_allowed(self):
+        status, headers, _ = self.request(
+            f'/static/{self.hashed}', method='POST'
+        )
+        self.assertEqual(status, '405 Method Not Allowed')
+        self.assertEqual(headers['Allow'], 'GET, HEAD')
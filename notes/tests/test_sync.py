@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes import importer
+from notes.models import Note, NoteChange
+
+User = get_user_model()
+
+
+class TestDeltaSync(TestCase):
+    SYNC_URL = reverse('notes:api_sync')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_user = User.objects.create(username='Просто пользователь')
+        cls.note = Note.objects.create(
+            title='Заголовок', text='Текст заметки', author=cls.author
+        )
+        Note.objects.create(
+            title='Чужая', text='Чужой текст', author=cls.other_user
+        )
+
+    def sync(self, since=0):
+        return self.author_client.get(self.SYNC_URL, {'since': since}).json()
+
+    def test_full_sync_from_zero(self):
+        data = self.sync()
+        self.assertEqual(len(data['changes']), 1)
+        change, = data['changes']
+        self.assertEqual(change['action'], NoteChange.UPSERT)
+        self.assertEqual(change['note']['text'], self.note.text)
+        self.assertFalse(data['has_more'])
+
+    def test_only_changes_after_cursor(self):
+        cursor = self.sync()['cursor']
+        self.assertEqual(self.sync(cursor)['changes'], [])
+        self.note.text = 'Новый текст'
+        self.note.save()
+        importer.import_notes(self.author, [{'title': 'Импорт'}])
+        changes = self.sync(cursor)['changes']
+        self.assertEqual(
+            [change['note']['text'] for change in changes],
+            ['Новый текст', ''],
+        )
+
+    def test_delete_leaves_tombstone(self):
+        cursor = self.sync()['cursor']
+        note_id, slug = self.note.id, self.note.slug
+        self.note.delete()
+        change, = self.sync(cursor)['changes']
+        self.assertEqual(change['action'], NoteChange.DELETE)
+        self.assertEqual((change['id'], change['slug']), (note_id, slug))
+        self.assertIsNone(change['note'])
+
+    def test_log_keeps_latest_change_per_note(self):
+        for _ in range(3):
+            self.note.save()
+        self.assertEqual(
+            NoteChange.objects.filter(note_id=self.note.id).count(), 1
+        )
+        self.assertGreater(self.sync()['cursor'], 0)
+
+    def test_user_deletion_clears_log(self):
+        self.author.delete()
+        self.assertFalse(
+            NoteChange.objects.filter(author_id=self.author.id).exists()
+        )
@@ -0,0 +1,251 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import tasks
+from notes.models import Note, Task
+
+User = get_user_model()
+
+FAILURES = {'flaky': 0}
+
+
+@tasks.task('tests.flaky')
+def flaky(task, failures):
+    """Падает первые failures раз."""
+    if FAILURES['flaky'] < failures:
+        FAILURES['flaky'] += 1
+        raise RuntimeError('Сбой')
+
+
+class TasksTestMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.results_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.results_root)
+        settings = override_settings(TASKS={
+            'RESULTS_ROOT': self.results_root,
+            'RETRY_DELAY': 0,
+            'POLL_INTERVAL': 0.01,
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        FAILURES['flaky'] = 0
+
+
+class TestTaskQueue(TasksTestMixin, TestCase):
+
+    def test_claim_takes_task_once(self):
+        task = tasks.enqueue('tests.flaky', failures=0)
+        claimed = tasks.claim('worker')
+        self.assertEqual(claimed.pk, task.pk)
+        self.assertEqual(claimed.status, Task.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(tasks.claim('worker'))
+
+    def test_locked_write_is_retried(self):
+        errors = [
+            OperationalError('database table is locked: notes_task')
+        ] * 2
+
+        @tasks.retry_locked
+        def write():
+            if errors:
+                raise errors.pop()
+            return 'ok'
+
+        self.assertEqual(write(), 'ok')
+
+        @tasks.retry_locked
+        def broken():
+            errors.append(None)
+            raise OperationalError('no such table: notes_task')
+
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(errors), 1)
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(ValueError):
+            tasks.enqueue('tests.missing')
+
+    def test_failed_task_is_retried(self):
+        task = tasks.enqueue('tests.flaky', failures=1)
+        with self.assertLogs('notes.tasks', 'ERROR'):
+            self.assertEqual(tasks.work(), 2)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(task.error, 'RuntimeError: Сбой')
+
+    def test_task_fails_after_max_attempts(self):
+        task = tasks.enqueue('tests.flaky', max_attempts=2, failures=5)
+        with self.assertLogs('notes.tasks', 'ERROR') as logs:
+            tasks.work()
+        self.assertEqual(len(logs.records), 2)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.assertIsNotNone(task.finished_at)
+
+    @override_settings(TASKS={'RETRY_DELAY': 60})
+    def test_retry_waits_with_backoff(self):
+        task = tasks.enqueue('tests.flaky', failures=5)
+        with self.assertLogs('notes.tasks', 'ERROR'):
+            self.assertEqual(tasks.work(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertGreater(
+            task.run_after, timezone.now() + timedelta(seconds=50)
+        )
+
+    def test_stale_task_is_requeued(self):
+        old = timezone.now() - timedelta(days=1)
+        requeued = tasks.enqueue('tests.flaky', failures=0)
+        exhausted = tasks.enqueue('tests.flaky', max_attempts=1, failures=0)
+        Task.objects.update(
+            status=Task.RUNNING, attempts=1, heartbeat_at=old
+        )
+        self.assertEqual(tasks.requeue_stale(), 2)
+        requeued.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(requeued.status, Task.PENDING)
+        self.assertEqual(exhausted.status, Task.FAILED)
+
+    def test_progress_is_throttled(self):
+        task = tasks.enqueue('tests.flaky', failures=0)
+        report = tasks.progress_reporter(task, interval=60)
+        report(1, 3)
+        report(2, 3)
+        task.refresh_from_db()
+        self.assertEqual((task.done, task.total), (1, 3))
+        report(3, 3)
+        task.refresh_from_db()
+        self.assertEqual((task.done, task.total), (3, 3))
+
+    def test_expired_results_are_purged(self):
+        task = tasks.enqueue('tests.flaky', failures=0)
+        path = Path(self.results_root) / 'old.jsonl'
+        path.write_text('')
+        Task.objects.update(
+            status=Task.DONE,
+            result=path.name,
+            finished_at=timezone.now() - timedelta(days=2),
+        )
+        self.assertEqual(tasks.purge_expired(), 1)
+        self.assertFalse(path.exists())
+        self.assertFalse(Task.objects.filter(pk=task.pk).exists())
+
+
+class TestNoteTasks(TasksTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.reader = User.objects.create(username='Читатель')
+        for index in range(3):
+            Note.objects.create(
+                title=f'Заметка {index}', text='Текст', author=cls.author
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_export_is_handed_off_to_worker(self):
+        url = reverse('notes:export', args=('jsonl',))
+        response = self.author_client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        self.assertEqual(response.json()['status'], Task.PENDING)
+        status_url = response['Location']
+        tasks.work()
+        status = self.author_client.get(status_url).json()
+        self.assertEqual(status['status'], Task.DONE)
+        self.assertEqual(status['progress'], {'done': 3, 'total': 3})
+        response = self.author_client.get(status['result_url'])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['title'] for line in lines],
+            ['Заметка 0', 'Заметка 1', 'Заметка 2'],
+        )
+
+    def test_other_users_tasks_are_hidden(self):
+        task = tasks.enqueue(
+            'notes.export', owner_id=self.author.pk, export_format='csv'
+        )
+        tasks.work()
+        for name in ('notes:task', 'notes:task_result'):
+            with self.subTest(name=name):
+                response = self.reader_client.get(
+                    reverse(name, args=(task.pk,))
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_import_resumes_after_saved_batches(self):
+        path = Path(self.results_root) / 'notes.jsonl'
+        path.write_text(''.join(
+            json.dumps({'title': f'Импорт {index}', 'text': 'Текст'}) + '\n'
+            for index in range(5)
+        ))
+        task = tasks.enqueue(
+            'notes.import',
+            owner_id=self.reader.pk,
+            path=str(path),
+            import_format='jsonl',
+            batch_size=2,
+        )
+        # Прошлая попытка успела сохранить первую пачку.
+        Task.objects.filter(pk=task.pk).update(done=2)
+        tasks.work()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual(task.done, 5)
+        self.assertEqual(
+            list(Note.objects.filter(author=self.reader).values_list(
+                'title', flat=True
+            ).order_by('id')),
+            ['Импорт 2', 'Импорт 3', 'Импорт 4'],
+        )
+
+    def test_delete_author_reports_progress(self):
+        out = StringIO()
+        call_command(
+            'delete_author_notes', str(self.author.pk),
+            background=True, delete_user=True, chunk_size=2, stdout=out,
+        )
+        self.assertTrue(Note.objects.filter(author=self.author).exists())
+        tasks.work()
+        task = Task.objects.get(name='notes.delete_author')
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual((task.done, task.total), (3, 3))
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+
+
+class TestRunTasksCommand(TasksTestMixin, TransactionTestCase):
+
+    def test_threads_process_queue(self):
+        for _ in range(5):
+            tasks.enqueue('tests.flaky', failures=0)
+        out = StringIO()
+        call_command('run_tasks', burst=True, threads=2, stdout=out)
+        self.assertEqual(out.getvalue(), 'Выполнено задач: 5\n')
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 5
+        )
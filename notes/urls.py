@@ -1,6 +1,6 @@
 from django.urls import path
 
-from notes import views
+from notes import api, views
 
 app_name = 'notes'
 
@@ -9,7 +9,42 @@ urlpatterns = [
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
+    path(
+        'note/<slug:slug>/history/',
+        views.NoteHistory.as_view(),
+        name='history',
+    ),
+    path(
+        'note/<slug:slug>/history/<int:number>/',
+        views.NoteRevisionDetail.as_view(),
+        name='revision',
+    ),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path(
+        'export/<str:export_format>/',
+        views.NoteExport.as_view(),
+        name='export',
+    ),
+    path('tasks/<int:pk>/', views.TaskStatus.as_view(), name='task'),
+    path(
+        'tasks/<int:pk>/result/',
+        views.TaskResult.as_view(),
+        name='task_result',
+    ),
+    path(
+        'cache-stats/',
+        views.FragmentCacheStats.as_view(),
+        name='cache_stats',
+    ),
+    path('api/notes/', api.NoteApiList.as_view(), name='api_list'),
+    path('api/sync/', api.NoteApiSync.as_view(), name='api_sync'),
+    path('api/notes/batch/', api.NoteApiBatch.as_view(), name='api_batch'),
+    path(
+        'api/notes/<slug:slug>/',
+        api.NoteApiDetail.as_view(),
+        name='api_detail',
+    ),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
@@ -1,9 +1,24 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+import hashlib
+from http import HTTPStatus
+
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin, UserPassesTestMixin
+)
+from django.http import (
+    FileResponse, Http404, JsonResponse, StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import patch_cache_control
 from django.views import generic
+from django.views.decorators.http import condition
 
+from . import export, search, tasks
+from .cache import fragment_cache
 from .forms import NoteForm
-from .models import Note
+from .models import Note, NoteChange, Task
+from .slugs import SlugTakenError
+from .pagination import KeysetPaginator, parse_cursor
 
 
 class Home(generic.TemplateView):
@@ -23,25 +38,72 @@ class NoteBase(LoginRequiredMixin):
 
     def get_queryset(self):
         """Пользователь может работать только со своими заметками."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.for_author(self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+def make_etag(*parts):
+    """Значение ETag из составляющих состояния страницы."""
+    state = ':'.join(str(part) for part in parts)
+    return hashlib.md5(state.encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 Not Modified, не выполняя представление и шаблон.
+
+    Валидаторы считаются отдельным дешёвым запросом по индексу.
+    Посчитанный ETag остаётся в view.etag: шаблон берёт его версией
+    кэша фрагментов.
+    """
+    etag = None
+
+    def get_etag(self, request, *args, **kwargs):
+        return None
+
+    def remember_etag(self, request, *args, **kwargs):
+        self.etag = self.get_etag(request, *args, **kwargs)
+        return self.etag
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        view = condition(
+            etag_func=self.remember_etag,
+            last_modified_func=self.get_last_modified,
+        )(super().dispatch)
+        response = view(request, *args, **kwargs)
+        # Страница зависит от пользователя: общие кэши её хранить не должны,
+        # а браузер перепроверяет её при каждом просмотре.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class NoteFormMixin:
+    """Показывает занятый slug как ошибку формы."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        try:
+            return super().form_valid(form)
+        except SlugTakenError:
+            form.add_slug_taken_error()
+            return self.form_invalid(form)
+
+
+class NoteCreate(NoteBase, NoteFormMixin, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteBase, NoteFormMixin, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
+
+    def get_queryset(self):
+        return super().get_queryset().with_text()
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
@@ -49,11 +111,226 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
-class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+class NotesList(NoteBase, ConditionalGetMixin, generic.ListView):
+    """Список всех заметок пользователя.
+
+    По умолчанию страницы листаются курсором (?after=<id> / ?before=<id>),
+    номер страницы (?page=<n>) тоже поддерживается.
+    """
     template_name = 'notes/list.html'
+    paginate_by = 20
+    ordering = ('id',)
+    # Список не показывает текст заметки, поэтому тяжёлый столбец не читаем.
+    list_fields = ('id', 'slug', 'title', 'excerpt')
+
+    def get_queryset(self):
+        return super().get_queryset().only(*self.list_fields).order_by(
+            *self.get_ordering()
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        page = KeysetPaginator(page_size).page(
+            queryset,
+            after=parse_cursor(self.request.GET.get('after')),
+            before=parse_cursor(self.request.GET.get('before')),
+        )
+        # Страница ленивая: запрос выполнится при первом обращении к ней.
+        return None, page, page, page.has_other_pages
 
+    def get_etag(self, request, *args, **kwargs):
+        # Last-Modified для списка не подходит: удаление заметки не меняет
+        # максимальное время изменения. Любое изменение заметок автора
+        # добавляет запись в журнал синхронизации, и последний её id
+        # находится по индексу (author, id) без обхода заметок.
+        changes = NoteChange.objects.for_author(request.user)
+        last_change = changes.order_by('-id').values_list(
+            'id', flat=True
+        ).first()
+        return make_etag(
+            request.user.pk,
+            changes.db,
+            last_change,
+            request.get_full_path(),
+        )
 
-class NoteDetail(NoteBase, generic.DetailView):
+
+class NoteDetail(NoteBase, ConditionalGetMixin, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_queryset(self):
+        return super().get_queryset().with_text()
+
+    def get_version(self, request, slug):
+        if not hasattr(self, '_version'):
+            self._version = self.get_queryset().filter(
+                slug=slug
+            ).values_list('pk', 'updated_at').first()
+        return self._version
+
+    def get_etag(self, request, slug):
+        version = self.get_version(request, slug)
+        if version is None:
+            return None
+        return make_etag(request.user.pk, *version)
+
+    def get_last_modified(self, request, slug):
+        version = self.get_version(request, slug)
+        return version[1] if version else None
+
+
+class NoteHistory(NoteBase, generic.ListView):
+    """Ревизии заметки, новые сверху."""
+    template_name = 'notes/history.html'
+    context_object_name = 'revisions'
+    paginate_by = 50
+
+    def get_queryset(self):
+        self.note = get_object_or_404(
+            super().get_queryset().only('id', 'slug', 'title', 'author'),
+            slug=self.kwargs['slug'],
+        )
+        return self.note.revisions.only(
+            'number', 'title', 'size', 'created_at'
+        ).order_by('-number')
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(note=self.note, **kwargs)
+
+
+class NoteRevisionDetail(NoteBase, generic.DetailView):
+    """Текст ревизии; POST восстанавливает её новой ревизией."""
+    template_name = 'notes/revision.html'
+    context_object_name = 'revision'
+
+    def get_object(self, queryset=None):
+        note = get_object_or_404(
+            super().get_queryset(), slug=self.kwargs['slug']
+        )
+        revision = get_object_or_404(
+            note.revisions.select_related('content'),
+            number=self.kwargs['number'],
+        )
+        revision.note = note
+        return revision
+
+    def post(self, request, *args, **kwargs):
+        revision = self.get_object()
+        note = revision.note
+        note.title = revision.title
+        note.text = revision.text
+        note.save()
+        return redirect('notes:detail', slug=note.slug)
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+    context_object_name = 'results'
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        return search.search_notes(self.request.user, self.query)
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(query=self.query, **kwargs)
+
+
+class NoteExport(LoginRequiredMixin, generic.View):
+    """Потоковая выгрузка всех заметок пользователя.
+
+    POST ставит выгрузку в очередь фоновых задач и отвечает адресом,
+    по которому видно её состояние.
+    """
+
+    def get(self, request, export_format):
+        if export_format not in export.FORMATS:
+            raise Http404
+        response = StreamingHttpResponse(
+            export.export_notes(request.user, export_format),
+            content_type=export.FORMATS[export_format].content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{export_format}"'
+        )
+        return response
+
+    def post(self, request, export_format):
+        if export_format not in export.FORMATS:
+            raise Http404
+        task = tasks.enqueue(
+            'notes.export',
+            owner_id=request.user.pk,
+            export_format=export_format,
+        )
+        response = JsonResponse(
+            task_as_dict(task), status=HTTPStatus.ACCEPTED
+        )
+        response['Location'] = reverse('notes:task', args=(task.pk,))
+        return response
+
+
+def task_as_dict(task):
+    done = task.status == Task.DONE and task.result
+    return {
+        'id': task.pk,
+        'name': task.name,
+        'status': task.status,
+        'attempts': task.attempts,
+        'max_attempts': task.max_attempts,
+        'progress': {'done': task.done, 'total': task.total},
+        'error': task.error,
+        'created_at': task.created_at.isoformat(),
+        'finished_at': task.finished_at and task.finished_at.isoformat(),
+        'result_url': (
+            reverse('notes:task_result', args=(task.pk,)) if done else None
+        ),
+    }
+
+
+class TaskStatus(LoginRequiredMixin, generic.View):
+    """Состояние фоновой задачи пользователя."""
+
+    def get(self, request, pk):
+        task = get_object_or_404(Task.objects, pk=pk, owner=request.user)
+        response = JsonResponse(task_as_dict(task))
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class TaskResult(LoginRequiredMixin, generic.View):
+    """Файл результата завершённой фоновой задачи."""
+
+    def get(self, request, pk):
+        task = get_object_or_404(
+            Task.objects, pk=pk, owner=request.user, status=Task.DONE
+        )
+        if not task.result:
+            raise Http404
+        try:
+            result = open(tasks.result_path(task.result), 'rb')
+        except FileNotFoundError:
+            raise Http404
+        extension = task.result.rpartition('.')[2]
+        content_types = {
+            export_format.extension: export_format.content_type
+            for export_format in export.FORMATS.values()
+        }
+        return FileResponse(
+            result,
+            as_attachment=True,
+            filename=f'notes.{extension}',
+            content_type=content_types.get(extension),
+        )
+
+
+class FragmentCacheStats(UserPassesTestMixin, generic.View):
+    """Счётчики попаданий в кэш фрагментов, только для персонала."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(fragment_cache.stats())
@@ -0,0 +1,89 @@
+"""Пользователь запроса из кэша.
+
+CachedAuthenticationMiddleware заменяет AuthenticationMiddleware:
+пользователь сессии берётся из кэша AUTH_USER_CACHE, а не из auth_user.
+Хеш сессии сверяется и с закэшированным пользователем, поэтому смена
+пароля по-прежнему завершает чужие сессии. Запись в кэше удаляется при
+сохранении и удалении пользователя (см. notes.signals). QuerySet.update()
+сигналов не шлёт, и такие правки видны только по истечении TIMEOUT.
+
+Кэш в памяти процесса (LocMemCache) другие воркеры не видят: выход или
+смена пароля в одном из них не сбросили бы копии в остальных. С таким
+кэшем пользователь всегда читается из базы, как в AuthenticationMiddleware.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+KEY_PREFIX = 'yanote.auth.user:'
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_USER_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def is_process_local(cache):
+    """Кэш виден только своему процессу."""
+    return isinstance(cache, LocMemCache)
+
+
+def cache_key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def is_verified(request, user):
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    return bool(session_hash) and constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    )
+
+
+def get_user(request):
+    """Пользователь сессии: из кэша или, при промахе, из базы."""
+    try:
+        user_id = request.session[auth.SESSION_KEY]
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return auth.get_user(request)
+    cache = get_cache()
+    if is_process_local(cache):
+        return auth.get_user(request)
+    key = cache_key(user_id)
+    user = cache.get(key)
+    if (
+        user is not None
+        and backend_path in settings.AUTHENTICATION_BACKENDS
+        and is_verified(request, user)
+    ):
+        return user
+    # Промах или несовпадение хеша: решает django.contrib.auth.
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(key, user, get_config()['TIMEOUT'])
+    else:
+        cache.delete(key)
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+def forget_user(user_id):
+    """Убирает пользователя из кэша; вызывается из notes.signals."""
+    get_cache().delete(cache_key(user_id))
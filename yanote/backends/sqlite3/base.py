@@ -0,0 +1,47 @@
+"""SQLite с настройками для конкурентной нагрузки.
+
+При каждом подключении выполняются PRAGMA из DEFAULT_PRAGMAS, которые
+можно переопределить ключом PRAGMAS в настройках базы. Транзакции
+открываются как BEGIN IMMEDIATE (ключ TRANSACTION_MODE): запись
+захватывает блокировку сразу и ждёт её по busy_timeout, а не падает
+с «database is locked» при повышении блокировки посреди транзакции.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот.
+    'journal_mode': 'WAL',
+    # В режиме WAL fsync при каждом коммите не нужен для целостности.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в килобайтах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(
+            connection,
+            {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})},
+        )
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE', 'IMMEDIATE')
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'TRANSACTION_MODE должен быть одним из {TRANSACTION_MODES}.'
+            )
+        self.cursor().execute(f'BEGIN {mode}')
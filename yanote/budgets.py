@@ -0,0 +1,131 @@
+"""Бюджеты запросов к базе и задержки для маршрутов.
+
+Бюджет — предельное число SQL-запросов и время обработки в миллисекундах.
+Он задаётся по имени маршрута в QUERY_BUDGETS (ключ 'notes:add' или,
+для отдельного метода, 'notes:add POST') либо декоратором query_budget
+на самом представлении; настройки важнее декоратора.
+
+MetricsMiddleware сверяет с бюджетом каждый запрос. Превышения считаются
+в /metrics, а в режиме QUERY_BUDGET_MODE = 'log' попадают в журнал
+с вероятностью QUERY_BUDGET_SAMPLE_RATE. В тестах превышения собирает
+record_violations(): на нём построен плагин yanote.pytest_budgets.
+"""
+import logging
+import random
+import threading
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+Budget = namedtuple('Budget', ('queries', 'ms'), defaults=(None, None))
+
+
+_Violation = namedtuple('Violation', ('route', 'kind', 'limit', 'actual'))
+
+
+class Violation(_Violation):
+    """Превышение бюджета: kind — 'queries' или 'ms'."""
+
+    def __str__(self):
+        if self.kind == 'ms':
+            return (
+                f'{self.route}: {self.actual:.1f} мс, бюджет {self.limit} мс'
+            )
+        return (
+            f'{self.route}: SQL-запросов {self.actual}, бюджет {self.limit}'
+        )
+
+
+def query_budget(queries=None, ms=None):
+    """Декоратор представления-функции или класса с бюджетом."""
+    def decorator(view):
+        view.query_budget = Budget(queries, ms)
+        return view
+    return decorator
+
+
+def get_budget(match, method):
+    """Бюджет маршрута или None, если он не задан."""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    for key in (f'{match.view_name} {method}', match.view_name):
+        if key in budgets:
+            return Budget(**budgets[key])
+    view = getattr(match.func, 'view_class', match.func)
+    return getattr(view, 'query_budget', None)
+
+
+def find_violations(route, budget, queries, elapsed):
+    violations = []
+    if budget.queries is not None and queries > budget.queries:
+        violations.append(Violation(route, 'queries', budget.queries, queries))
+    if budget.ms is not None and elapsed * 1000 > budget.ms:
+        violations.append(Violation(route, 'ms', budget.ms, elapsed * 1000))
+    return violations
+
+
+_recorders = []
+_counts = Counter()
+_lock = threading.Lock()
+
+
+@contextmanager
+def record_violations():
+    """Собирает превышения всех запросов внутри блока в список."""
+    violations = []
+    _recorders.append(violations)
+    try:
+        yield violations
+    finally:
+        # remove() сравнивает списки по значению и у вложенных блоков
+        # мог бы убрать чужой список, поэтому ищем свой по id.
+        del _recorders[next(
+            index for index, recorder in enumerate(_recorders)
+            if recorder is violations
+        )]
+
+
+def check(request, queries, elapsed):
+    """Сверяет обработанный запрос с бюджетом его маршрута."""
+    match = request.resolver_match
+    if match is None:
+        return
+    budget = get_budget(match, request.method)
+    if budget is None:
+        return
+    route = f'{match.view_name} {request.method}'
+    violations = find_violations(route, budget, queries, elapsed)
+    if not violations:
+        return
+    with _lock:
+        for violation in violations:
+            _counts[violation.route, violation.kind] += 1
+    for recorder in _recorders:
+        recorder.extend(violations)
+    mode = getattr(settings, 'QUERY_BUDGET_MODE', 'log')
+    rate = getattr(settings, 'QUERY_BUDGET_SAMPLE_RATE', 1.0)
+    if mode == 'log' and random.random() < rate:
+        for violation in violations:
+            logger.warning('Превышен бюджет: %s', violation)
+
+
+def clear():
+    with _lock:
+        _counts.clear()
+
+
+def collect_metrics():
+    """Счётчик превышений бюджетов для /metrics."""
+    with _lock:
+        counts = dict(_counts)
+    yield (
+        'yanote_budget_violations_total',
+        'counter',
+        'Запросы, превысившие бюджет маршрута.',
+        [
+            ({'route': route, 'kind': kind}, count)
+            for (route, kind), count in sorted(counts.items())
+        ],
+    )
@@ -0,0 +1,119 @@
+"""Сжатие ответов gzip, в том числе потоковых.
+
+CompressionMiddleware сжимает ответы с типом из CONTENT_TYPES, если
+клиент принимает gzip. Обычный ответ сжимается целиком, когда он не
+меньше MIN_SIZE байт и сжатие его уменьшает. Потоковый (выгрузка)
+сжимается по мере чтения: входные куски копятся до FLUSH_SIZE байт
+и уходят одним сжатым блоком, поэтому и память, и задержка первого
+байта остаются ограниченными.
+
+Сильный ETag сжатого ответа становится слабым, как у GZipMiddleware:
+байты уже не те, но представление то же, а condition() в представлениях
+сравнивает If-None-Match слабо. Токен CSRF Django маскирует заново
+в каждом ответе, поэтому сжатие страниц с формами не открывает BREACH.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .staticfiles import accepts_gzip
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'LEVEL': 6,
+    'FLUSH_SIZE': 16 * 1024,
+    'CONTENT_TYPES': (
+        'text/html',
+        'text/plain',
+        'text/css',
+        'text/csv',
+        'application/json',
+        'application/x-ndjson',
+        'application/javascript',
+        'application/xml',
+        'image/svg+xml',
+    ),
+}
+# wbits для zlib: 16 + 15 — формат gzip с окном 32 КиБ.
+GZIP_WBITS = 31
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+
+
+def compress_bytes(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, level, flush_size):
+    """Сжимает поток кусков, отдавая сжатое каждые flush_size байт входа."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    output = []
+    pending = 0
+    for chunk in chunks:
+        output.append(compressor.compress(chunk))
+        pending += len(chunk)
+        if pending >= flush_size:
+            output.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+            yield b''.join(output)
+            output.clear()
+            pending = 0
+    output.append(compressor.flush())
+    yield b''.join(output)
+
+
+def weaken_etag(response):
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+class CompressionMiddleware:
+    """Сжимает ответы gzip; ставится до промежуточных слоёв, меняющих тело."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_config()
+        self.min_size = config['MIN_SIZE']
+        self.level = config['LEVEL']
+        self.flush_size = config['FLUSH_SIZE']
+        self.content_types = frozenset(config['CONTENT_TYPES'])
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        gzip_accepted = accepts_gzip(request.META)
+        if response.status_code == 304:
+            # Ответ 304 повторяет ETag сжатого представления.
+            if gzip_accepted:
+                weaken_etag(response)
+            return response
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not gzip_accepted:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, self.level, self.flush_size
+            )
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_size:
+                return response
+            compressed = compress_bytes(response.content, self.level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        weaken_etag(response)
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '')
+        return content_type.split(';')[0].strip().lower() in self.content_types
@@ -0,0 +1,249 @@
+"""Замеры производительности запросов.
+
+MetricsMiddleware для каждого запроса считает общее время, число
+и время SQL-запросов, время рендеринга шаблона и размер ответа. Замеры
+уходят клиенту в заголовке Server-Timing и копятся в гистограммах по
+имени маршрута (notes:list, notes:detail…), которые отдаёт /metrics
+в текстовом формате Prometheus.
+
+Гистограммы живут в памяти процесса: каждый воркер отдаёт свои,
+а суммирует их Prometheus. Дополнительные метрики приложений
+подключаются через METRICS_COLLECTORS. Число запросов и время
+сверяются с бюджетом маршрута, см. yanote/budgets.py.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+from . import budgets
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+UNRESOLVED = '<unresolved>'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками маршрута."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(route)
+            if series is None:
+                series = self._series[route] = [
+                    [0] * (len(self.buckets) + 1), 0, 0
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = {
+                route: (list(counts), total, count)
+                for route, (counts, total, count) in self._series.items()
+            }
+        for route, (counts, total, count) in sorted(series.items()):
+            label = f'route="{escape_label(route)}"'
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield (
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}'
+                )
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {count}'
+            yield f'{self.name}_sum{{{label}}} {total}'
+            yield f'{self.name}_count{{{label}}} {count}'
+
+
+def escape_label(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+REQUEST_DURATION = Histogram(
+    'yanote_request_duration_seconds',
+    'Время обработки запроса.',
+    DURATION_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'yanote_db_duration_seconds',
+    'Время SQL-запросов за один запрос.',
+    DURATION_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'yanote_db_queries',
+    'Число SQL-запросов за один запрос.',
+    QUERY_BUCKETS,
+)
+TEMPLATE_DURATION = Histogram(
+    'yanote_template_duration_seconds',
+    'Время рендеринга шаблона.',
+    DURATION_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'yanote_response_size_bytes',
+    'Размер тела ответа, кроме потоковых.',
+    SIZE_BUCKETS,
+)
+HISTOGRAMS = (
+    REQUEST_DURATION, DB_DURATION, DB_QUERIES, TEMPLATE_DURATION,
+    RESPONSE_SIZE,
+)
+
+
+def clear():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+@lru_cache(maxsize=None)
+def get_collectors():
+    return tuple(
+        import_string(path)
+        for path in getattr(settings, 'METRICS_COLLECTORS', ())
+    )
+
+
+def expose_collected():
+    """Метрики из METRICS_COLLECTORS.
+
+    Коллектор возвращает четвёрки (имя, тип, описание, значения),
+    значения — пары (словарь меток, число).
+    """
+    for collector in get_collectors():
+        for name, kind, help_text, samples in collector():
+            yield f'# HELP {name} {help_text}'
+            yield f'# TYPE {name} {kind}'
+            for labels, value in samples:
+                label = ','.join(
+                    f'{key}="{escape_label(str(item))}"'
+                    for key, item in labels.items()
+                )
+                if label:
+                    yield f'{name}{{{label}}} {value}'
+                else:
+                    yield f'{name} {value}'
+
+
+class RequestTimer:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def start_render(self, response):
+        start = time.perf_counter()
+
+        def finish(response):
+            self.template_time += time.perf_counter() - start
+
+        response.add_post_render_callback(finish)
+        return response
+
+
+class MetricsMiddleware:
+    """Замеряет запросы; ставится первым в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        timer = request.metrics_timer = RequestTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        route = match.view_name if match else UNRESOLVED
+        REQUEST_DURATION.observe(route, elapsed)
+        DB_DURATION.observe(route, timer.db_time)
+        DB_QUERIES.observe(route, timer.queries)
+        if timer.template_time:
+            TEMPLATE_DURATION.observe(route, timer.template_time)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(route, len(response.content))
+        budgets.check(request, timer.queries, elapsed)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'total;dur={elapsed * 1000:.1f}, '
+                f'db;dur={timer.db_time * 1000:.1f};'
+                f'desc="{timer.queries} queries", '
+                f'tpl;dur={timer.template_time * 1000:.1f}'
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается последним перед рендерингом шаблона.
+        return request.metrics_timer.start_render(response)
+
+
+def has_token(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and constant_time_compare(header, f'Bearer {token}')
+
+
+def is_allowed(request):
+    # За обратным прокси REMOTE_ADDR — адрес прокси, поэтому INTERNAL_IPS
+    # здесь не годится: адреса задаются отдельно и по умолчанию пусты.
+    return (
+        request.META.get('REMOTE_ADDR')
+        in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+        or has_token(request)
+        or request.user.is_staff
+    )
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus.
+
+    Доступны персоналу, по заголовку Authorization: Bearer METRICS_TOKEN
+    и с адресов METRICS_ALLOWED_IPS.
+    """
+    if not is_allowed(request):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    lines.extend(expose_collected())
+    return HttpResponse('\n'.join(lines) + '\n', content_type=CONTENT_TYPE)
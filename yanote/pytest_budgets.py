@@ -0,0 +1,43 @@
+"""Плагин pytest: тест падает, если запрос вышел за бюджет маршрута.
+
+Подключается из conftest.py. Превышения собирает
+budgets.record_violations(); тесты, которые выходят за бюджет нарочно,
+отмечаются @pytest.mark.no_query_budget.
+"""
+import pytest
+
+from yanote import budgets
+
+
+def pytest_addoption(parser):
+    # Задержка в тестах шумная, поэтому по умолчанию проверяется
+    # только число SQL-запросов.
+    parser.addoption(
+        '--query-budget-latency',
+        action='store_true',
+        help='Проверять и бюджеты задержки маршрутов.',
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'no_query_budget: не проверять бюджеты маршрутов.'
+    )
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    with budgets.record_violations() as violations:
+        outcome = yield
+    if item.get_closest_marker('no_query_budget') or outcome.excinfo:
+        return
+    if not item.config.getoption('--query-budget-latency'):
+        violations = [
+            violation for violation in violations if violation.kind != 'ms'
+        ]
+    if violations:
+        pytest.fail(
+            'Превышены бюджеты маршрутов:\n'
+            + '\n'.join(str(violation) for violation in violations),
+            pytrace=False,
+        )
@@ -0,0 +1,84 @@
+"""Маршрутизация запросов между основной базой и репликами.
+
+Чтения уходят на случайную реплику из DATABASE_REPLICAS, записи — в
+основную базу. Пользователь, который только что что-то записал,
+REPLICA_PIN_SECONDS читает из основной базы, чтобы не увидеть
+отстающую реплику: это запоминается в cookie ReplicaPinningMiddleware.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_COOKIE = 'primary_pin'
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or _pinned.get() or _wrote.get():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Объект базы, которая не основная и не реплика, остаётся в ней:
+        # например, при migrate --database другой базы.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (
+            None, PRIMARY, *get_replicas()
+        ):
+            return None
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплик приносит репликация, а не migrate.
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Закрепляет за пользователем основную базу после его записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        pinned = _pinned.set(pinned_until > time.time())
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and get_replicas():
+                window = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    PIN_COOKIE,
+                    str(time.time() + window),
+                    max_age=window,
+                    httponly=True,
+                    samesite='Lax',
+                )
+            return response
+        finally:
+            _pinned.reset(pinned)
+            _wrote.reset(wrote)
@@ -0,0 +1,118 @@
+"""Сессии в кэше с отложенной записью в базу.
+
+SESSION_ENGINE = 'yanote.sessions'. Сессия читается из кэша
+SESSION_CACHE_ALIAS и только при промахе — из базы, как в cached_db.
+Запись иначе: новая сессия и сессия, в которой сменился пользователь,
+пишутся в базу сразу, а прочие изменения — в кэш и в очередь процесса.
+Очередь сбрасывается в базу после ответа (сигнал request_finished),
+не чаще раза в SESSION_WRITE_BEHIND секунд на сессию.
+
+Если процесс остановится до сброса, теряются изменения сессий за
+последние SESSION_WRITE_BEHIND секунд, но не вход и выход пользователей.
+
+С кэшем в памяти процесса (LocMemCache) у каждого воркера была бы своя
+копия сессии, и выход в одном воркере не был бы виден в остальных.
+Поэтому с таким кэшем сессии читаются и пишутся прямо в базу, как
+в SESSION_ENGINE = 'django.contrib.sessions.backends.db'.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+)
+from django.contrib.sessions.backends import cached_db, db
+from django.contrib.sessions.backends.base import UpdateError
+from django.core.signals import request_finished
+
+from .auth import is_process_local
+
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+# session_key -> (срок записи, SessionStore с последними данными).
+_pending = {}
+_lock = threading.Lock()
+
+
+def auth_state(data):
+    return tuple(data.get(key) for key in AUTH_KEYS)
+
+
+def write_behind_delay():
+    return getattr(settings, 'SESSION_WRITE_BEHIND', 0)
+
+
+class SessionStore(cached_db.SessionStore):
+
+    @property
+    def shared(self):
+        return not is_process_local(self._cache)
+
+    def load(self):
+        if self.shared:
+            data = super().load()
+        else:
+            data = db.SessionStore.load(self)
+        self._loaded_auth = auth_state(data)
+        return data
+
+    def save(self, must_create=False):
+        delay = write_behind_delay()
+        if (
+            must_create
+            or delay <= 0
+            or not self.shared
+            or self.session_key is None
+            or auth_state(self._session)
+            != getattr(self, '_loaded_auth', None)
+        ):
+            self.write_through(must_create)
+            return
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        deadline = time.monotonic() + delay
+        with _lock:
+            if self.session_key in _pending:
+                deadline = _pending[self.session_key][0]
+            _pending[self.session_key] = (deadline, self)
+
+    def write_through(self, must_create=False):
+        with _lock:
+            _pending.pop(self.session_key, None)
+        super().save(must_create)
+        self._loaded_auth = auth_state(self._session)
+
+    def delete(self, session_key=None):
+        with _lock:
+            _pending.pop(session_key or self.session_key, None)
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        flush_pending(force=True)
+        super().clear_expired()
+
+
+def flush_pending(force=False):
+    """Пишет в базу отложенные сессии, срок записи которых наступил."""
+    now = time.monotonic()
+    with _lock:
+        due = [
+            store for deadline, store in _pending.values()
+            if force or deadline <= now
+        ]
+    for store in due:
+        try:
+            store.write_through()
+        except UpdateError:
+            # Сессию удалили из базы, пока запись ждала очереди.
+            pass
+    return len(due)
+
+
+def flush_on_request_finished(sender, **kwargs):
+    if _pending:
+        flush_pending()
+
+
+request_finished.connect(flush_on_request_finished)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -22,11 +23,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы замерять весь стек.
+    'yanote.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # До всего, что читает или меняет тело ответа.
+    'yanote.compression.CompressionMiddleware',
+    'yanote.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yanote.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -52,13 +58,177 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш сессий и пользователей запроса, общий для воркеров одного
+    # сервера. Для нескольких серверов его заменяют memcached или redis.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'shared_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Кэш отрендеренных фрагментов заметок: LRU в памяти процесса и, если
+# указан SHARED_CACHE, общий для всех воркеров кэш из CACHES. Ключи
+# строятся из версии данных в базе, так что и без общего кэша воркер
+# не отдаст фрагмент, устаревший из-за записи в другом процессе.
+NOTES_FRAGMENT_CACHE = {
+    'MAX_ENTRIES': 1000,
+    'TIMEOUT': 300,
+    'SHARED_CACHE': None,
+}
+
+# Сжатие ответов gzip, см. yanote/compression.py: обычные ответы
+# от MIN_SIZE байт, потоковые — блоками по FLUSH_SIZE байт входа.
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'LEVEL': 6,
+    'FLUSH_SIZE': 16 * 1024,
+}
+
+# Сессии и пользователь запроса читаются из кэша, а не из базы;
+# изменения сессий пишутся в базу не чаще раза в SESSION_WRITE_BEHIND
+# секунд. Кэш должен быть общим для воркеров: с LocMemCache оба
+# читаются из базы. См. yanote/sessions.py и yanote/auth.py.
+SESSION_ENGINE = 'yanote.sessions'
+SESSION_CACHE_ALIAS = 'shared'
+SESSION_WRITE_BEHIND = 30
+AUTH_USER_CACHE = {
+    'ALIAS': 'shared',
+    'TIMEOUT': 300,
+}
+
+# Фоновые задачи, см. notes/tasks.py и команду run_tasks. Упавшая задача
+# повторяется через RETRY_DELAY секунд с удвоением паузы; задача, не
+# сообщавшая о ходе дольше LEASE секунд, возвращается в очередь.
+# Файлы результатов хранятся RESULT_TTL секунд.
+TASKS = {
+    'THREADS': 2,
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'LEASE': 600,
+    'RESULTS_ROOT': BASE_DIR / 'task_results',
+    'RESULT_TTL': 24 * 60 * 60,
+}
+
+# Сколько операций можно передать в один пакетный запрос JSON API.
+NOTES_API_BATCH_LIMIT = 100
+
+# Писать ли текст заметки ещё и в старый столбец notes_note.text.
+# Включается на время выкатки версии с NoteBlob, пока работают процессы,
+# читающие текст из notes_note (см. migrate_note_bodies).
+NOTES_WRITE_LEGACY_TEXT = False
+
+# Замеры запросов: заголовок Server-Timing и /metrics для Prometheus.
+# /metrics доступен персоналу, по заголовку Authorization: Bearer
+# METRICS_TOKEN (пустой токен не принимается) и с METRICS_ALLOWED_IPS.
+# Адреса сверяются с REMOTE_ADDR: за прокси это адрес самого прокси.
+METRICS_SERVER_TIMING = True
+METRICS_COLLECTORS = [
+    'notes.cache.collect_metrics',
+    'yanote.budgets.collect_metrics',
+]
+METRICS_TOKEN = os.getenv('YANOTE_METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = []
+INTERNAL_IPS = ['127.0.0.1']
+
+# Бюджеты маршрутов: SQL-запросов и миллисекунд на запрос, см.
+# yanote/budgets.py. Ключ 'маршрут МЕТОД' важнее ключа 'маршрут'.
+# Время входа и регистрации в основном уходит на хеширование пароля.
+QUERY_BUDGETS = {
+    'notes:home': {'queries': 2, 'ms': 100},
+    'notes:add': {'queries': 2, 'ms': 200},
+    # Запасные запросы — на повторный подбор занятого slug.
+    'notes:add POST': {'queries': 22, 'ms': 300},
+    'notes:edit': {'queries': 3, 'ms': 200},
+    'notes:edit POST': {'queries': 23, 'ms': 300},
+    'notes:detail': {'queries': 4, 'ms': 200},
+    'notes:delete': {'queries': 4, 'ms': 200},
+    'notes:delete POST': {'queries': 9, 'ms': 300},
+    'notes:delete DELETE': {'queries': 9, 'ms': 300},
+    # Восстановление версии читает до SNAPSHOT_INTERVAL - 1 дельт.
+    'notes:history': {'queries': 6, 'ms': 200},
+    'notes:revision': {'queries': 13, 'ms': 200},
+    'notes:revision POST': {'queries': 30, 'ms': 300},
+    'notes:list': {'queries': 5, 'ms': 300},
+    'notes:search': {'queries': 3, 'ms': 300},
+    # Для выгрузки считаются только запросы до начала потока.
+    'notes:export': {'queries': 3, 'ms': 100},
+    'notes:export POST': {'queries': 3, 'ms': 100},
+    'notes:task': {'queries': 3, 'ms': 100},
+    'notes:task_result': {'queries': 3, 'ms': 100},
+    'notes:cache_stats': {'queries': 2, 'ms': 100},
+    'notes:api_list': {'queries': 3, 'ms': 200},
+    'notes:api_sync': {'queries': 4, 'ms': 200},
+    # Каждый раздел пакета пишется пачкой, и число запросов не зависит
+    # от размера пакета: все три раздела сразу — около 41 запроса.
+    'notes:api_batch': {'queries': 45, 'ms': 1000},
+    'notes:api_detail': {'queries': 3, 'ms': 100},
+    'notes:success': {'queries': 2, 'ms': 100},
+    'users:login': {'queries': 2, 'ms': 100},
+    'users:login POST': {'queries': 9, 'ms': 1000},
+    'users:logout': {'queries': 4, 'ms': 200},
+    'users:signup': {'queries': 2, 'ms': 100},
+    'users:signup POST': {'queries': 6, 'ms': 1000},
+}
+# 'log' — писать превышения в журнал yanote.budgets, 'off' — только
+# считать их в /metrics. В журнал попадает доля превышений.
+QUERY_BUDGET_MODE = 'log'
+QUERY_BUDGET_SAMPLE_RATE = 0.1
+
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с WAL и PRAGMA для конкурентной нагрузки,
+        # см. yanote/backends/sqlite3/base.py.
+        'ENGINE': 'yanote.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение переиспользуется между запросами.
+        'CONN_MAX_AGE': 600,
+        'TRANSACTION_MODE': 'IMMEDIATE',
     }
 }
 
+# Реплики только для чтения. Для локальной проверки YANOTE_SQLITE_REPLICAS=N
+# добавляет N файлов SQLite, которые заполняет manage.py sync_replicas.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.getenv('YANOTE_SQLITE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Шарды заметок: заметки автора лежат в NOTE_SHARDS[author_id % N].
+# Для локальной проверки YANOTE_SQLITE_SHARDS=N добавляет N файлов SQLite
+# (схема — manage.py migrate --database shardN, перенос — rebalance_shards).
+# NOTE_SHARD_DATABASES — все базы с заметками, включая выведенные из
+# NOTE_SHARDS, но ещё не освобождённые: в них мигрируются только заметки.
+NOTE_SHARDS = ['default']
+NOTE_SHARD_DATABASES = []
+for number in range(1, int(os.getenv('YANOTE_SQLITE_SHARDS', 0)) + 1):
+    alias = f'shard{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+    }
+    NOTE_SHARDS.append(alias)
+    NOTE_SHARD_DATABASES.append(alias)
+
+DATABASE_ROUTERS = [
+    'notes.sharding.ShardRouter',
+    'yanote.routers.PrimaryReplicaRouter',
+]
+
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_PIN_SECONDS = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -82,6 +252,13 @@ USE_TZ = True
 
 
 STATIC_URL = '/static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'collected_static'
+# collectstatic добавляет к именам хеш содержимого и сжатые копии .gz;
+# yanote/wsgi.py отдаёт их сам, см. yanote/staticfiles.py.
+STATICFILES_STORAGE = 'yanote.staticfiles.CompressedManifestStaticFilesStorage'
+# Кэширование файлов без хеша в имени; с хешем — на год.
+STATIC_MAX_AGE = 60
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,173 @@
+"""Статика без внешнего веб-сервера.
+
+CompressedManifestStaticFilesStorage при collectstatic добавляет к именам
+файлов хеш содержимого (как ManifestStaticFilesStorage) и кладёт рядом
+с текстовыми файлами сжатые копии .gz, если они меньше оригинала.
+
+StaticFilesApplication оборачивает WSGI-приложение Django в wsgi.py
+и отдаёт файлы из STATIC_ROOT сам: сжатую копию — клиентам, которые
+принимают gzip, файлы с хешем в имени — с кэшированием на год,
+остальные — на STATIC_MAX_AGE секунд. Тело отдаётся через
+wsgi.file_wrapper, то есть sendfile(), если его умеет сервер.
+
+Список файлов читается при запуске: после collectstatic процесс нужно
+перезапустить.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml',
+)
+COMPRESS_LEVEL = 9
+# Меньше этого сжатие не окупает лишний файл и заголовок Vary.
+COMPRESS_MIN_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+BLOCK_SIZE = 64 * 1024
+TEXT_TYPES = ('application/javascript', 'application/json', 'image/svg+xml')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def stored_name(self, name):
+        # До первого collectstatic манифеста нет: имена без хеша.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        # mtime=0: одинаковые файлы дают одинаковый архив.
+        packed = gzip.compress(data, COMPRESS_LEVEL, mtime=0)
+        if len(packed) >= len(data):
+            return
+        if self.exists(name + '.gz'):
+            self.delete(name + '.gz')
+        self._save(name + '.gz', ContentFile(packed))
+
+
+class StaticFile:
+    """Файл из STATIC_ROOT и его сжатая копия."""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.gzip_path = path + '.gz'
+        if not os.path.isfile(self.gzip_path):
+            self.gzip_path = None
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in TEXT_TYPES:
+            content_type += '; charset=utf-8'
+        max_age = IMMUTABLE_MAX_AGE if immutable else getattr(
+            settings, 'STATIC_MAX_AGE', 60
+        )
+        cache_control = f'public, max-age={max_age}'
+        if immutable:
+            cache_control += ', immutable'
+        self.headers = [
+            ('Content-Type', content_type),
+            ('Cache-Control', cache_control),
+        ]
+        if self.gzip_path:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def variant(self, accepts_gzip):
+        """Путь, ETag и заголовки подходящего клиенту варианта."""
+        path = self.gzip_path if accepts_gzip and self.gzip_path else self.path
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}'
+        headers = list(self.headers)
+        if path == self.gzip_path:
+            etag += '-gzip'
+            headers.append(('Content-Encoding', 'gzip'))
+        etag += '"'
+        headers += [
+            ('Content-Length', str(stat.st_size)),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('ETag', etag),
+        ]
+        return path, etag, headers
+
+
+def accepts_gzip(environ):
+    for coding in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            quality = params.strip().replace(' ', '')
+            return quality not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def find_files(root, immutable_names):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.gz'):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            files[relative] = StaticFile(path, relative in immutable_names)
+    return files
+
+
+def read_manifest(root):
+    storage = CompressedManifestStaticFilesStorage(location=root)
+    return set(storage.hashed_files.values())
+
+
+class StaticFilesApplication:
+    """WSGI-обёртка, отдающая собранную статику из STATIC_ROOT."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        root = root or settings.STATIC_ROOT
+        prefix = prefix or settings.STATIC_URL
+        self.prefix = '/' + prefix.strip('/') + '/'
+        self.files = {}
+        if root and os.path.isdir(root):
+            self.files = find_files(root, read_manifest(root))
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not self.files or not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+        static_file = self.files.get(
+            posixpath.normpath(path[len(self.prefix):])
+        )
+        if static_file is None:
+            return self.application(environ, start_response)
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return []
+        file_path, etag, headers = static_file.variant(accepts_gzip(environ))
+        if etag in environ.get('HTTP_IF_NONE_MATCH', ''):
+            start_response('304 Not Modified', [
+                (name, value) for name, value in headers
+                if name in ('Cache-Control', 'ETag', 'Vary')
+            ])
+            return []
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(file_path, 'rb'), BLOCK_SIZE)
@@ -0,0 +1,40 @@
+"""Настройки тестов: manage.py test и pytest.
+
+Тесты не должны трогать файлы работающего сервера: общий кэш сессий
+и пользователей и файлы дополнительных баз живут во временном каталоге,
+который удаляется по завершении процесса.
+"""
+import atexit
+import shutil
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401, F403
+from .settings import CACHES, DATABASES
+
+TEMP_DIR = Path(tempfile.mkdtemp(prefix='yanote-tests-'))
+atexit.register(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+
+CACHES = {
+    **CACHES,
+    'shared': {**CACHES['shared'], 'LOCATION': TEMP_DIR / 'shared_cache'},
+}
+
+# Второй шард и реплика: тесты шардирования и чтения с реплик работают
+# с настоящими отдельными базами и сами включают их в NOTE_SHARDS
+# и DATABASE_REPLICAS. Реплика не зеркалит основную базу: нужные строки
+# тесты копируют в неё сами, как это сделала бы репликация.
+DATABASES = {
+    'default': DATABASES['default'],
+    'shard1': {
+        **DATABASES['default'],
+        'NAME': TEMP_DIR / 'db.shard1.sqlite3',
+    },
+    'replica1': {
+        **DATABASES['default'],
+        'NAME': TEMP_DIR / 'db.replica1.sqlite3',
+    },
+}
+NOTE_SHARDS = ['default']
+NOTE_SHARD_DATABASES = ['shard1']
+DATABASE_REPLICAS = []
@@ -11,6 +11,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from yanote.staticfiles import StaticFilesApplication
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
 
-application = get_wsgi_application()
+# Собранную collectstatic статику отдаёт само приложение.
+application = StaticFilesApplication(get_wsgi_application())